@@ -23,6 +23,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+# Let the frontend read the pagination cursor and cache validators
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor", "ETag"]
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -97,6 +99,30 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Serialized event API responses. The file backend is shared between
+    # server workers and the fetch_events command, so an ingest run
+    # invalidates what every worker serves; a locmem backend only sees
+    # invalidations made in its own process.
+    "events": {
+        "BACKEND": os.getenv(
+            "EVENTS_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+        ),
+        "LOCATION": os.getenv("EVENTS_CACHE_LOCATION", str(BASE_DIR / ".cache" / "events")),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+EVENTS_CACHE_ALIAS = "events"
+EVENTS_CACHE_TIMEOUT = int(os.getenv("EVENTS_CACHE_TIMEOUT", str(60 * 60)))  # seconds
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -137,3 +163,40 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Event providers
+# Base URLs can point at a local stub server in tests
+
+CALENDARIFIC_URL = os.getenv("CALENDARIFIC_URL", "https://calendarific.com/api/v2/holidays")
+CALENDARIFIC_API_KEY = os.getenv("CALENDARIFIC_API_KEY", "rh43rV6WUyrGvOpLND4Xgqw60fHtBh4B")
+OPENWEATHER_URL = os.getenv("OPENWEATHER_URL", "http://api.openweathermap.org/data/2.5/weather")
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "6b734670c9afdd12cfce70f6f48d6a08")
+
+# Comma-separated ISO country codes and city names fetched by fetch_events
+EVENT_HOLIDAY_COUNTRIES = os.getenv("EVENT_HOLIDAY_COUNTRIES", "IN").split(",")
+EVENT_WEATHER_LOCATIONS = os.getenv("EVENT_WEATHER_LOCATIONS", "India").split(",")
+
+# Maximum in-flight requests per provider
+EVENT_PROVIDER_CONCURRENCY = {
+    "calendarific": int(os.getenv("CALENDARIFIC_CONCURRENCY", "4")),
+    "openweathermap": int(os.getenv("OPENWEATHER_CONCURRENCY", "16")),
+}
+EVENT_FETCH_TIMEOUT = float(os.getenv("EVENT_FETCH_TIMEOUT", "10"))  # seconds
+EVENT_FETCH_RETRIES = int(os.getenv("EVENT_FETCH_RETRIES", "3"))
+EVENT_FETCH_BACKOFF = float(os.getenv("EVENT_FETCH_BACKOFF", "0.5"))
+
+
+# Content generation
+
+CONTENT_MODEL_NAME = os.getenv("CONTENT_MODEL_NAME", "gemini-pro")
+# Dotted path to the model client; events.content.FakeContentClient works offline
+CONTENT_CLIENT = os.getenv("CONTENT_CLIENT", "events.content.GeminiClient")
+CONTENT_CACHE_SIZE = int(os.getenv("CONTENT_CACHE_SIZE", "512"))  # entries
+CONTENT_CACHE_TTL = int(os.getenv("CONTENT_CACHE_TTL", str(6 * 60 * 60)))  # seconds
+CONTENT_MAX_WORKERS = int(os.getenv("CONTENT_MAX_WORKERS", "8"))  # concurrent model calls
+# Stored GeneratedContent older than this is regenerated (0 = never expires)
+CONTENT_STORE_TTL = int(os.getenv("CONTENT_STORE_TTL", str(7 * 24 * 60 * 60)))  # seconds
+# Defaults for the generate_content batch command
+CONTENT_BATCH_CONCURRENCY = int(os.getenv("CONTENT_BATCH_CONCURRENCY", "4"))
+CONTENT_BATCH_RATE_PER_MINUTE = int(os.getenv("CONTENT_BATCH_RATE_PER_MINUTE", "60"))  # 0 = unlimited
@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from events.content import CONTENT_KINDS, content_cache_key, generate_text
+from events.store import fresh_content_queryset, save_content
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchStats:
+    generated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+
+class RateLimiter:
+    """Spaces calls evenly so at most `per_minute` start in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def is_rate_limit_error(error):
+    # google.api_core raises ResourceExhausted (HTTP 429) when the quota is hit
+    return getattr(error, 'code', None) == 429 or type(error).__name__ in ('ResourceExhausted', 'TooManyRequests')
+
+
+def _generate_with_backoff(limiter, kind, event, retries, backoff):
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            return generate_text(kind, event.title, event.description)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt
+            logger.warning("Rate limited generating %s for event %s, retrying in %.1fs", kind, event.id, delay)
+            time.sleep(delay)
+
+
+def generate_for_events(events, concurrency=None, per_minute=None, force=False, retries=5, backoff=2.0):
+    """
+    Generate and store every content kind for each event.
+
+    (event, kind) pairs with fresh stored content are skipped unless force
+    is set. At most `concurrency` model calls run at once and
+    no more than `per_minute` start per minute; rate-limit errors are
+    retried with exponential backoff. Each result is saved as soon as it
+    arrives so an interrupted run keeps its progress.
+    """
+    started = time.perf_counter()
+    concurrency = concurrency or settings.CONTENT_BATCH_CONCURRENCY
+    per_minute = settings.CONTENT_BATCH_RATE_PER_MINUTE if per_minute is None else per_minute
+    stats = BatchStats()
+    events = list(events)
+
+    stored = set(
+        fresh_content_queryset().filter(event__in=events).values_list('event_id', 'kind', 'prompt_hash')
+    )
+    tasks = []
+    for event in events:
+        for kind in CONTENT_KINDS:
+            prompt_hash = content_cache_key(kind, event.title, event.description)
+            if not force and (event.id, kind, prompt_hash) in stored:
+                stats.skipped += 1
+            else:
+                tasks.append((event, kind))
+
+    limiter = RateLimiter(per_minute)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='content-batch') as pool:
+        futures = {
+            pool.submit(_generate_with_backoff, limiter, kind, event, retries, backoff): (event, kind)
+            for event, kind in tasks
+        }
+        for future in as_completed(futures):
+            event, kind = futures[future]
+            try:
+                text = future.result()
+            except Exception as e:
+                logger.error("Failed to generate %s for event %s: %s", kind, event.id, e)
+                stats.failed += 1
+                continue
+            save_content(event, kind, text)
+            stats.generated += 1
+
+    stats.seconds = time.perf_counter() - started
+    return stats
@@ -0,0 +1,94 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+# Bumped whenever events change; every cached response key embeds it, so
+# one write invalidates all of them without having to enumerate keys.
+GENERATION_KEY = 'events:generation'
+
+
+def _new_generation():
+    # The generation key can be culled along with the entries. Restarting it
+    # from the clock keeps it ahead of every generation used before, so old
+    # entries never come back as fresh.
+    return time.time_ns()
+
+
+def get_cache():
+    return caches[settings.EVENTS_CACHE_ALIAS]
+
+
+def current_generation():
+    cache = get_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = _new_generation()
+        cache.add(GENERATION_KEY, generation, timeout=None)
+        generation = cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+def invalidate_event_responses():
+    """Drop every cached events response (takes effect once the current transaction commits)."""
+    def bump():
+        cache = get_cache()
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, _new_generation(), timeout=None)
+    transaction.on_commit(bump)
+
+
+def response_cache_key(*parts):
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()
+    return f'events:response:{current_generation()}:{digest}'
+
+
+def _render(entry):
+    response = HttpResponse(entry['body'], content_type='application/json')
+    for header, value in entry['headers'].items():
+        response[header] = value
+    return response
+
+
+def cached_json_response(request, key_parts, build):
+    """
+    Serve a JSON response from the events cache, building it on a miss.
+
+    build() returns (data, headers) for a cacheable response or a DRF
+    Response for errors, which are passed through uncached. The body is
+    cached as rendered bytes with its ETag, so a matching If-None-Match is
+    answered with 304 straight from the cache, without touching the DB.
+    """
+    cache = get_cache()
+    key = response_cache_key(*key_parts)
+    entry = cache.get(key)
+    if entry is None:
+        result = build()
+        if not isinstance(result, tuple):
+            return result
+        data, headers = result
+        body = JSONRenderer().render(data)
+        entry = {
+            'body': body,
+            'etag': quote_etag(hashlib.sha256(body).hexdigest()),
+            'headers': headers,
+        }
+        cache.set(key, entry, settings.EVENTS_CACHE_TIMEOUT)
+
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if entry['etag'] in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = _render(entry)
+    response['ETag'] = entry['etag']
+    # Clients may keep a copy but must revalidate it on every poll
+    patch_cache_control(response, no_cache=True)
+    return response
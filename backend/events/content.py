@@ -0,0 +1,254 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Bump whenever a prompt template changes so cached output is not reused
+PROMPT_TEMPLATE_VERSION = 1
+
+SOCIAL_MEDIA = 'socialMedia'
+VIDEO_SCRIPT = 'videoScript'
+
+PROMPT_TEMPLATES = {
+    SOCIAL_MEDIA: """Create 5 engaging social media posts for the following event:
+            Title: {title}
+            Description: {description}
+            
+            For each post:
+            1. Include relevant hashtags
+            2. Use appropriate emojis
+            3. Keep it engaging and concise
+            4. Add a call-to-action
+            5. Format each post clearly with a number (1-5)
+            
+            Make the posts diverse - some emotional, some informative, some urgent.""",
+    VIDEO_SCRIPT: """Create a compelling 60-second video script for the following event:
+            Title: {title}
+            Description: {description}
+            
+            Include:
+            1. Opening hook (5-10 seconds)
+            2. Main message and key points (40-45 seconds)
+            3. Strong call-to-action (5-10 seconds)
+            4. Visual descriptions and transitions
+            5. Background music/mood suggestions
+            
+            Format it with clear sections and timing indicators.""",
+}
+
+CONTENT_KINDS = list(PROMPT_TEMPLATES)
+
+
+class ContentGenerationError(Exception):
+    pass
+
+
+class GeminiClient:
+    """Wraps a single configured Gemini model; built once per process."""
+
+    def __init__(self, model_name):
+        import google.generativeai as genai
+
+        api_key = os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            raise ContentGenerationError('GEMINI_API_KEY not configured')
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        if not response or not hasattr(response, 'text'):
+            raise ContentGenerationError('Model returned no text')
+        return response.text
+
+    def stream(self, prompt):
+        """Yield text chunks as the model produces them."""
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if getattr(chunk, 'text', None):
+                yield chunk.text
+
+
+class FakeContentClient:
+    """Offline stand-in for GeminiClient; set CONTENT_CLIENT to this in tests."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return f'[{self.model_name}] generated content {digest}'
+
+    def stream(self, prompt):
+        words = self.generate(prompt).split(' ')
+        yield words[0]
+        for word in words[1:]:
+            yield ' ' + word
+
+
+class SingleFlightCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and single-flight misses.
+
+    Concurrent get_or_compute() calls for the same missing key share one
+    compute() call: the first caller runs it and the rest wait on its result.
+    Failures are handed to every waiter and are not cached.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                return value
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+
+_client = None
+_client_lock = threading.Lock()
+_cache = SingleFlightCache(settings.CONTENT_CACHE_SIZE, settings.CONTENT_CACHE_TTL)
+# Model calls are network-bound, so prompts for one event run side by side
+_executor = ThreadPoolExecutor(max_workers=settings.CONTENT_MAX_WORKERS, thread_name_prefix='content')
+_STREAM_DONE = object()
+
+
+def get_content_client():
+    """Return the process-wide model client, configuring it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            client_class = import_string(settings.CONTENT_CLIENT)
+            _client = client_class(settings.CONTENT_MODEL_NAME)
+        return _client
+
+
+def build_prompt(kind, title, description):
+    return PROMPT_TEMPLATES[kind].format(
+        title=title or 'No title provided',
+        description=description or 'No description provided',
+    )
+
+
+def content_cache_key(kind, title, description):
+    payload = '\x1f'.join([
+        settings.CONTENT_MODEL_NAME, str(PROMPT_TEMPLATE_VERSION), kind, title or '', description or '',
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def generate_text(kind, title, description):
+    """Generate one kind of content for an event, served from cache when possible."""
+    def compute():
+        return get_content_client().generate(build_prompt(kind, title, description))
+
+    return _cache.get_or_compute(content_cache_key(kind, title, description), compute)
+
+
+def generate_event_content(title, description, kinds=None):
+    """
+    Return {'socialMedia': ..., 'videoScript': ...} for an event.
+
+    All kinds (or just `kinds`) are requested concurrently, so the wait is
+    the slowest prompt rather than the sum of them.
+    """
+    futures = {kind: _executor.submit(generate_text, kind, title, description) for kind in kinds or CONTENT_KINDS}
+    return {kind: future.result() for kind, future in futures.items()}
+
+
+def stream_event_content(title, description):
+    """
+    Yield (kind, chunk) pairs for every content kind as the model produces them.
+
+    Kinds are streamed concurrently and their chunks interleave. Cached
+    text is yielded as a single chunk; completed streams are cached. A
+    failing kind yields (kind, ContentGenerationError) once and stops,
+    without interrupting the others.
+    """
+    chunks = queue.Queue()
+
+    def pump(kind):
+        try:
+            key = content_cache_key(kind, title, description)
+            text = _cache.get(key)
+            if text is not None:
+                chunks.put((kind, text))
+                return
+            parts = []
+            for chunk in get_content_client().stream(build_prompt(kind, title, description)):
+                parts.append(chunk)
+                chunks.put((kind, chunk))
+            _cache.set(key, ''.join(parts))
+        except Exception as e:
+            chunks.put((kind, ContentGenerationError(str(e))))
+        finally:
+            chunks.put((kind, _STREAM_DONE))
+
+    for kind in CONTENT_KINDS:
+        _executor.submit(pump, kind)
+
+    remaining = len(CONTENT_KINDS)
+    while remaining:
+        kind, chunk = chunks.get()
+        if chunk is _STREAM_DONE:
+            remaining -= 1
+            continue
+        yield kind, chunk
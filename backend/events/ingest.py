@@ -0,0 +1,118 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from events.models import GlobalEvent
+
+DEFAULT_BATCH_SIZE = 500
+
+# Natural key an event is deduplicated on
+NATURAL_KEY_FIELDS = ['title', 'date', 'location']
+# Columns refreshed when an already-stored event is fetched again
+UPSERT_UPDATE_FIELDS = ['description', 'event_type', 'trending_score', 'priority_score']
+
+
+@dataclass
+class IngestStats:
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    @property
+    def processed(self):
+        return self.inserted + self.updated + self.skipped
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.seconds if self.seconds else 0.0
+
+
+def parse_event_date(value):
+    """Accept a datetime, an ISO datetime or an ISO date and return an aware datetime."""
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value[:10])
+            parsed = datetime.combine(day, dt_time.min) if day else None
+    else:
+        parsed = None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def build_event(data):
+    """Turn a fetched event dict into an unsaved GlobalEvent, or None if it is unusable."""
+    title = (data.get('title') or '').strip()
+    date = parse_event_date(data.get('date'))
+    if not title or date is None:
+        return None
+    return GlobalEvent(
+        title=title[:255],
+        description=data.get('description') or "No description",
+        location=data.get('location') or "Unknown",
+        event_type=data.get('event_type'),
+        date=date,
+        trending_score=float(data.get('trending_score') or 0),
+    )
+
+
+def _natural_key(event):
+    return (event.title, event.date, event.location)
+
+
+def _existing_keys(events):
+    """Return the natural keys of events in this batch that are already stored (one query)."""
+    rows = GlobalEvent.objects.filter(
+        title__in={event.title for event in events},
+        date__in={event.date for event in events},
+    ).values_list(*NATURAL_KEY_FIELDS)
+    return set(rows)
+
+
+def ingest_events(events, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Upsert fetched event dicts into GlobalEvent.
+
+    Events are deduplicated on (title, date, location), later duplicates in
+    the feed winning, and written with bulk_create(update_conflicts=True) in
+    batches of batch_size, all inside one transaction.
+    """
+    started = time.perf_counter()
+    stats = IngestStats()
+
+    unique = {}
+    for data in events:
+        event = build_event(data)
+        if event is None:
+            stats.skipped += 1
+            continue
+        key = _natural_key(event)
+        if key in unique:
+            stats.skipped += 1
+        unique[key] = event
+
+    pending = list(unique.values())
+    with transaction.atomic():
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            existing = _existing_keys(batch)
+            GlobalEvent.objects.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=NATURAL_KEY_FIELDS,
+                update_fields=UPSERT_UPDATE_FIELDS,
+            )
+            updated = sum(1 for event in batch if _natural_key(event) in existing)
+            stats.updated += updated
+            stats.inserted += len(batch) - updated
+
+    stats.seconds = time.perf_counter() - started
+    return stats
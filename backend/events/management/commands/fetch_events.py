@@ -1,21 +1,43 @@
-from django.core.management.base import BaseCommand
-from events.models import GlobalEvent
+from django.core.management.base import BaseCommand, CommandError
+from events.ingest import DEFAULT_BATCH_SIZE, ingest_events
 from events.utils import fetch_trending_events
 
 class Command(BaseCommand):
     help = 'Fetch trending events from Google Trends and save to database'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Number of events written per bulk upsert statement',
+        )
+        parser.add_argument(
+            '--countries',
+            help='Comma-separated country codes to fetch holidays for (default: EVENT_HOLIDAY_COUNTRIES)',
+        )
+        parser.add_argument(
+            '--locations',
+            help='Comma-separated locations to fetch weather for (default: EVENT_WEATHER_LOCATIONS)',
+        )
+        parser.add_argument('--year', type=int, help='Holiday year (default: current year)')
+
     def handle(self, *args, **kwargs):
-        # Fetch events for India from Google Trends
-        events = fetch_trending_events()
+        if kwargs['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        # Fetch events from every configured source concurrently
+        events = fetch_trending_events(
+            countries=kwargs['countries'].split(',') if kwargs['countries'] else None,
+            locations=kwargs['locations'].split(',') if kwargs['locations'] else None,
+            year=kwargs['year'],
+        )
 
-        # Iterate through fetched events and save to the database
-        for event in events:
-            GlobalEvent.objects.get_or_create(
-                title=event['title'],
-                description=event['description'],
-                location=event['location'],  # Location is now set as India
-                trending_score=event['trending_score']
-            )
+        # Upsert fetched events in bulk, deduplicated on title + date + location
+        stats = ingest_events(events, batch_size=kwargs['batch_size'])
 
-        self.stdout.write(self.style.SUCCESS('Successfully fetched and stored events'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully fetched and stored events: {stats.inserted} inserted, '
+            f'{stats.updated} updated, {stats.skipped} skipped '
+            f'in {stats.seconds:.2f}s ({stats.rows_per_second:.0f} events/s)'
+        ))
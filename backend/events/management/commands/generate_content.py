@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from events.batch import generate_for_events
+from events.models import GlobalEvent
+
+class Command(BaseCommand):
+    help = 'Pre-generate and store social posts and video scripts for trending events'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--ids', help='Comma-separated event ids to generate content for')
+        target.add_argument('--top', type=int, help='Generate content for the top N trending events')
+        parser.add_argument('--concurrency', type=int, help='Maximum concurrent model calls')
+        parser.add_argument('--per-minute', type=int, help='Maximum model calls started per minute (0 = unlimited)')
+        parser.add_argument('--force', action='store_true', help='Regenerate content that is already up to date')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['ids']:
+            try:
+                ids = [int(event_id) for event_id in kwargs['ids'].split(',')]
+            except ValueError:
+                raise CommandError('--ids must be a comma-separated list of integers')
+            events = GlobalEvent.objects.filter(id__in=ids)
+        else:
+            if kwargs['top'] < 1:
+                raise CommandError('--top must be at least 1')
+            events = GlobalEvent.objects.ranked()[:kwargs['top']]
+        if kwargs['concurrency'] is not None and kwargs['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+
+        stats = generate_for_events(
+            events,
+            concurrency=kwargs['concurrency'],
+            per_minute=kwargs['per_minute'],
+            force=kwargs['force'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Content generation finished: {stats.generated} generated, '
+            f'{stats.skipped} up to date, {stats.failed} failed in {stats.seconds:.2f}s'
+        ))
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0004_alter_globalevent_event_type"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="globalevent",
+            index=models.Index(
+                fields=["event_type", "-trending_score", "-date"],
+                name="event_type_score_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="globalevent",
+            index=models.Index(
+                fields=["-trending_score", "-date"], name="event_score_date_idx"
+            ),
+        ),
+    ]
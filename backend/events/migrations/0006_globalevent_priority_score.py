@@ -0,0 +1,60 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:32
+
+from django.db import migrations, models, transaction
+from django.db.models import Case, F, Value, When
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill_priority_score(apps, schema_editor):
+    GlobalEvent = apps.get_model("events", "GlobalEvent")
+    db_alias = schema_editor.connection.alias
+    events = GlobalEvent.objects.using(db_alias)
+    # Mirrors GlobalEvent.get_event_priority_score() as of this migration
+    score = Case(
+        When(event_type__in=["Holiday", "Weather"], then=F("trending_score") + Value(50)),
+        default=F("trending_score"),
+        output_field=models.FloatField(),
+    )
+
+    # Walk the table in primary key ranges so each batch is a short transaction
+    last_id = 0
+    while True:
+        ids = list(
+            events.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:BACKFILL_BATCH_SIZE]
+        )
+        if not ids:
+            break
+        with transaction.atomic(using=db_alias):
+            events.filter(id__gte=ids[0], id__lte=ids[-1]).update(priority_score=score)
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("events", "0005_globalevent_ranking_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="globalevent",
+            name="event_score_date_idx",
+        ),
+        migrations.AddField(
+            model_name="globalevent",
+            name="priority_score",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_priority_score, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="globalevent",
+            index=models.Index(
+                fields=["-priority_score", "-date", "-id"],
+                name="event_priority_rank_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:40
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_events(apps, schema_editor):
+    """Keep the oldest row for each (title, date, location) so the constraint can be added."""
+    GlobalEvent = apps.get_model("events", "GlobalEvent")
+    events = GlobalEvent.objects.using(schema_editor.connection.alias)
+    # Grouped and compared in SQL; dates round-tripped through Python may no
+    # longer match how they are stored (e.g. date-only strings in SQLite)
+    keep_ids = events.values("title", "date", "location").annotate(keep_id=Min("id")).values("keep_id")
+    events.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0006_globalevent_priority_score"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_events, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="globalevent",
+            constraint=models.UniqueConstraint(
+                fields=("title", "date", "location"),
+                name="unique_event_title_date_location",
+            ),
+        ),
+    ]
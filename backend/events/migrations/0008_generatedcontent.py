@@ -0,0 +1,54 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("events", "0007_globalevent_unique_event_title_date_location"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeneratedContent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=32)),
+                ("model_name", models.CharField(max_length=100)),
+                ("prompt_hash", models.CharField(max_length=64)),
+                ("text", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="generated_content",
+                        to="events.globalevent",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["event", "kind", "-created_at"],
+                        name="content_event_kind_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("event", "kind", "prompt_hash"),
+                        name="unique_content_per_prompt",
+                    )
+                ],
+            },
+        ),
+    ]
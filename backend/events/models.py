@@ -1,4 +1,94 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.lookups import In
+from django.utils import timezone
+
+from events.cache import invalidate_event_responses
+
+# Event types that get a boost on top of their raw trending score
+BOOSTED_EVENT_TYPES = ['Holiday', 'Weather']
+PRIORITY_BOOST = 50
+
+# Fields that priority_score is derived from
+PRIORITY_SOURCE_FIELDS = {'event_type', 'trending_score'}
+
+# Marks an argument that wasn't passed, since None is a valid new event_type
+_UNSET = object()
+
+
+def _as_expression(value, output_field):
+    return value if hasattr(value, 'resolve_expression') else Value(value, output_field=output_field)
+
+
+def priority_score_expression(event_type=_UNSET, trending_score=_UNSET):
+    """
+    SQL equivalent of GlobalEvent.get_event_priority_score().
+
+    By default it reads the row's current columns; pass new values (plain or
+    expressions) to compute the score an UPDATE is about to produce.
+    """
+    event_type = F('event_type') if event_type is _UNSET else _as_expression(event_type, models.CharField())
+    trending_score = F('trending_score') if trending_score is _UNSET else _as_expression(trending_score, models.FloatField())
+    return Case(
+        When(In(event_type, BOOSTED_EVENT_TYPES), then=trending_score + Value(PRIORITY_BOOST)),
+        default=trending_score,
+        output_field=models.FloatField(),
+    )
+
+
+class GlobalEventQuerySet(models.QuerySet):
+    """
+    Bulk writes skip post_save, so besides keeping priority_score in step
+    they drop cached events responses themselves.
+    """
+
+    def ranked(self):
+        """Highest priority first, newest first on ties, id as a stable tie-breaker."""
+        return self.order_by('-priority_score', '-date', '-id')
+
+    def update(self, **kwargs):
+        # Keep the stored score in step when its inputs change in bulk
+        if PRIORITY_SOURCE_FIELDS & kwargs.keys():
+            kwargs.setdefault('priority_score', priority_score_expression(
+                event_type=kwargs.get('event_type', _UNSET),
+                trending_score=kwargs.get('trending_score', _UNSET),
+            ))
+        rows = super().update(**kwargs)
+        if rows:
+            invalidate_event_responses()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.refresh_priority_score()
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            invalidate_event_responses()
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if PRIORITY_SOURCE_FIELDS & set(fields):
+            for obj in objs:
+                obj.refresh_priority_score()
+            if 'priority_score' not in fields:
+                fields.append('priority_score')
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if rows:
+            invalidate_event_responses()
+        return rows
+
+    def refresh_priority_scores(self):
+        """Recompute the stored score for every row in this queryset."""
+        rows = super().update(priority_score=priority_score_expression())
+        if rows:
+            invalidate_event_responses()
+        return rows
+
 
 class GlobalEvent(models.Model):
     title = models.CharField(max_length=255)
@@ -7,17 +97,64 @@ class GlobalEvent(models.Model):
     event_type = models.CharField(max_length=255, null=True, blank=True)
     date = models.DateTimeField()
     trending_score = models.FloatField()
+    # Denormalized get_event_priority_score(), maintained on every write
+    priority_score = models.FloatField(default=0, editable=False)
+
+    objects = GlobalEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event_type', '-trending_score', '-date'], name='event_type_score_date_idx'),
+            models.Index(fields=['-priority_score', '-date', '-id'], name='event_priority_rank_idx'),
+        ]
+        constraints = [
+            # Natural key used by the bulk upsert in events.ingest
+            models.UniqueConstraint(fields=['title', 'date', 'location'], name='unique_event_title_date_location'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.refresh_priority_score()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and PRIORITY_SOURCE_FIELDS & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'priority_score'}
+        super().save(*args, **kwargs)
+
+    def refresh_priority_score(self):
+        self.priority_score = self.get_event_priority_score()
+
     def is_upcoming(self):
         """Check if the event is upcoming in the next 10 days"""
         return self.date >= timezone.now() and self.date <= timezone.now() + timedelta(days=10)
 
     def get_event_priority_score(self):
         """Return an adjusted score based on event type and proximity."""
-        if self.event_type in ['Holiday', 'Weather']:
+        if self.event_type in BOOSTED_EVENT_TYPES:
             # Boost the trending score for holidays and weather-related events
-            return self.trending_score + 50
+            return self.trending_score + PRIORITY_BOOST
         return self.trending_score
+
+
+class GeneratedContent(models.Model):
+    """Model output for an event, stored so it is generated once per prompt."""
+
+    event = models.ForeignKey(GlobalEvent, on_delete=models.CASCADE, related_name='generated_content')
+    kind = models.CharField(max_length=32)
+    model_name = models.CharField(max_length=100)
+    # events.content.content_cache_key(): changes with the model, prompt template or event text
+    prompt_hash = models.CharField(max_length=64)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'kind', '-created_at'], name='content_event_kind_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'kind', 'prompt_hash'], name='unique_content_per_prompt'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} for {self.event}'
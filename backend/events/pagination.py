@@ -0,0 +1,68 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(event):
+    """Build an opaque cursor from the ranking key of the last event on a page."""
+    payload = json.dumps([event.priority_score, event.date.isoformat(), event.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, date, event_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        date = parse_datetime(date)
+        if date is None:
+            raise ValueError('bad date')
+        return float(score), date, int(event_id)
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def keyset_page(queryset, limit, after=None):
+    """
+    Return one page of a queryset ranked by (-priority_score, -date, -id).
+
+    Instead of OFFSET, rows are filtered to those strictly after the cursor's
+    ranking key, so the cost of a page does not grow with its position.
+    Returns (events, next_cursor); next_cursor is None on the last page.
+    With no limit, every remaining row is returned as a single page.
+    """
+    if after:
+        score, date, event_id = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(priority_score__lt=score)
+            | Q(priority_score=score, date__lt=date)
+            | Q(priority_score=score, date=date, id__lt=event_id)
+        )
+
+    if limit is None:
+        return list(queryset), None
+
+    # Fetch one extra row to know whether another page exists
+    events = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(events[limit - 1]) if len(events) > limit else None
+    return events[:limit], next_cursor
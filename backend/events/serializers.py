@@ -1,7 +1,18 @@
 from rest_framework import serializers
 from .models import GlobalEvent
+from .store import stored_content
 
 class GlobalEventSerializer(serializers.ModelSerializer):
     class Meta:
         model = GlobalEvent
         fields = ['id', 'title', 'description', 'location', 'event_type', 'date', 'trending_score']
+
+class GlobalEventDetailSerializer(GlobalEventSerializer):
+    # Fresh stored content only; reading an event never triggers generation
+    generatedContent = serializers.SerializerMethodField()
+
+    class Meta(GlobalEventSerializer.Meta):
+        fields = GlobalEventSerializer.Meta.fields + ['generatedContent']
+
+    def get_generatedContent(self, obj):
+        return stored_content(obj)
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from events.cache import invalidate_event_responses
+from events.models import GeneratedContent, GlobalEvent
+
+
+@receiver(post_save, sender=GlobalEvent)
+@receiver(post_delete, sender=GlobalEvent)
+@receiver(post_save, sender=GeneratedContent)
+@receiver(post_delete, sender=GeneratedContent)
+def invalidate_cached_events(sender, **kwargs):
+    invalidate_event_responses()
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from events.content import CONTENT_KINDS, content_cache_key, generate_event_content
+from events.models import GeneratedContent
+
+
+def fresh_content_queryset():
+    """Stored content young enough to serve (CONTENT_STORE_TTL of 0 never expires)."""
+    queryset = GeneratedContent.objects.all()
+    if settings.CONTENT_STORE_TTL:
+        queryset = queryset.filter(created_at__gte=timezone.now() - timedelta(seconds=settings.CONTENT_STORE_TTL))
+    return queryset
+
+
+def stored_content(event):
+    """
+    Return {kind: text} for every kind with fresh stored content for the event.
+
+    Rows whose prompt hash no longer matches the event text, model or
+    prompt template are stale and ignored.
+    """
+    hashes = {content_cache_key(kind, event.title, event.description): kind for kind in CONTENT_KINDS}
+    rows = (
+        fresh_content_queryset()
+        .filter(event=event, prompt_hash__in=hashes)
+        .values_list('kind', 'prompt_hash', 'text')
+    )
+    return {kind: text for kind, prompt_hash, text in rows if hashes.get(prompt_hash) == kind}
+
+
+def save_content(event, kind, text):
+    GeneratedContent.objects.update_or_create(
+        event=event,
+        kind=kind,
+        prompt_hash=content_cache_key(kind, event.title, event.description),
+        defaults={
+            'text': text,
+            'model_name': settings.CONTENT_MODEL_NAME,
+            # Restart the freshness window when stale content is regenerated
+            'created_at': timezone.now(),
+        },
+    )
+
+
+def get_or_generate_content(event):
+    """Serve stored content for an event, generating and storing only the missing or stale kinds."""
+    content = stored_content(event)
+    missing = [kind for kind in CONTENT_KINDS if kind not in content]
+    if missing:
+        generated = generate_event_content(event.title, event.description, kinds=missing)
+        for kind, text in generated.items():
+            save_content(event, kind, text)
+        content.update(generated)
+    return content
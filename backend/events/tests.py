@@ -1,3 +1,405 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone as django_timezone
+
+from . import content, utils
+from .batch import generate_for_events
+from .cache import GENERATION_KEY, response_cache_key
+from .models import GeneratedContent, GlobalEvent
+from .store import get_or_generate_content, stored_content
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'events': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'events-tests'},
+}
+
+
+def make_event(title, trending_score, event_type=None, day=1, location='Mumbai'):
+    return GlobalEvent.objects.create(
+        title=title,
+        location=location,
+        event_type=event_type,
+        date=datetime(2025, 1, day, tzinfo=timezone.utc),
+        trending_score=trending_score,
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TrendingEventsViewTests(TestCase):
+    def setUp(self):
+        caches['events'].clear()
+        for i in range(60):
+            make_event(f'Event {i}', trending_score=i, day=i % 28 + 1)
+
+    def test_no_params_returns_the_full_ranked_list(self):
+        response = self.client.get('/api/trending-events/')
+        self.assertEqual(response.status_code, 200)
+        scores = [event['trending_score'] for event in response.json()]
+        self.assertEqual(len(scores), 60)
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertNotIn('X-Next-Cursor', response)
+
+    def test_no_params_is_capped_at_the_max_page_size(self):
+        with mock.patch('events.views.MAX_PAGE_SIZE', 40):
+            response = self.client.get('/api/trending-events/')
+        self.assertEqual(len(response.json()), 40)
+        rest = self.client.get('/api/trending-events/', {'after': response['X-Next-Cursor'], 'limit': 40})
+        self.assertEqual(len(rest.json()), 20)
+
+    def test_limit_pages_with_cursor(self):
+        first = self.client.get('/api/trending-events/', {'limit': 25})
+        self.assertEqual(len(first.json()), 25)
+        cursor = first['X-Next-Cursor']
+
+        # A cursor without a limit pages at the default size
+        second = self.client.get('/api/trending-events/', {'after': cursor})
+        self.assertEqual(len(second.json()), 35)
+        seen = {event['id'] for event in first.json()} | {event['id'] for event in second.json()}
+        self.assertEqual(len(seen), 60)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EventResponseCacheTests(TestCase):
+    def setUp(self):
+        caches['events'].clear()
+
+    def get_trending(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/trending-events/', **headers)
+
+    def test_matching_etag_is_answered_with_304(self):
+        make_event('Diwali', trending_score=10)
+        first = self.get_trending()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.get_trending(first['ETag']).status_code, 304)
+
+    def test_writes_invalidate_cached_responses(self):
+        writes = {
+            'save': lambda event: (setattr(event, 'trending_score', 99), event.save()),
+            'update': lambda event: GlobalEvent.objects.filter(pk=event.pk).update(trending_score=99),
+            'bulk_update': lambda event: GlobalEvent.objects.bulk_update(
+                [setattr(event, 'trending_score', 99) or event], ['trending_score']
+            ),
+            'bulk_create': lambda event: GlobalEvent.objects.bulk_create([GlobalEvent(
+                title='Holi', date=event.date, trending_score=99,
+            )]),
+            'delete': lambda event: event.delete(),
+        }
+        for name, write in writes.items():
+            with self.subTest(name):
+                GlobalEvent.objects.all().delete()
+                caches['events'].clear()
+                event = make_event('Diwali', trending_score=10)
+                first = self.get_trending()
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    write(event)
+
+                second = self.get_trending(first['ETag'])
+                self.assertEqual(second.status_code, 200)
+                self.assertNotEqual(second.json(), first.json())
+                self.assertNotEqual(second['ETag'], first['ETag'])
+
+    def test_culled_generation_does_not_revive_old_entries(self):
+        before = response_cache_key('trending', None, None)
+        # MAX_ENTRIES culling can evict the generation key like any other entry
+        caches['events'].delete(GENERATION_KEY)
+        self.assertNotEqual(response_cache_key('trending', None, None), before)
+
+
+class PriorityScoreTests(TestCase):
+    def test_bulk_update_keeps_priority_score_in_step(self):
+        holiday = make_event('Holiday', trending_score=10, event_type='Holiday')
+        self.assertEqual(holiday.priority_score, 60)
+
+        GlobalEvent.objects.filter(pk=holiday.pk).update(trending_score=20)
+        holiday.refresh_from_db()
+        self.assertEqual(holiday.priority_score, 70)
+
+    def test_update_to_null_event_type_drops_the_boost(self):
+        holiday = make_event('Holiday', trending_score=10, event_type='Holiday')
+
+        GlobalEvent.objects.filter(pk=holiday.pk).update(event_type=None)
+        holiday.refresh_from_db()
+        self.assertEqual(holiday.priority_score, 10)
+
+
+class RemoveDuplicateEventsMigrationTests(TransactionTestCase):
+    migrate_from = ('events', '0006_globalevent_priority_score')
+    migrate_to = ('events', '0007_globalevent_unique_event_title_date_location')
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def tearDown(self):
+        self.migrate(('events', '0008_generatedcontent'))
+
+    def test_duplicates_are_removed_before_the_constraint(self):
+        self.migrate(self.migrate_from)
+        # Seed rows the way older ingests stored them: date-only strings
+        ids = []
+        with connection.cursor() as cursor:
+            for title, date in [('Ramzan Id/Eid-ul-Fitar', '2025-03-31'),
+                                ('Ramzan Id/Eid-ul-Fitar', '2025-03-31'),
+                                ('Ramzan Id/Eid-ul-Fitar', '2025-03-31'),
+                                ('Holi', '2025-03-14')]:
+                cursor.execute(
+                    'INSERT INTO events_globalevent (title, description, location, event_type, date,'
+                    ' trending_score, priority_score) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                    [title, 'No description', 'India', 'Holiday', date, 10, 60],
+                )
+                ids.append(cursor.lastrowid)
+
+        apps = self.migrate(self.migrate_to)
+        GlobalEvent = apps.get_model('events', 'GlobalEvent')
+        titles = sorted(GlobalEvent.objects.values_list('title', flat=True))
+        self.assertEqual(titles, ['Holi', 'Ramzan Id/Eid-ul-Fitar'])
+        # The oldest row of each group is the one kept
+        self.assertEqual(GlobalEvent.objects.get(title='Ramzan Id/Eid-ul-Fitar').id, ids[0])
+
+
+class ProviderStub(BaseHTTPRequestHandler):
+    """Local stand-in for Calendarific (/holidays) and OpenWeatherMap (/weather)"""
+
+    requests = []
+    failures = {}  # query value -> responses left to fail with 503
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        target = query.get('country') or query.get('q')
+        self.requests.append((url.path, target))
+        if self.failures.get(target):
+            self.failures[target] -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        if url.path == '/holidays':
+            body = {'response': {'holidays': [{
+                'name': f'Holiday in {target}',
+                'description': 'A public holiday',
+                'country': {'name': target},
+                'date': {'iso': '2025-01-26'},
+            }]}}
+        else:
+            body = {'weather': [{'main': 'Rain' if target.startswith('Rainy') else 'Clear'}]}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FetchTrendingEventsTests(TestCase):
+    def setUp(self):
+        ProviderStub.requests = []
+        ProviderStub.failures = {}
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ProviderStub)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        base_url = f'http://127.0.0.1:{self.server.server_port}'
+        settings = override_settings(
+            CALENDARIFIC_URL=f'{base_url}/holidays',
+            OPENWEATHER_URL=f'{base_url}/weather',
+            EVENT_FETCH_RETRIES=2,
+            EVENT_FETCH_BACKOFF=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # The shared session picks up retry settings when it is first built
+        utils._session = None
+        self.addCleanup(setattr, utils, '_session', None)
+
+    def test_fetches_every_country_and_location(self):
+        events = utils.fetch_trending_events(
+            countries=['IN', 'US', 'GB'], locations=['Rainy City', 'Dry Town'], year=2025
+        )
+        titles = sorted(event['title'] for event in events)
+        self.assertEqual(titles, ['Heavy Rain Alert', 'Holiday in GB', 'Holiday in IN', 'Holiday in US'])
+        self.assertEqual(len(ProviderStub.requests), 5)
+
+    def test_retries_transient_errors(self):
+        ProviderStub.failures = {'US': 1}
+        events = utils.fetch_trending_events(countries=['US'], locations=['Dry Town'], year=2025)
+        self.assertEqual([event['title'] for event in events], ['Holiday in US'])
+        self.assertEqual(ProviderStub.requests.count(('/holidays', 'US')), 2)
+
+    def test_a_failing_source_is_skipped(self):
+        ProviderStub.failures = {'Rainy Falls': 10}
+        events = utils.fetch_trending_events(countries=['IN'], locations=['Rainy Falls', 'Rainy City'], year=2025)
+        self.assertEqual(sorted(event['location'] for event in events), ['IN', 'Rainy City'])
+
+
+class SlowFakeContentClient(content.FakeContentClient):
+    def generate(self, prompt):
+        time.sleep(0.1)
+        return super().generate(prompt)
+
+
+class FakeContentClientTestCase(TestCase):
+    def setUp(self):
+        self.fake = content.FakeContentClient('fake-model')
+        self.use_client(self.fake)
+
+    def use_client(self, client):
+        content._cache.clear()
+        self.addCleanup(content._cache.clear)
+        self.addCleanup(setattr, content, '_client', None)
+        content._client = client
+
+
+class ContentGenerationTests(FakeContentClientTestCase):
+    def test_generated_content_is_cached_per_event(self):
+        first = content.generate_event_content('Diwali', 'Festival of lights')
+        second = content.generate_event_content('Diwali', 'Festival of lights')
+        self.assertEqual(first, second)
+        self.assertEqual(set(first), {content.SOCIAL_MEDIA, content.VIDEO_SCRIPT})
+        self.assertEqual(self.fake.calls, 2)
+
+        content.generate_event_content('Diwali', 'A different description')
+        self.assertEqual(self.fake.calls, 4)
+
+    def test_concurrent_requests_share_one_model_call(self):
+        client = SlowFakeContentClient('fake-model')
+        self.use_client(client)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                content.generate_text(content.SOCIAL_MEDIA, 'Holi', 'Festival of colours')
+            ))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(client.calls, 1)
+
+    def test_streamed_content_is_cached(self):
+        streamed = {}
+        for kind, chunk in content.stream_event_content('Pongal', 'Harvest festival'):
+            streamed[kind] = streamed.get(kind, '') + chunk
+        self.assertEqual(streamed, content.generate_event_content('Pongal', 'Harvest festival'))
+        self.assertEqual(self.fake.calls, 2)
+
+    @override_settings(CONTENT_CLIENT='events.content.FakeContentClient')
+    def test_client_class_comes_from_settings(self):
+        content._client = None
+        self.assertIsInstance(content.get_content_client(), content.FakeContentClient)
+
+
+class StoredContentTests(FakeContentClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.event = make_event('Diwali', trending_score=10)
+
+    def generate(self):
+        # Skip the in-memory cache so only the stored rows can save a model call
+        content._cache.clear()
+        return get_or_generate_content(self.event)
+
+    def test_stored_content_is_reused_while_fresh(self):
+        first = self.generate()
+        self.assertEqual(GeneratedContent.objects.filter(event=self.event).count(), 2)
+        self.assertEqual(self.generate(), first)
+        self.assertEqual(self.fake.calls, 2)
+
+    def test_content_is_regenerated_when_the_event_text_changes(self):
+        first = self.generate()
+        self.event.description = 'Festival of lights'
+        self.event.save()
+        second = self.generate()
+        self.assertNotEqual(second, first)
+        self.assertEqual(self.fake.calls, 4)
+        self.assertEqual(stored_content(self.event), second)
+
+    @override_settings(CONTENT_STORE_TTL=3600)
+    def test_expired_content_is_regenerated(self):
+        self.generate()
+        GeneratedContent.objects.update(created_at=django_timezone.now() - timedelta(hours=2))
+        self.assertEqual(stored_content(self.event), {})
+        self.generate()
+        self.assertEqual(self.fake.calls, 4)
+        # Regenerating replaces the stale rows instead of adding more
+        self.assertEqual(GeneratedContent.objects.filter(event=self.event).count(), 2)
+
+
+class RateLimitedOnce(Exception):
+    code = 429
+
+
+class FlakyFakeContentClient(content.FakeContentClient):
+    """Rate limited on its first call, like a model API over quota"""
+
+    def generate(self, prompt):
+        if self.calls == 0:
+            self.calls += 1
+            raise RateLimitedOnce('quota exceeded')
+        return super().generate(prompt)
+
+
+class BatchContentGenerationTests(FakeContentClientTestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = [make_event('Diwali', 10), make_event('Holi', 20, day=2)]
+        self.ids = ','.join(str(event.id) for event in self.events)
+
+    def run_command(self, *args):
+        out = StringIO()
+        content._cache.clear()
+        call_command('generate_content', '--ids', self.ids, '--per-minute', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_stores_content_then_skips_fresh_rows(self):
+        self.assertIn('4 generated, 0 up to date, 0 failed', self.run_command())
+        self.assertEqual(GeneratedContent.objects.count(), 4)
+
+        self.assertIn('0 generated, 4 up to date, 0 failed', self.run_command())
+        self.assertEqual(self.fake.calls, 4)
+
+    def test_force_regenerates_fresh_rows(self):
+        self.run_command()
+        self.assertIn('4 generated, 0 up to date', self.run_command('--force'))
+        self.assertEqual(self.fake.calls, 8)
+        self.assertEqual(GeneratedContent.objects.count(), 4)
+
+    def test_changed_events_are_regenerated(self):
+        self.run_command()
+        GlobalEvent.objects.filter(pk=self.events[0].pk).update(description='Festival of lights')
+        self.assertIn('2 generated, 2 up to date', self.run_command())
+
+    def test_rate_limit_errors_are_retried_with_backoff(self):
+        client = FlakyFakeContentClient('fake-model')
+        self.use_client(client)
+        stats = generate_for_events(self.events[:1], concurrency=1, per_minute=0, backoff=0)
+        self.assertEqual((stats.generated, stats.failed), (2, 0))
+        self.assertEqual(client.calls, 3)
+
+    def test_other_errors_are_not_retried(self):
+        client = content.FakeContentClient('fake-model')
+        client.generate = mock.Mock(side_effect=ValueError('bad prompt'))
+        self.use_client(client)
+        stats = generate_for_events(self.events[:1], concurrency=1, per_minute=0, backoff=0)
+        self.assertEqual((stats.generated, stats.failed), (0, 2))
+        self.assertEqual(client.generate.call_count, 2)
@@ -1,43 +1,92 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Process-wide requests session shared by all event providers.
+
+    Connections are pooled per host and idempotent GETs are retried with
+    exponential backoff on connection errors, 429s and 5xx responses.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=settings.EVENT_FETCH_RETRIES,
+                backoff_factor=settings.EVENT_FETCH_BACKOFF,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['GET'],
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=len(settings.EVENT_PROVIDER_CONCURRENCY),
+                pool_maxsize=max(settings.EVENT_PROVIDER_CONCURRENCY.values()),
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
 
 # Example function to fetch global holidays using Calendarific API
-def fetch_global_holidays():
+def fetch_global_holidays(country='IN', year=None, session=None):
     holidays = []
-    url = 'https://calendarific.com/api/v2/holidays'
+    session = session or get_session()
     params = {
-        'api_key': 'rh43rV6WUyrGvOpLND4Xgqw60fHtBh4B',
-        'country': 'IN',  # India
-        'year': '2025'  # Example year
+        'api_key': settings.CALENDARIFIC_API_KEY,
+        'country': country,
+        'year': year or timezone.now().year,
     }
-    response = requests.get(url, params=params)
+    response = session.get(settings.CALENDARIFIC_URL, params=params, timeout=settings.EVENT_FETCH_TIMEOUT)
+    response.raise_for_status()
     data = response.json()
 
     for holiday in data['response']['holidays']:
         holidays.append({
             "title": holiday['name'],
             "description": holiday['description'],
-            "location": "India",
+            "location": holiday.get('country', {}).get('name') or country,
             "event_type": "Holiday",
+            "date": holiday['date']['iso'],
             "trending_score": 85  # Example score for holidays
         })
 
     return holidays
 
 # Example function to fetch location-specific events (weather changes, local festivals)
-def fetch_location_events(location):
+def fetch_location_events(location, session=None):
     # Example using OpenWeatherMap for significant weather changes
     weather_events = []
-    weather_api_key = '6b734670c9afdd12cfce70f6f48d6a08'
-    weather_url = f'http://api.openweathermap.org/data/2.5/weather?q={location}&appid={weather_api_key}'
-    weather_response = requests.get(weather_url)
+    session = session or get_session()
+    params = {'q': location, 'appid': settings.OPENWEATHER_API_KEY}
+    weather_response = session.get(settings.OPENWEATHER_URL, params=params, timeout=settings.EVENT_FETCH_TIMEOUT)
+    weather_response.raise_for_status()
     weather_data = weather_response.json()
 
-    if weather_data['weather'][0]['main'] == 'Rain':
+    conditions = weather_data.get('weather') or [{}]
+    if conditions[0].get('main') == 'Rain':
         weather_events.append({
             "title": "Heavy Rain Alert",
             "description": f"Heavy rain expected in {location}",
             "location": location,
             "event_type": "Weather Change",
+            # One alert per location per day
+            "date": timezone.now().replace(hour=0, minute=0, second=0, microsecond=0),
             "trending_score": 90
         })
 
@@ -47,15 +96,38 @@ def fetch_location_events(location):
     return weather_events
 
 # Fetch trending events (global and location-specific events)
-def fetch_trending_events():
+def fetch_trending_events(countries=None, locations=None, year=None):
+    """
+    Fetch holidays for every country and weather alerts for every location concurrently.
+
+    Each provider gets its own thread pool sized from EVENT_PROVIDER_CONCURRENCY,
+    so a slow provider cannot starve the other or exceed its own rate limits.
+    A failed request is logged and skipped rather than aborting the whole run.
+    """
+    countries = countries or settings.EVENT_HOLIDAY_COUNTRIES
+    locations = locations or settings.EVENT_WEATHER_LOCATIONS
+    session = get_session()
+    concurrency = settings.EVENT_PROVIDER_CONCURRENCY
     events = []
 
-    # Global Events: Holidays and Festivals (Example using Calendarific API)
-    holidays = fetch_global_holidays()  # Fetch global holidays via an API like Calendarific
-    events.extend(holidays)
+    with ThreadPoolExecutor(max_workers=concurrency['calendarific'], thread_name_prefix='calendarific') as holiday_pool, \
+            ThreadPoolExecutor(max_workers=concurrency['openweathermap'], thread_name_prefix='openweathermap') as weather_pool:
+        # Global Events: Holidays and Festivals (Example using Calendarific API)
+        futures = {
+            holiday_pool.submit(fetch_global_holidays, country, year, session): ('holidays', country)
+            for country in countries
+        }
+        # Location-Specific Events (Example using OpenWeatherMap API)
+        futures.update({
+            weather_pool.submit(fetch_location_events, location, session): ('weather', location)
+            for location in locations
+        })
 
-    # Location-Specific Events (Example using OpenWeatherMap API)
-    location_events = fetch_location_events("India")  # Fetch weather changes, local festivals
-    events.extend(location_events)
+        for future in as_completed(futures):
+            source, target = futures[future]
+            try:
+                events.extend(future.result())
+            except (requests.RequestException, KeyError, ValueError) as e:
+                logger.warning("Failed to fetch %s for %s: %s", source, target, e)
 
     return events
@@ -2,28 +2,39 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from datetime import datetime
 from events.models import GlobalEvent
-from .serializers import GlobalEventSerializer
+from .serializers import GlobalEventDetailSerializer, GlobalEventSerializer
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, parse_limit
+from .cache import cached_json_response
+from .content import generate_event_content, stream_event_content
+from .store import get_or_generate_content
 import pytz  # To handle timezone
 from rest_framework import status
-import google.generativeai as genai
 from django.conf import settings
-import os
+from django.http import StreamingHttpResponse
+import json
 
 @api_view(['GET'])
 def get_trending_events(request):
-    # Fetch all events
-    events = GlobalEvent.objects.all()
+    after = request.query_params.get('after')
+    try:
+        # Without limit or after, clients get up to MAX_PAGE_SIZE events, and
+        # X-Next-Cursor if there are more; never the whole table
+        limit = parse_limit(request.query_params.get('limit'), default=DEFAULT_PAGE_SIZE if after else MAX_PAGE_SIZE)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def build():
+        # Rank in the database and return one keyset page at a time
+        try:
+            events, next_cursor = keyset_page(GlobalEvent.objects.ranked(), limit, after=after)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Sort events by priority score
-    sorted_events = sorted(events, key=lambda x: (
-        x.get_event_priority_score(),
-        # Convert event date to naive datetime (if it's aware, remove tzinfo)
-        x.date.replace(tzinfo=None) if x.date.tzinfo else x.date
-    ), reverse=True)
+        # Serialize the events
+        serializer = GlobalEventSerializer(events, many=True)
+        return serializer.data, {'X-Next-Cursor': next_cursor} if next_cursor else {}
 
-    # Serialize the events
-    serializer = GlobalEventSerializer(sorted_events, many=True)
-    return Response(serializer.data)
+    return cached_json_response(request, ('trending', limit, after), build)
 
 @api_view(['POST'])
 def generate_content(request):
@@ -32,59 +43,23 @@ def generate_content(request):
         if not event:
             return Response({'error': 'Event data is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Configure Gemini API
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            return Response(
-                {'error': 'GEMINI_API_KEY not configured'}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-pro')
+        stored_event = None
+        if event.get('id') is not None:
+            try:
+                stored_event = GlobalEvent.objects.get(id=event['id'])
+            except (GlobalEvent.DoesNotExist, ValueError, TypeError):
+                return Response({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
 
         try:
-            # Generate social media posts
-            social_prompt = f"""Create 5 engaging social media posts for the following event:
-            Title: {event.get('title', 'No title provided')}
-            Description: {event.get('description', 'No description provided')}
-            
-            For each post:
-            1. Include relevant hashtags
-            2. Use appropriate emojis
-            3. Keep it engaging and concise
-            4. Add a call-to-action
-            5. Format each post clearly with a number (1-5)
-            
-            Make the posts diverse - some emotional, some informative, some urgent."""
-            
-            social_response = model.generate_content(social_prompt)
-            if not social_response or not hasattr(social_response, 'text'):
-                raise Exception('Failed to generate social media content')
-
-            # Generate video script
-            video_prompt = f"""Create a compelling 60-second video script for the following event:
-            Title: {event.get('title', 'No title provided')}
-            Description: {event.get('description', 'No description provided')}
-            
-            Include:
-            1. Opening hook (5-10 seconds)
-            2. Main message and key points (40-45 seconds)
-            3. Strong call-to-action (5-10 seconds)
-            4. Visual descriptions and transitions
-            5. Background music/mood suggestions
-            
-            Format it with clear sections and timing indicators."""
-            
-            video_response = model.generate_content(video_prompt)
-            if not video_response or not hasattr(video_response, 'text'):
-                raise Exception('Failed to generate video script content')
+            if stored_event:
+                # Serve stored content, generating only what is missing or stale
+                content = get_or_generate_content(stored_event)
+            else:
+                # Served from the content cache; concurrent requests for the same
+                # event share a single upstream Gemini call
+                content = generate_event_content(event.get('title'), event.get('description'))
+            return Response(content)
 
-            return Response({
-                'socialMedia': social_response.text,
-                'videoScript': video_response.text
-            })
-            
         except Exception as api_error:
             print(f"Gemini API Error: {str(api_error)}")  # Log the specific API error
             return Response(
@@ -99,14 +74,41 @@ def generate_content(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_view(['POST'])
+def stream_content(request):
+    """Stream social posts and the video script as server-sent events while they generate."""
+    event = request.data.get('event')
+    if not event:
+        return Response({'error': 'Event data is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    def events():
+        for kind, chunk in stream_event_content(event.get('title'), event.get('description')):
+            if isinstance(chunk, Exception):
+                print(f"Gemini API Error: {str(chunk)}")  # Log the specific API error
+                yield _sse('error', {'kind': kind, 'error': f'Content generation failed: {str(chunk)}'})
+            else:
+                yield _sse(kind, {'delta': chunk})
+        yield _sse('done', {})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop proxies from buffering the stream
+    return response
+
 @api_view(['GET'])
 def get_event(request, event_id):
-    try:
-        event = GlobalEvent.objects.get(id=event_id)
-        serializer = GlobalEventSerializer(event)
-        return Response(serializer.data)
-    except GlobalEvent.DoesNotExist:
-        return Response(
-            {'error': 'Event not found'}, 
-            status=status.HTTP_404_NOT_FOUND
-        )
+    def build():
+        try:
+            event = GlobalEvent.objects.get(id=event_id)
+        except GlobalEvent.DoesNotExist:
+            return Response(
+                {'error': 'Event not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        serializer = GlobalEventDetailSerializer(event)
+        return serializer.data, {}
+
+    return cached_json_response(request, ('event', event_id), build)
@@ -46,7 +46,8 @@ const EventTrigger = () => {
 
   const fetchTrendingEvent = async () => {
     try {
-      const response = await fetch("http://127.0.0.1:8000/api/trending-events/");
+      // Only the top-ranked event is shown, so ask for a single-item page
+      const response = await fetch("http://127.0.0.1:8000/api/trending-events/?limit=1");
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
@@ -69,6 +69,7 @@ export default function CampaignBuilder() {
                 platform: data.platform,
                 content: data.content,
                 imageUrl: data.imageUrl,
+                imageHash: data.imageHash,
                 createdAt: data.createdAt,
                 eventTitle: data.eventTitle
               });
@@ -321,11 +322,16 @@ export default function CampaignBuilder() {
                   body: JSON.stringify({
                     text: tweetText,
                     imagePath: content.imageUrl,
+                    imageHash: content.imageHash,
                   }),
                 });
                 
                 if (!response.ok) {
                   const errorData = await response.json();
+                  if (errorData.expired) {
+                    // Saved images that were never pinned expire after the backend's UPLOAD_TTL
+                    alert('The image for this content has expired. Please regenerate it in the Content Studio and save it again.');
+                  }
                   throw new Error(`Failed to post to Twitter: ${errorData.message}`);
                 }
               } catch (localImageError) {
@@ -47,7 +47,12 @@ const ContentGenerator = () => {
       }
       
       setEventData(data);
-      await generateContent(data);
+      // Use stored content when the backend already has it
+      if (data.generatedContent?.socialMedia && data.generatedContent?.videoScript) {
+        setGeneratedContent(data.generatedContent);
+      } else {
+        await generateContent(data);
+      }
     } catch (error) {
       console.error('Error fetching event data:', error);
       setError(error.message || 'Failed to load event data. Please try again later.');
@@ -69,6 +74,7 @@ const ContentGenerator = () => {
         },
         body: JSON.stringify({ 
           event: {
+            id: event.id,
             title: event.title,
             description: event.description
           }
@@ -30,6 +30,7 @@ export default function ContentStudio() {
     imagePrompt: '',
     savingToCampaign: false,
     imagePath: null,
+    imageHash: null,
   });
   const [generatedImage, setGeneratedImage] = useState(null);
   const [adCreativeData, setAdCreativeData] = useState({
@@ -333,7 +334,8 @@ export default function ContentStudio() {
           // Update the image path for later use when saving to campaigns
           setSocialMediaData(prev => ({
             ...prev,
-            imagePath: saveData.imagePath
+            imagePath: saveData.imagePath,
+            imageHash: saveData.imageHash
           }));
         }
       } catch (saveError) {
@@ -416,11 +418,24 @@ export default function ContentStudio() {
 
       // Get the image URL or path
       let imageUrl = null;
+      let imageHash = null;
       
-      // Prefer the local file path if available
-      if (socialMediaData.imagePath) {
-        imageUrl = socialMediaData.imagePath;
-      } else if (generatedImage) {
+      // Prefer the local file path if available. Saved images expire after the
+      // backend's UPLOAD_TTL unless pinned, so pin it for the campaign to use later
+      if (socialMediaData.imagePath && socialMediaData.imageHash) {
+        try {
+          const pinResponse = await fetch(`http://127.0.0.1:5000/api/uploads/${socialMediaData.imageHash}/pin`, {
+            method: 'POST',
+          });
+          if (pinResponse.ok) {
+            imageUrl = socialMediaData.imagePath;
+            imageHash = socialMediaData.imageHash;
+          }
+        } catch (pinError) {
+          console.error('Error pinning saved image:', pinError);
+        }
+      }
+      if (!imageUrl && generatedImage) {
         // Fall back to data URL if no local path is available
         imageUrl = generatedImage;
       }
@@ -433,6 +448,7 @@ export default function ContentStudio() {
         content: socialMediaData.preview,
         prompt: prompt,
         imageUrl: imageUrl,
+        imageHash: imageHash,
         createdAt: new Date().toISOString(),
         metadata: {
           tone: advancedOptions.tone,
@@ -7,16 +7,30 @@ const FineTunePage = () => {
   const [generatedImage, setGeneratedImage] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
 
+  // wait=true answers 202 without an image if the job outlives the server's wait; poll until it finishes
+  const waitForJob = async (job) => {
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      const response = await axios.get(`http://localhost:8000/jobs/${job.job_id}`);
+      job = response.data;
+    }
+    if (job.status !== 'succeeded') {
+      throw new Error(job.error || `Generation ${job.status}`);
+    }
+    return job;
+  };
+
   const handleGenerate = async () => {
     try {
       setIsLoading(true);
-      const response = await axios.post('http://localhost:8000/generate', {
+      const response = await axios.post('http://localhost:8000/generate?wait=true', {
         prompt,
         negative_prompt: negativePrompt,
         num_steps: 30,
         guidance_scale: 7.5
       });
-      setGeneratedImage(`data:image/png;base64,${response.data.image}`);
+      const job = await waitForJob(response.data);
+      setGeneratedImage(`data:image/${job.format};base64,${job.image}`);
     } catch (error) {
       console.error('Error generating image:', error);
       alert('Failed to generate image');
@@ -0,0 +1,196 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    image_url TEXT,
+    permalink TEXT,
+    likes INTEGER NOT NULL DEFAULT 0,
+    retweets INTEGER NOT NULL DEFAULT 0,
+    comments INTEGER NOT NULL DEFAULT 0,
+    metrics_updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tweets_created_idx ON tweets (created_at);
+CREATE TABLE IF NOT EXISTS metric_history (
+    tweet_id TEXT NOT NULL,
+    captured_at REAL NOT NULL,
+    likes INTEGER NOT NULL,
+    retweets INTEGER NOT NULL,
+    comments INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metric_history_tweet_idx ON metric_history (tweet_id, captured_at);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+TWEET_COLUMNS = "id, text, created_at, image_url, permalink, likes, retweets, comments"
+
+
+class AnalyticsStore:
+    """
+    Local SQLite copy of our tweets and their metric history.
+
+    The dashboard reads from here instead of calling Twitter on every load.
+    sync(fetch) brings the store up to date at most once every `ttl`
+    seconds, and concurrent callers share a single sync. A metric snapshot
+    is only recorded when a tweet's numbers change, so the history stays
+    small.
+    """
+
+    def __init__(self, db_path, ttl=120):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._sync_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return closing(conn)
+
+    def _get_state(self, conn, key, default=None):
+        row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def _set_state(self, conn, key, value):
+        conn.execute(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value)),
+        )
+
+    def last_synced(self):
+        with self._connect() as conn:
+            return self._get_state(conn, "last_synced", 0)
+
+    def is_stale(self):
+        return time.time() - self.last_synced() >= self.ttl
+
+    def newest_id(self):
+        """since_id for the next incremental fetch, or None when the store is empty"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT id FROM tweets ORDER BY CAST(id AS INTEGER) DESC LIMIT 1").fetchone()
+        return row["id"] if row else None
+
+    def ids_since(self, created_after):
+        """Ids of tweets newer than an ISO timestamp, whose metrics are still moving"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM tweets WHERE created_at >= ?", (created_after,)).fetchall()
+        return [row["id"] for row in rows]
+
+    def profile(self):
+        with self._connect() as conn:
+            return self._get_state(conn, "profile")
+
+    def sync(self, fetch, force=False):
+        """
+        Run fetch(store) -> (profile, tweets) if the store is stale, then save
+        the results. fetch receives the store so it can ask for newest_id()
+        and ids_since(). Returns True if a sync ran.
+        """
+        if not force and not self.is_stale():
+            return False
+        with self._sync_lock:
+            # Another request may have synced while we waited
+            if not force and not self.is_stale():
+                return False
+            started = time.time()
+            profile, tweets = fetch(self)
+            self.save(profile, tweets, captured_at=started)
+            logger.info(f"Analytics sync stored {len(tweets)} tweet(s) in {time.time() - started:.2f}s")
+            return True
+
+    def save(self, profile, tweets, captured_at=None):
+        """Upsert tweet snapshots, appending metric history only for changed numbers"""
+        captured_at = captured_at or time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for tweet in tweets:
+                    previous = conn.execute(
+                        "SELECT likes, retweets, comments FROM tweets WHERE id = ?", (str(tweet["id"]),)
+                    ).fetchone()
+                    metrics = (tweet["likes"], tweet["retweets"], tweet["comments"])
+                    if "text" in tweet:
+                        conn.execute(
+                            "INSERT INTO tweets (id, text, created_at, image_url, permalink, likes, retweets,"
+                            " comments, metrics_updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                            " ON CONFLICT(id) DO UPDATE SET likes = excluded.likes,"
+                            " retweets = excluded.retweets, comments = excluded.comments,"
+                            " image_url = COALESCE(excluded.image_url, tweets.image_url),"
+                            " metrics_updated_at = excluded.metrics_updated_at",
+                            (str(tweet["id"]), tweet["text"], tweet["createdAt"], tweet.get("imageUrl"),
+                             tweet.get("permalink"), *metrics, captured_at),
+                        )
+                    else:
+                        # Metrics-only refresh of a tweet we already have
+                        conn.execute(
+                            "UPDATE tweets SET likes = ?, retweets = ?, comments = ?, metrics_updated_at = ?"
+                            " WHERE id = ?",
+                            (*metrics, captured_at, str(tweet["id"])),
+                        )
+                    if previous is None or tuple(previous) != metrics:
+                        conn.execute(
+                            "INSERT INTO metric_history (tweet_id, captured_at, likes, retweets, comments)"
+                            " VALUES (?, ?, ?, ?, ?)",
+                            (str(tweet["id"]), captured_at, *metrics),
+                        )
+                if profile is not None:
+                    self._set_state(conn, "profile", profile)
+                self._set_state(conn, "last_synced", captured_at)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def tweets(self, limit=None, since=None, until=None):
+        """Stored tweets, newest first, optionally within an ISO created_at range"""
+        query = f"SELECT {TWEET_COLUMNS} FROM tweets WHERE 1 = 1"
+        params = []
+        if since:
+            query += " AND created_at >= ?"
+            params.append(since)
+        if until:
+            query += " AND created_at < ?"
+            params.append(until)
+        query += " ORDER BY created_at DESC, CAST(id AS INTEGER) DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            {
+                "id": int(row["id"]),
+                "text": row["text"],
+                "likes": row["likes"],
+                "retweets": row["retweets"],
+                "comments": row["comments"],
+                "createdAt": row["created_at"],
+                "imageUrl": row["image_url"],
+                "permalink": row["permalink"],
+            }
+            for row in rows
+        ]
+
+    def history(self, tweet_id):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT captured_at, likes, retweets, comments FROM metric_history"
+                " WHERE tweet_id = ? ORDER BY captured_at",
+                (str(tweet_id),),
+            ).fetchall()
+        return [dict(row) for row in rows]
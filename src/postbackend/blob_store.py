@@ -0,0 +1,199 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    extension TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_gc_idx ON blobs (refcount, last_used_at);
+"""
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def digest_from_path(path):
+    """The blob hash a stored file's name starts with, or None for other paths"""
+    stem = os.path.basename(str(path)).split(".", 1)[0]
+    return stem if HASH_PATTERN.match(stem) else None
+
+
+class BlobStore:
+    """
+    Content-addressed file store for uploads.
+
+    Files live at <root>/ab/cd/<sha256>.<ext>, so identical uploads are
+    stored once and concurrent uploads never overwrite each other. Each
+    blob has a reference count: callers that need a file to stay around
+    (e.g. a queued tweet) acquire() it and release() it when done. Blobs
+    that have had no references for `ttl` seconds are deleted by
+    collect(), which start() runs every gc_interval seconds in a
+    background thread. Stale partial uploads in temp_dir are removed too.
+    """
+
+    def __init__(self, root, db_path, ttl=86400, gc_interval=600):
+        self.root = root
+        self.db_path = db_path
+        self.ttl = ttl
+        self.gc_interval = gc_interval
+        self.temp_dir = os.path.join(root, "tmp")
+        self._thread = None
+        self._lock = threading.Lock()
+        os.makedirs(self.temp_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return closing(conn)
+
+    def path_for(self, digest, extension):
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.{extension}")
+
+    def _to_dict(self, row):
+        return {
+            "hash": row["hash"],
+            "path": self.path_for(row["hash"], row["extension"]),
+            "size": row["size"],
+            "refcount": row["refcount"],
+        }
+
+    def put(self, temp_path, digest, extension, acquire=False):
+        """
+        Move a fully written temp file into the store under its SHA-256
+        digest. If the blob already exists the temp file is discarded.
+        With acquire=True the caller also takes a reference to the blob.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # Collection holds the same write lock while deleting, so a blob
+            # can't be removed between the check below and the insert
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT * FROM blobs WHERE hash = ?", (digest,)).fetchone()
+                path = self.path_for(digest, row["extension"] if row else extension)
+                if row is not None and os.path.isfile(path):
+                    os.remove(temp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(temp_path, path)
+                conn.execute(
+                    "INSERT INTO blobs (hash, extension, size, refcount, created_at, last_used_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(hash) DO UPDATE SET"
+                    " refcount = blobs.refcount + excluded.refcount, last_used_at = excluded.last_used_at",
+                    (digest, extension, os.path.getsize(path), int(acquire), now, now),
+                )
+                row = conn.execute("SELECT * FROM blobs WHERE hash = ?", (digest,)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logger.debug(f"Stored blob {digest} ({row['size']} bytes, {row['refcount']} reference(s))")
+        return self._to_dict(row)
+
+    def get(self, digest):
+        if not HASH_PATTERN.match(digest or ""):
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is None or not os.path.isfile(self.path_for(row["hash"], row["extension"])):
+            return None
+        return self._to_dict(row)
+
+    def acquire(self, digest):
+        """Take a reference to a stored blob; returns it, or None if it doesn't exist"""
+        if not HASH_PATTERN.match(digest or ""):
+            return None
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT * FROM blobs WHERE hash = ?", (digest,)).fetchone()
+                if row is None or not os.path.isfile(self.path_for(row["hash"], row["extension"])):
+                    conn.execute("ROLLBACK")
+                    return None
+                conn.execute(
+                    "UPDATE blobs SET refcount = refcount + 1, last_used_at = ? WHERE hash = ?",
+                    (time.time(), digest),
+                )
+                row = conn.execute("SELECT * FROM blobs WHERE hash = ?", (digest,)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self._to_dict(row)
+
+    def release(self, digest):
+        """Drop a reference; the blob is collected once unreferenced for ttl seconds"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE blobs SET refcount = MAX(refcount - 1, 0), last_used_at = ? WHERE hash = ?",
+                (time.time(), digest),
+            )
+
+    def collect(self):
+        """Delete unreferenced blobs past their TTL and stale partial uploads; returns blobs removed"""
+        cutoff = time.time() - self.ttl
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT hash, extension FROM blobs WHERE refcount <= 0 AND last_used_at < ?", (cutoff,)
+                ).fetchall()
+                for row in rows:
+                    path = self.path_for(row["hash"], row["extension"])
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    conn.execute("DELETE FROM blobs WHERE hash = ?", (row["hash"],))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        for name in os.listdir(self.temp_dir):
+            path = os.path.join(self.temp_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+        if rows:
+            logger.info(f"Blob store collected {len(rows)} unreferenced blob(s)")
+        return len(rows)
+
+    def stats(self):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS bytes,"
+                " COALESCE(SUM(refcount > 0), 0) AS referenced FROM blobs"
+            ).fetchone()
+        return dict(row)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._gc_loop, name="blob-gc", daemon=True)
+                self._thread.start()
+
+    def _gc_loop(self):
+        while True:
+            time.sleep(self.gc_interval)
+            try:
+                self.collect()
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Blob store collection failed: {str(e)}")
@@ -0,0 +1,226 @@
+import binascii
+import hashlib
+import json
+import os
+import re
+import uuid
+
+# Bytes read from the request body at a time; a multiple of 4 keeps base64 aligned
+CHUNK_SIZE = 64 * 1024
+# Non-image JSON fields (filename etc.) are buffered; they are never this big
+MAX_OTHER_FIELDS_BYTES = 64 * 1024
+MAX_HEADER_BYTES = 256
+
+# (magic bytes, offset, mime type, extension)
+SIGNATURES = [
+    (b"\xff\xd8\xff", 0, "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", 0, "image/png", "png"),
+    (b"GIF87a", 0, "image/gif", "gif"),
+    (b"GIF89a", 0, "image/gif", "gif"),
+    (b"WEBP", 8, "image/webp", "webp"),
+    (b"ftyp", 4, "video/mp4", "mp4"),
+]
+SNIFF_BYTES = 16
+
+
+class UploadError(Exception):
+    status = 400
+
+
+class UploadTooLarge(UploadError):
+    status = 413
+
+
+class UnsupportedMediaType(UploadError):
+    status = 415
+
+
+def sniff(head):
+    """(mime type, extension) from a file's first bytes, or None if unrecognized"""
+    for magic, offset, mime_type, extension in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            if extension == "webp" and head[:4] != b"RIFF":
+                continue
+            return mime_type, extension
+    return None
+
+
+class UploadWriter:
+    """
+    Writes an upload to a temporary file in `folder` as chunks arrive,
+    enforcing max_bytes and hashing it with SHA-256 on the way. detect()
+    then reports the real format from the file's magic bytes; the caller
+    moves temp_path into place or calls abort().
+    """
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b""
+        self.sha256 = hashlib.sha256()
+        self.temp_path = os.path.join(folder, f".{uuid.uuid4().hex}.part")
+        self._file = open(self.temp_path, "wb")
+
+    def write(self, data):
+        if not data:
+            return
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"Image exceeds the {self.max_bytes // (1024 * 1024)} MB limit")
+        if len(self.head) < SNIFF_BYTES:
+            self.head += data[:SNIFF_BYTES - len(self.head)]
+        self.sha256.update(data)
+        self._file.write(data)
+
+    def detect(self):
+        self._file.close()
+        if self.size == 0:
+            raise UploadError("No image data provided")
+        detected = sniff(self.head)
+        if detected is None:
+            raise UnsupportedMediaType("Unsupported or unrecognized file type")
+        return detected
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+class Base64Decoder:
+    """Incremental base64: decodes whole 4-character groups and carries the rest over"""
+
+    def __init__(self, write):
+        self.write = write
+        self.pending = b""
+
+    def feed(self, data):
+        data = self.pending + re.sub(rb"\s+", b"", data)
+        usable = len(data) - len(data) % 4
+        self.pending = data[usable:]
+        if usable:
+            self.write(self._decode(data[:usable]))
+
+    def finish(self):
+        if self.pending:
+            # Tolerate missing padding, as browsers' data URLs sometimes omit it
+            self.write(self._decode(self.pending + b"=" * (-len(self.pending) % 4)))
+            self.pending = b""
+
+    def _decode(self, data):
+        try:
+            return binascii.a2b_base64(data, strict_mode=True)
+        except binascii.Error as e:
+            raise UploadError(f"Invalid base64 data: {str(e)}")
+
+
+class DataUrlDecoder:
+    """Streams a `data:<mime>;base64,<payload>` URL; the declared MIME type is ignored"""
+
+    def __init__(self, write):
+        self.header = b""
+        self.body = None
+        self.decoder = Base64Decoder(write)
+
+    def feed(self, data):
+        if self.body is None:
+            self.header += data
+            if b"," not in self.header:
+                if len(self.header) > MAX_HEADER_BYTES:
+                    raise UploadError("Invalid data URL format")
+                return
+            header, data = self.header.split(b",", 1)
+            if not header.startswith(b"data:") or not header.endswith(b";base64"):
+                raise UploadError("Invalid data URL format")
+            self.body = True
+        self.decoder.feed(data)
+
+    def finish(self):
+        if self.body is None:
+            raise UploadError("Invalid data URL format")
+        self.decoder.finish()
+
+
+class JsonStringFieldStreamer:
+    """
+    Streams one string field out of a JSON object body without holding it
+    in memory. The field's value is passed to on_value chunk by chunk. The
+    rest of the object is buffered and parsed by finish(), with the field
+    left as an empty string. Only escapes that occur in base64 data URLs
+    (\\/) are supported inside the streamed value.
+    """
+
+    def __init__(self, field, on_value):
+        self.on_value = on_value
+        self.pattern = re.compile(rb'"' + re.escape(field.encode()) + rb'"\s*:\s*"')
+        self.other = b""
+        self.state = "before"  # before -> value -> after
+        self.escaped = False
+
+    def feed(self, data):
+        while data:
+            if self.state == "value":
+                data = self._feed_value(data)
+            else:
+                self.other += data
+                data = b""
+                if len(self.other) > MAX_OTHER_FIELDS_BYTES:
+                    raise UploadError("Request body has too much data outside the image")
+                if self.state == "before":
+                    match = self.pattern.search(self.other)
+                    if match:
+                        data = self.other[match.end():]
+                        self.other = self.other[:match.end()]
+                        self.state = "value"
+
+    def _feed_value(self, data):
+        # Hand over everything up to the next backslash or closing quote as
+        # one slice; base64 rarely contains either, so most chunks are a
+        # single find() and a single on_value() call
+        start = 0
+        if self.escaped:
+            if data[:1] != b"/":
+                raise UploadError("Unsupported escape in image data")
+            self.escaped = False
+        while True:
+            quote = data.find(b'"', start)
+            backslash = data.find(b"\\", start, len(data) if quote == -1 else quote)
+            if backslash != -1:
+                self.on_value(data[start:backslash])
+                if backslash + 1 == len(data):
+                    self.escaped = True
+                    return b""
+                if data[backslash + 1:backslash + 2] != b"/":
+                    raise UploadError("Unsupported escape in image data")
+                # Resume at the "/" so it is passed on with the next slice
+                start = backslash + 1
+            elif quote == -1:
+                self.on_value(data[start:])
+                return b""
+            else:
+                self.on_value(data[start:quote])
+                self.other += b'"'
+                self.state = "after"
+                return data[quote + 1:]
+
+    def finish(self):
+        if self.state != "after":
+            raise UploadError("No image data provided")
+        try:
+            fields = json.loads(self.other)
+        except ValueError:
+            raise UploadError("Invalid JSON body")
+        if not isinstance(fields, dict):
+            raise UploadError("Invalid JSON body")
+        return fields
+
+
+def read_chunks(stream, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,215 @@
+import logging
+import mimetypes
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import tweepy
+
+logger = logging.getLogger(__name__)
+
+# Twitter accepts APPEND segments up to 5 MB
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+# Images up to this size go through the one-shot upload
+SIMPLE_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_uploads (
+    file_key TEXT PRIMARY KEY,
+    media_id TEXT NOT NULL,
+    next_segment INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class MediaUploadError(Exception):
+    pass
+
+
+class UploadTimeout(MediaUploadError):
+    """The upload ran past its overall timeout; a retry resumes where it stopped"""
+
+
+def media_type_for(path):
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def media_category_for(media_type):
+    if media_type == "image/gif":
+        return "tweet_gif"
+    if media_type.startswith("video/"):
+        return "tweet_video"
+    return "tweet_image"
+
+
+def is_resumable(error):
+    """Network errors, 5xx and 429s leave a media id usable; other client errors don't"""
+    return not isinstance(error, tweepy.HTTPException) or isinstance(
+        error, (tweepy.TwitterServerError, tweepy.TooManyRequests)
+    )
+
+
+def needs_chunked_upload(path):
+    """Videos, GIFs and large images must use INIT/APPEND/FINALIZE"""
+    media_type = media_type_for(path)
+    return (
+        media_type.startswith("video/")
+        or media_type == "image/gif"
+        or os.path.getsize(path) > SIMPLE_UPLOAD_MAX_BYTES
+    )
+
+
+class ChunkedUploader:
+    """
+    Chunked media upload (INIT, APPEND, FINALIZE, then STATUS polling) that
+    streams the file from disk one chunk at a time.
+
+    Progress is saved in SQLite after every acknowledged APPEND, keyed by
+    the caller's upload_key (e.g. a tweet job id) and the file's path, size
+    and mtime. If an upload fails part-way, the next upload() with the same
+    key continues from the next unacknowledged segment of the same media_id,
+    as long as Twitter has not expired it. Uploads with different keys never
+    share a media_id, even for the same file. A client error that leaves the
+    media_id unusable discards the saved progress, so the next try starts
+    over.
+
+    before_upload is called once per upload() and before_status ahead of
+    every STATUS poll, e.g. to wait for rate-limit budget; the APPENDs of an
+    upload are not paced one by one. The whole upload, processing included,
+    gives up with UploadTimeout after `timeout` seconds.
+    """
+
+    def __init__(self, api, state_db, chunk_size=DEFAULT_CHUNK_SIZE, append_retries=3,
+                 retry_backoff=1.0, processing_timeout=600, timeout=None, before_upload=None,
+                 before_status=None):
+        self.api = api
+        self.state_db = state_db
+        self.chunk_size = chunk_size
+        self.append_retries = append_retries
+        self.retry_backoff = retry_backoff
+        self.processing_timeout = processing_timeout
+        self.timeout = timeout
+        self.before_upload = before_upload
+        self.before_status = before_status
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.state_db, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return closing(conn)
+
+    def _file_key(self, path, upload_key=None):
+        stat = os.stat(path)
+        file_key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        return f"{upload_key}:{file_key}" if upload_key else file_key
+
+    def _load_state(self, file_key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM media_uploads WHERE file_key = ?", (file_key,)).fetchone()
+        if row is None:
+            return None
+        if row["expires_at"] <= time.time() or row["chunk_size"] != self.chunk_size:
+            self._clear_state(file_key)
+            return None
+        return row
+
+    def _save_state(self, file_key, media_id, next_segment, expires_at):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO media_uploads (file_key, media_id, next_segment, chunk_size, expires_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(file_key) DO UPDATE SET media_id = excluded.media_id,"
+                " next_segment = excluded.next_segment, expires_at = excluded.expires_at,"
+                " updated_at = excluded.updated_at",
+                (file_key, str(media_id), next_segment, self.chunk_size, expires_at, time.time()),
+            )
+
+    def _clear_state(self, file_key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM media_uploads WHERE file_key = ?", (file_key,))
+
+    def upload(self, path, media_category=None, upload_key=None):
+        """Upload a file and return its media_id once Twitter has finished processing it"""
+        media_type = media_type_for(path)
+        media_category = media_category or media_category_for(media_type)
+        total_bytes = os.path.getsize(path)
+        file_key = self._file_key(path, upload_key)
+        deadline = time.time() + self.timeout if self.timeout is not None else float("inf")
+        if self.before_upload is not None:
+            self.before_upload()
+
+        state = self._load_state(file_key)
+        if state is not None:
+            media_id, segment = state["media_id"], state["next_segment"]
+            expires_at = state["expires_at"]
+            logger.info(f"Resuming upload of {path} as media {media_id} at segment {segment}")
+        else:
+            init = self.api.chunked_upload_init(total_bytes, media_type, media_category=media_category)
+            media_id, segment = init.media_id_string, 0
+            # Leave a margin so we never resume onto an id that expires mid-upload
+            expires_at = time.time() + getattr(init, "expires_after_secs", 86400) - 60
+            self._save_state(file_key, media_id, segment, expires_at)
+            logger.debug(f"Initialized chunked upload of {path} ({total_bytes} bytes) as media {media_id}")
+
+        try:
+            with open(path, "rb") as f:
+                f.seek(segment * self.chunk_size)
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if time.time() >= deadline:
+                        # Progress is saved, so the next try continues from this segment
+                        raise UploadTimeout(f"Upload of {path} timed out after {self.timeout}s at segment {segment}")
+                    self._append(media_id, chunk, segment)
+                    segment += 1
+                    self._save_state(file_key, media_id, segment, expires_at)
+            media = self.api.chunked_upload_finalize(media_id)
+        except tweepy.TweepyException as e:
+            if not is_resumable(e):
+                # The upload can't be completed (e.g. the id expired); start over next time
+                self._clear_state(file_key)
+            raise
+        self._clear_state(file_key)
+        self._wait_for_processing(media_id, getattr(media, "processing_info", None), deadline)
+        logger.debug(f"Chunked upload of {path} finished as media {media_id}")
+        return media_id
+
+    def _append(self, media_id, chunk, segment):
+        for attempt in range(self.append_retries):
+            try:
+                self.api.chunked_upload_append(media_id, chunk, segment)
+                return
+            except tweepy.TweepyException as e:
+                # Only server and network errors are worth retrying right away
+                retryable = not isinstance(e, tweepy.HTTPException) or isinstance(e, tweepy.TwitterServerError)
+                if not retryable or attempt == self.append_retries - 1:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                logger.warning(f"APPEND of segment {segment} failed ({str(e)}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _wait_for_processing(self, media_id, processing_info, upload_deadline):
+        """Poll STATUS until async processing (videos, GIFs) succeeds or fails"""
+        deadline = time.time() + self.processing_timeout
+        while processing_info:
+            state = processing_info.get("state")
+            if state == "succeeded":
+                return
+            if state == "failed":
+                error = processing_info.get("error", {})
+                raise MediaUploadError(f"Media processing failed: {error.get('message', error)}")
+            if time.time() >= deadline:
+                raise MediaUploadError(f"Media {media_id} still processing after {self.processing_timeout}s")
+            delay = processing_info.get("check_after_secs", 1)
+            if time.time() + delay >= upload_deadline:
+                raise UploadTimeout(f"Media {media_id} still processing when the upload timed out after {self.timeout}s")
+            time.sleep(delay)
+            if self.before_status is not None:
+                self.before_status()
+            status = self.api.get_media_upload_status(media_id)
+            processing_info = getattr(status, "processing_info", None)
@@ -6,9 +6,18 @@ import sys
 import logging
 import time
 import json
-import base64
 import re
-from werkzeug.utils import secure_filename
+from datetime import datetime, timedelta, timezone
+from tweet_queue import TweetQueue
+from twitter_clients import TwitterClients
+from rate_limits import CREATE_TWEET, MEDIA_STATUS, MEDIA_UPLOAD, TWEET_LOOKUP, USER_TIMELINE, RateLimitExceeded, RateLimitGovernor
+from analytics_store import AnalyticsStore
+from media_upload import ChunkedUploader, MediaUploadError, UploadTimeout, needs_chunked_upload
+from blob_store import BlobStore, digest_from_path
+from data_url import (
+    MAX_OTHER_FIELDS_BYTES, DataUrlDecoder, JsonStringFieldStreamer, UploadError, UploadWriter, read_chunks
+)
+from timeline import TimelineError, aggregate, default_range, get_timezone, parse_datetime
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})  # Allow all origins for testing
@@ -24,49 +33,99 @@ ACCESS_TOKEN = os.getenv('ACCESS_TOKEN')
 ACCESS_TOKEN_SECRET = os.getenv('ACCESS_TOKEN_SECRET')
 BEARER_TOKEN = os.getenv('BEARER_TOKEN')  # Add Bearer token for v2 API
 
+# Paces outbound calls per endpoint from the rate-limit headers Twitter returns;
+# calls wait up to TWITTER_RATE_MAX_WAIT seconds for budget before giving up
+rate_limits = RateLimitGovernor(
+    burst=int(os.getenv('TWITTER_RATE_BURST', '3')),
+    max_wait=float(os.getenv('TWITTER_RATE_MAX_WAIT', '30'))
+)
+
+# Shared clients; the verified user is cached instead of re-checked on every request
+twitter = TwitterClients(
+    API_KEY, API_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET,
+    bearer_token=BEARER_TOKEN,
+    user_ttl=int(os.getenv('TWITTER_USER_TTL', '300')),
+    rate_limits=rate_limits,
+    base_url=os.getenv('TWITTER_API_BASE_URL')  # e.g. a local fake server for testing
+)
+
 # Configure upload folder
 UPLOAD_FOLDER = 'temp_uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
-# Function to convert data URL to file
-def save_data_url_to_file(data_url, filename):
+# Background tweet posting; jobs are persisted so they survive restarts
+TWEET_QUEUE_DB = os.getenv('TWEET_QUEUE_DB', 'tweet_jobs.db')
+TWEET_WORKERS = int(os.getenv('TWEET_WORKERS', '2'))
+TWEET_MAX_ATTEMPTS = int(os.getenv('TWEET_MAX_ATTEMPTS', '3'))
+TWEET_MAX_DEFERRALS = int(os.getenv('TWEET_MAX_DEFERRALS', '20'))  # Rate-limit waits, which don't use up attempts
+TWEET_LEASE_SECONDS = int(os.getenv('TWEET_LEASE_SECONDS', '600'))  # Renewed while a worker is posting
+
+# Local analytics store: synced with Twitter at most every ANALYTICS_TTL seconds
+ANALYTICS_DB = os.getenv('ANALYTICS_DB', 'twitter_analytics.db')
+ANALYTICS_TTL = int(os.getenv('ANALYTICS_TTL', '120'))
+ANALYTICS_REFRESH_DAYS = int(os.getenv('ANALYTICS_REFRESH_DAYS', '7'))  # Metrics refreshed for tweets this recent
+ANALYTICS_MAX_PAGES = int(os.getenv('ANALYTICS_MAX_PAGES', '5'))  # Pages of 100 new tweets per sync
+
+# Progress of chunked (video, GIF, large image) uploads, so failed uploads resume
+MEDIA_UPLOAD_STATE_DB = os.getenv('MEDIA_UPLOAD_STATE_DB', TWEET_QUEUE_DB)
+MEDIA_CHUNK_SIZE = int(os.getenv('MEDIA_CHUNK_SIZE', str(4 * 1024 * 1024)))
+# A chunked upload gives up after this long and resumes on the job's next attempt;
+# kept below the job lease so a stuck upload can't hold a job indefinitely
+MEDIA_UPLOAD_TIMEOUT = int(os.getenv('MEDIA_UPLOAD_TIMEOUT', str(TWEET_LEASE_SECONDS * 4 // 5)))
+analytics_store = AnalyticsStore(ANALYTICS_DB, ttl=ANALYTICS_TTL)
+
+# Uploads are stored by content hash; unreferenced ones are deleted after UPLOAD_TTL seconds
+blob_store = BlobStore(
+    UPLOAD_FOLDER,
+    os.getenv('UPLOAD_BLOB_DB', TWEET_QUEUE_DB),
+    ttl=int(os.getenv('UPLOAD_TTL', '86400')),
+    gc_interval=int(os.getenv('UPLOAD_GC_INTERVAL', '600'))
+)
+
+# Largest decoded image /api/save-image accepts; bodies are streamed to disk, never held in memory
+SAVE_IMAGE_MAX_BYTES = int(os.getenv('SAVE_IMAGE_MAX_BYTES', str(20 * 1024 * 1024)))
+# Largest media file /api/tweet accepts (Twitter's own limit for videos)
+TWEET_MEDIA_MAX_BYTES = int(os.getenv('TWEET_MEDIA_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Stream an uploaded image into the blob store
+def save_image_stream(stream, content_type, acquire=False, max_bytes=SAVE_IMAGE_MAX_BYTES):
+    """
+    Accepts the frontend's JSON {"imageData": <data URL>, ...} body,
+    a bare data URL (text/plain), or raw image bytes. Base64 is decoded in
+    chunks as it arrives, and the extension comes from the file's magic
+    bytes rather than the declared MIME type. Returns the stored blob.
+    """
+    writer = UploadWriter(blob_store.temp_dir, max_bytes)
     try:
-        # Extract the base64 data from the data URL
-        if not data_url.startswith('data:'):
-            return None, "Invalid data URL format"
-            
-        # Split the header and the base64 data
-        header, encoded = data_url.split(",", 1)
-        
-        # Determine file extension from the header
-        mime_type = header.split(":")[1].split(";")[0]
-        extension = "jpg"  # Default to jpg
-        if mime_type == "image/png":
-            extension = "png"
-        elif mime_type == "image/gif":
-            extension = "gif"
-            
-        # Ensure the filename has the right extension
-        base_filename = os.path.splitext(filename)[0]
-        filename = f"{base_filename}.{extension}"
-        
-        # Create a secure filename
-        filename = secure_filename(filename)
-        
-        # Save to the upload folder
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        
-        # Decode and save
-        with open(file_path, "wb") as f:
-            f.write(base64.b64decode(encoded))
-            
-        return file_path, None
-    except Exception as e:
-        logger.error(f"Error saving data URL to file: {str(e)}")
-        return None, str(e)
+        if content_type == 'application/json':
+            decoder = DataUrlDecoder(writer.write)
+            body = JsonStringFieldStreamer('imageData', decoder.feed)
+            for chunk in read_chunks(stream):
+                body.feed(chunk)
+            body.finish()
+            decoder.finish()
+        elif content_type == 'text/plain':
+            decoder = DataUrlDecoder(writer.write)
+            for chunk in read_chunks(stream):
+                decoder.feed(chunk)
+            decoder.finish()
+        else:
+            for chunk in read_chunks(stream):
+                writer.write(chunk)
+
+        mime_type, extension = writer.detect()
+        blob = blob_store.put(writer.temp_path, writer.sha256.hexdigest(), extension, acquire=acquire)
+        logger.debug(f"Saved {mime_type} upload of {writer.size} bytes as {blob['path']}")
+        return blob
+    except Exception:
+        writer.abort()
+        raise
 
-def post_tweet_with_image(text, image_path):
+def is_rate_limited(error):
+    return isinstance(error, tweepy.TooManyRequests) or "rate limit" in str(error).lower()
+
+def post_tweet_with_image(text, image_path, job_id=None):
     try:
         # Ensure text is within Twitter's character limit
         if len(text) > 280:
@@ -74,53 +133,68 @@ def post_tweet_with_image(text, image_path):
             
         logger.debug(f"Attempting to post tweet with text: {text} and image: {image_path}")
         
-        # Set up Twitter authentication
-        auth = tweepy.OAuth1UserHandler(API_KEY, API_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET)
-        api = tweepy.API(auth)
-        
-        # Verify credentials
+        # Verify credentials (cached for TWITTER_USER_TTL seconds)
         try:
-            api.verify_credentials()
-            logger.debug("Twitter credentials verified successfully")
+            twitter.user()
         except tweepy.TweepyException as e:
             error_message = str(e)
             logger.error(f"Twitter credentials verification failed: {error_message}")
             
-            if "rate limit" in error_message.lower():
+            if is_rate_limited(e):
                 return {"success": False, "error": "Rate limit exceeded. Please try again later.", "rate_limited": True}
                 
             return {"success": False, "error": f"Authentication failed: {error_message}"}
         
-        # Create Tweepy v2 client with Bearer token
-        client = tweepy.Client(
-            bearer_token=BEARER_TOKEN,
-            consumer_key=API_KEY, 
-            consumer_secret=API_SECRET,
-            access_token=ACCESS_TOKEN, 
-            access_token_secret=ACCESS_TOKEN_SECRET,
-            wait_on_rate_limit=True
-        )
+        # Shared v1.1 API and v2 client; neither waits on rate limits, the tweet queue retries instead
+        api, client = twitter.api, twitter.client
 
-        # Upload media - this is the step that likely failed before
+        # Upload media - videos, GIFs and large images are streamed in resumable chunks
         try:
             logger.debug(f"Uploading media from path: {image_path}")
-            media = api.media_upload(filename=image_path)
-            logger.debug(f"Media uploaded successfully with ID: {media.media_id}")
+            if needs_chunked_upload(image_path):
+                uploader = ChunkedUploader(
+                    api,
+                    MEDIA_UPLOAD_STATE_DB,
+                    chunk_size=MEDIA_CHUNK_SIZE,
+                    timeout=MEDIA_UPLOAD_TIMEOUT,
+                    # One upload budget token per file, not per APPEND; STATUS polls have their own budget
+                    before_upload=lambda: rate_limits.acquire(MEDIA_UPLOAD),
+                    before_status=lambda: rate_limits.acquire(MEDIA_STATUS)
+                )
+                # Keyed by job, so a retry resumes its own upload and concurrent jobs never share one
+                media_id = uploader.upload(image_path, upload_key=job_id)
+            else:
+                rate_limits.acquire(MEDIA_UPLOAD)
+                media_id = api.media_upload(filename=image_path).media_id
+            logger.debug(f"Media uploaded successfully with ID: {media_id}")
+        except UploadTimeout as media_error:
+            logger.warning(f"Media upload timed out: {str(media_error)}")
+            return {"success": False, "error": str(media_error), "retryable": True}
+        except MediaUploadError as media_error:
+            logger.error(f"Media processing failed: {str(media_error)}")
+            return {"success": False, "error": str(media_error)}
         except tweepy.TweepyException as media_error:
             error_message = str(media_error)
             logger.error(f"Media upload failed: {error_message}")
             
-            if "rate limit" in error_message.lower():
+            if is_rate_limited(media_error):
                 return {"success": False, "error": "Rate limit exceeded during media upload. Please try again later.", "rate_limited": True}
-                
-            return {"success": False, "error": f"Image upload failed: {error_message}"}
+
+            if isinstance(media_error, tweepy.Unauthorized):
+                twitter.reset()  # The retry rebuilds the clients and re-verifies
+                return {"success": False, "error": f"Authentication failed: {error_message}", "retryable": True}
+
+            # Network and server errors are worth retrying; a chunked upload resumes where it stopped
+            retryable = not isinstance(media_error, tweepy.HTTPException) or isinstance(media_error, tweepy.TwitterServerError)
+            return {"success": False, "error": f"Image upload failed: {error_message}", "retryable": retryable}
         
         # Post tweet with the media
         try:
-            logger.debug(f"Creating tweet with media ID: {media.media_id}")
+            logger.debug(f"Creating tweet with media ID: {media_id}")
+            rate_limits.acquire(CREATE_TWEET)
             response = client.create_tweet(
                 text=text,
-                media_ids=[media.media_id]
+                media_ids=[media_id]
             )
             logger.debug(f"Tweet created successfully: {response.data}")
             return {"success": True, "tweet_id": response.data['id']}
@@ -128,40 +202,76 @@ def post_tweet_with_image(text, image_path):
             error_message = str(tweet_error)
             logger.error(f"Tweet creation failed: {error_message}")
             
-            if "rate limit" in error_message.lower():
+            if is_rate_limited(tweet_error):
                 return {"success": False, "error": "Rate limit exceeded during tweet creation. Please try again later.", "rate_limited": True}
+
+            if isinstance(tweet_error, tweepy.Unauthorized):
+                twitter.reset()  # The retry rebuilds the clients and re-verifies
+                return {"success": False, "error": f"Authentication failed: {error_message}", "retryable": True}
                 
             return {"success": False, "error": f"Tweet creation failed: {error_message}"}
 
+    except RateLimitExceeded as e:
+        logger.warning(str(e))
+        return {"success": False, "error": f"{e} Please try again later.", "rate_limited": True, "retry_after": e.retry_after}
     except Exception as e:
         logger.error(f"Unexpected error in post_tweet_with_image: {str(e)}")
         return {"success": False, "error": str(e)}
 
+def release_job_image(image_path):
+    digest = digest_from_path(image_path)
+    if digest:
+        blob_store.release(digest)
+    else:
+        os.remove(image_path)  # Uploads queued before the blob store existed
+
+tweet_queue = TweetQueue(
+    TWEET_QUEUE_DB,
+    post_tweet_with_image,
+    num_workers=TWEET_WORKERS,
+    max_attempts=TWEET_MAX_ATTEMPTS,
+    max_deferrals=TWEET_MAX_DEFERRALS,
+    lease_seconds=TWEET_LEASE_SECONDS,
+    release_image=release_job_image,
+)
+
+def queued_response(job):
+    return jsonify({
+        "message": "Tweet queued for posting",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/api/tweet/jobs/{job['job_id']}"
+    }), 202
+
+def submit_with_image(text, blob):
+    """Queue a tweet that takes over the caller's reference to blob, dropping it if queueing fails"""
+    try:
+        return tweet_queue.submit(text, blob["path"], owns_image=True)
+    except Exception:
+        blob_store.release(blob["hash"])
+        raise
+
 @app.route('/api/save-image', methods=['POST'])
 def save_image():
+    # Reject bodies that cannot fit under the cap once base64 is decoded, before reading them
+    if request.content_length and request.content_length > SAVE_IMAGE_MAX_BYTES * 4 // 3 + MAX_OTHER_FIELDS_BYTES:
+        return jsonify({"message": f"Image exceeds the {SAVE_IMAGE_MAX_BYTES // (1024 * 1024)} MB limit"}), 413
+
     try:
-        data = request.json
-        if not data:
-            return jsonify({"message": "No data provided"}), 400
-            
-        image_data = data.get('imageData')
-        filename = data.get('filename', f"image_{int(time.time())}.jpg")
-        
-        if not image_data:
-            return jsonify({"message": "No image data provided"}), 400
-            
-        # Save the image to a file
-        file_path, error = save_data_url_to_file(image_data, filename)
-        
-        if error:
-            return jsonify({"message": f"Error saving image: {error}"}), 500
-            
-        # Return the file path
+        # Unreferenced until a tweet or a pin uses it; collected after UPLOAD_TTL seconds otherwise
+        blob = save_image_stream(request.stream, request.mimetype)
+
+        # Return the file path and the hash to tweet it by, and how long it is kept unless pinned
         return jsonify({
             "message": "Image saved successfully",
-            "imagePath": file_path
+            "imagePath": blob["path"],
+            "imageHash": blob["hash"],
+            "expiresIn": blob_store.ttl
         }), 200
-        
+
+    except UploadError as e:
+        logger.warning(f"Rejected image upload: {str(e)}")
+        return jsonify({"message": str(e)}), e.status
     except Exception as e:
         logger.error(f"Error saving image: {str(e)}")
         return jsonify({"message": f"Server error: {str(e)}"}), 500
@@ -193,38 +303,17 @@ def create_tweet():
             text = text[:277] + "..."
             logger.debug(f"Text truncated to: {text}")
 
-        # Save the image temporarily
-        filename = secure_filename(image.filename)
-        temp_path = os.path.join(UPLOAD_FOLDER, filename)
-        logger.debug(f"Saving image to {temp_path}")
-        image.save(temp_path)
-
-        # Post the tweet
-        result = post_tweet_with_image(text, temp_path)
-        logger.debug(f"Post tweet result: {result}")
-
-        # Clean up the temporary file
+        # Store the image by content hash, holding a reference until the job is done
         try:
-            os.remove(temp_path)
-            logger.debug(f"Removed temporary file: {temp_path}")
-        except Exception as e:
-            logger.error(f"Error removing temporary file: {str(e)}")
+            blob = save_image_stream(image.stream, None, acquire=True, max_bytes=TWEET_MEDIA_MAX_BYTES)
+        except UploadError as e:
+            logger.error(f"Rejected image upload: {str(e)}")
+            return jsonify({"message": str(e)}), e.status
 
-        if result["success"]:
-            return jsonify({
-                "message": "Tweet posted successfully!",
-                "tweet_id": result["tweet_id"]
-            }), 200
-        else:
-            # Check if it's a rate limit issue
-            if result.get("rate_limited", False):
-                return jsonify({
-                    "message": result["error"]
-                }), 429  # 429 Too Many Requests
-            else:
-                return jsonify({
-                    "message": f"Error posting tweet: {result['error']}"
-                }), 400
+        # Queue the tweet; the queue releases the blob once the job is finished
+        job = submit_with_image(text, blob)
+        logger.debug(f"Queued tweet job {job['job_id']} for blob {blob['hash']}")
+        return queued_response(job)
 
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
@@ -244,241 +333,287 @@ def tweet_with_local_image():
             
         text = data.get('text', '')
         image_path = data.get('imagePath', '')
-        
+        # Saved images are addressed by hash; the stored path names the hash too
+        image_hash = data.get('imageHash') or digest_from_path(image_path)
+
         logger.debug(f"Received text: {text}")
-        logger.debug(f"Received image path: {image_path}")
-        
+        logger.debug(f"Received image: {image_hash or image_path}")
+
         if not text:
             logger.error("No text provided")
             return jsonify({"message": "No text provided"}), 400
-            
-        if not image_path:
+
+        if not image_hash and not image_path:
             logger.error("No image path provided")
             return jsonify({"message": "No image path provided"}), 400
-            
-        # Check if the image file exists
-        if not os.path.isfile(image_path):
-            logger.error(f"Image file does not exist: {image_path}")
-            
-            # Try to find the file relative to the current working directory
-            current_dir = os.getcwd()
-            alternative_path = os.path.join(current_dir, image_path.lstrip('/'))
-            
-            if os.path.isfile(alternative_path):
-                logger.debug(f"Found file at alternative path: {alternative_path}")
-                image_path = alternative_path
-            else:
-                # Also try public directory
-                public_path = os.path.join(current_dir, 'public', os.path.basename(image_path))
-                if os.path.isfile(public_path):
-                    logger.debug(f"Found file in public directory: {public_path}")
-                    image_path = public_path
-                else:
-                    return jsonify({"message": f"Image file not found: {image_path}"}), 404
-        
-        # Post the tweet
-        result = post_tweet_with_image(text, image_path)
-        
-        if result["success"]:
+
+        # Hold a reference so the image isn't collected before the tweet is posted
+        blob = blob_store.acquire(image_hash)
+        if blob is None:
+            # Saved images that were never pinned are collected after UPLOAD_TTL seconds
+            logger.error(f"Image not found in upload store: {image_hash or image_path}")
             return jsonify({
-                "message": "Tweet posted successfully!",
-                "tweet_id": result["tweet_id"]
-            }), 200
-        else:
-            # Check if it's a rate limit issue
-            if result.get("rate_limited", False):
-                return jsonify({
-                    "message": result["error"]
-                }), 429  # 429 Too Many Requests
-            else:
-                return jsonify({
-                    "message": f"Error posting tweet: {result['error']}"
-                }), 400
-                
+                "message": f"Image file not found or expired: {image_hash or image_path}",
+                "expired": True
+            }), 404
+
+        # Queue the tweet; the queue releases the blob once the job is finished
+        job = submit_with_image(text, blob)
+        return queued_response(job)
+
     except Exception as e:
         logger.error(f"Server error in tweet_with_local_image: {str(e)}")
         return jsonify({
             "message": f"Server error: {str(e)}"
         }), 500
 
+@app.route('/api/uploads/<image_hash>/pin', methods=['POST'])
+def pin_upload(image_hash):
+    # Content saved to a campaign keeps its image until it is unpinned
+    blob = blob_store.acquire(image_hash)
+    if blob is None:
+        return jsonify({"message": f"Image file not found or expired: {image_hash}", "expired": True}), 404
+    return jsonify({"imageHash": blob["hash"], "imagePath": blob["path"], "refcount": blob["refcount"]}), 200
+
+@app.route('/api/uploads/<image_hash>/pin', methods=['DELETE'])
+def unpin_upload(image_hash):
+    blob = blob_store.get(image_hash)
+    if blob is None:
+        return jsonify({"message": f"Image file not found or expired: {image_hash}"}), 404
+    # Collected UPLOAD_TTL seconds after its last reference goes
+    blob_store.release(image_hash)
+    return jsonify({"imageHash": image_hash}), 200
+
+@app.route('/api/tweet/jobs/<job_id>', methods=['GET'])
+def get_tweet_job(job_id):
+    job = tweet_queue.get(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    return jsonify(job), 200
+
+@app.route('/api/tweet/queue', methods=['GET'])
+def get_tweet_queue():
+    return jsonify(tweet_queue.stats()), 200
+
+def tweet_record(tweet, media_dict, screen_name):
+    """Flatten a v2 tweet into the shape the dashboard and the analytics store use"""
+    metrics = tweet.public_metrics
+
+    # Get image URL if tweet has media
+    image_url = None
+    if hasattr(tweet, 'attachments') and tweet.attachments:
+        media_keys = tweet.attachments.get('media_keys', [])
+        for media_key in media_keys:
+            if media_key in media_dict:
+                media = media_dict[media_key]
+                if media.type == 'photo':
+                    image_url = media.url
+                    break
+                elif media.type == 'video' and hasattr(media, 'preview_image_url'):
+                    image_url = media.preview_image_url
+                    break
+
+    return {
+        "id": tweet.id,
+        "text": tweet.text,
+        "likes": metrics['like_count'],
+        "retweets": metrics['retweet_count'],
+        "comments": metrics['reply_count'],
+        "createdAt": tweet.created_at.isoformat(),
+        "imageUrl": image_url,
+        "permalink": f"https://twitter.com/{screen_name}/status/{tweet.id}"
+    }
+
+def fetch_analytics_updates(store):
+    """Fetch only what changed since the last sync: tweets newer than the
+    store's newest id, plus fresh metrics for tweets still within
+    ANALYTICS_REFRESH_DAYS"""
+    user_info = twitter.user()
+    profile = {
+        "username": user_info.screen_name,
+        "totalTweets": user_info.statuses_count,
+        "followers": user_info.followers_count,
+        "following": user_info.friends_count
+    }
+
+    # New tweets, page by page, newest first
+    since_id = store.newest_id()
+    new_tweets = []
+    pagination_token = None
+    for _ in range(ANALYTICS_MAX_PAGES):
+        params = dict(
+            max_results=100,
+            tweet_fields=['created_at', 'public_metrics', 'attachments'],
+            expansions=['attachments.media_keys'],
+            media_fields=['url', 'preview_image_url']
+        )
+        if since_id:
+            params['since_id'] = since_id
+        if pagination_token:
+            params['pagination_token'] = pagination_token
+        rate_limits.acquire(USER_TIMELINE)
+        tweets_response = twitter.call(lambda api, client, user: client.get_users_tweets(id=user.id, **params))
+
+        media_dict = {}
+        if tweets_response.includes and 'media' in tweets_response.includes:
+            for media in tweets_response.includes['media']:
+                media_dict[media.media_key] = media
+        for tweet in tweets_response.data or []:
+            new_tweets.append(tweet_record(tweet, media_dict, user_info.screen_name))
+
+        pagination_token = (tweets_response.meta or {}).get('next_token')
+        if not pagination_token:
+            break
+
+    # Metrics of recent tweets keep changing; older ones are left as stored
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=ANALYTICS_REFRESH_DAYS)).isoformat()
+    fetched = {str(tweet["id"]) for tweet in new_tweets}
+    recent_ids = [tweet_id for tweet_id in store.ids_since(cutoff) if tweet_id not in fetched]
+    refreshed = []
+    for i in range(0, len(recent_ids), 100):
+        chunk = recent_ids[i:i + 100]
+        rate_limits.acquire(TWEET_LOOKUP)
+        lookup = twitter.call(lambda api, client, user: client.get_tweets(ids=chunk, tweet_fields=['public_metrics']))
+        for tweet in lookup.data or []:
+            metrics = tweet.public_metrics
+            refreshed.append({
+                "id": tweet.id,
+                "likes": metrics['like_count'],
+                "retweets": metrics['retweet_count'],
+                "comments": metrics['reply_count']
+            })
+
+    logger.debug(f"Fetched {len(new_tweets)} new tweet(s) since {since_id}, refreshed {len(refreshed)}")
+    return profile, new_tweets + refreshed
+
 @app.route('/api/twitter/fetch-analytics', methods=['GET'])
 def fetch_twitter_analytics():
-    """Fetch real Twitter analytics using Twitter API"""
+    """Twitter analytics, served from the local analytics store. The store
+    syncs with Twitter at most once per ANALYTICS_TTL seconds, or on
+    ?refresh=true; if a sync fails, the last stored data is served.
+
+    The timeline is bucketed by ?bucket=hour|day|week (default day) in
+    ?tz= (default UTC). It covers the last ?periods= bins (default 7),
+    or ?since= to ?until= when given."""
     try:
-        # Set up Twitter authentication
-        auth = tweepy.OAuth1UserHandler(API_KEY, API_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET)
-        api = tweepy.API(auth)
-        
-        # Create Tweepy v2 client with Bearer token
-        client = tweepy.Client(
-            bearer_token=BEARER_TOKEN,
-            consumer_key=API_KEY, 
-            consumer_secret=API_SECRET,
-            access_token=ACCESS_TOKEN, 
-            access_token_secret=ACCESS_TOKEN_SECRET,
-            wait_on_rate_limit=True
-        )
-        
-        # Verify credentials and get user info
         try:
-            user_info = api.verify_credentials()
-            logger.debug(f"Authenticated user: {user_info.screen_name}")
-        except tweepy.TweepyException as e:
-            return jsonify({"error": f"Authentication failed: {str(e)}"}), 401
-        
-        # Get user's recent tweets (up to 100)
+            bucket = request.args.get('bucket', 'day')
+            tz = get_timezone(request.args.get('tz'))
+            timeline_start, timeline_end = default_range(bucket, request.args.get('periods', 7, type=int), tz)
+            if request.args.get('since'):
+                timeline_start = parse_datetime(request.args['since'], tz)
+            if request.args.get('until'):
+                timeline_end = parse_datetime(request.args['until'], tz)
+        except TimelineError as e:
+            return jsonify({"error": str(e)}), 400
+
+        stale = False
         try:
-            # Get user's own tweets using v2 API
-            user_id = user_info.id
-            tweets_response = client.get_users_tweets(
-                id=user_id,
-                max_results=100,
-                tweet_fields=['created_at', 'public_metrics', 'attachments'],
-                expansions=['attachments.media_keys'],
-                media_fields=['url', 'preview_image_url']
-            )
-            
-            if not tweets_response.data:
-                return jsonify({
-                    "profile": {
-                        "username": user_info.screen_name,
-                        "totalTweets": user_info.statuses_count,
-                        "followers": user_info.followers_count,
-                        "following": user_info.friends_count
-                    },
-                    "metrics": {
-                        "tweets": 0,
-                        "likes": 0,
-                        "retweets": 0,
-                        "comments": 0,
-                        "followers": user_info.followers_count,
-                        "engagementRate": "0%"
-                    },
-                    "tweets": [],
-                    "bestPerformingTweet": None
-                }), 200
-            
-            # Process tweets and calculate metrics
-            tweets_data = []
-            total_likes = 0
-            total_retweets = 0
-            total_replies = 0
-            best_tweet = None
-            max_engagement = 0
-            
-            # Get media data if available
-            media_dict = {}
-            if tweets_response.includes and 'media' in tweets_response.includes:
-                for media in tweets_response.includes['media']:
-                    media_dict[media.media_key] = media
-            
-            for tweet in tweets_response.data:
-                metrics = tweet.public_metrics
-                likes = metrics['like_count']
-                retweets = metrics['retweet_count']
-                replies = metrics['reply_count']
-                
-                total_likes += likes
-                total_retweets += retweets
-                total_replies += replies
-                
-                # Get image URL if tweet has media
-                image_url = None
-                if hasattr(tweet, 'attachments') and tweet.attachments:
-                    media_keys = tweet.attachments.get('media_keys', [])
-                    for media_key in media_keys:
-                        if media_key in media_dict:
-                            media = media_dict[media_key]
-                            if media.type == 'photo':
-                                image_url = media.url
-                                break
-                            elif media.type == 'video' and hasattr(media, 'preview_image_url'):
-                                image_url = media.preview_image_url
-                                break
-                
-                tweet_data = {
-                    "id": tweet.id,
-                    "text": tweet.text,
-                    "likes": likes,
-                    "retweets": retweets,
-                    "comments": replies,
-                    "createdAt": tweet.created_at.isoformat(),
-                    "imageUrl": image_url,
-                    "permalink": f"https://twitter.com/{user_info.screen_name}/status/{tweet.id}"
-                }
-                
-                tweets_data.append(tweet_data)
-                
-                # Track best performing tweet
-                engagement = likes + retweets + replies
-                if engagement > max_engagement:
-                    max_engagement = engagement
-                    best_tweet = tweet_data
-            
-            # Calculate engagement rate
-            total_tweets = len(tweets_data)
-            total_engagement = total_likes + total_retweets + total_replies
-            engagement_rate = (total_engagement / max(total_tweets, 1) * 100) if total_tweets > 0 else 0
-            
-            # Generate timeline data (last 7 days)
-            timeline_data = []
-            from datetime import datetime, timedelta
-            
-            for i in range(6, -1, -1):  # Last 7 days
-                date = datetime.now() - timedelta(days=i)
-                date_str = date.strftime('%Y-%m-%d')
-                
-                # Count tweets for this day
-                day_tweets = [t for t in tweets_data if t['createdAt'].startswith(date_str)]
-                day_likes = sum(t['likes'] for t in day_tweets)
-                day_retweets = sum(t['retweets'] for t in day_tweets)
-                day_comments = sum(t['comments'] for t in day_tweets)
-                
-                timeline_data.append({
-                    "date": date_str,
-                    "tweets": len(day_tweets),
-                    "likes": day_likes,
-                    "retweets": day_retweets,
-                    "comments": day_comments
-                })
-            
+            analytics_store.sync(fetch_analytics_updates, force=request.args.get('refresh') == 'true')
+        except (tweepy.TweepyException, RateLimitExceeded) as e:
+            if analytics_store.profile() is None:
+                # Nothing stored yet to fall back on
+                if isinstance(e, RateLimitExceeded):
+                    raise
+                if isinstance(e, tweepy.Unauthorized):
+                    return jsonify({"error": f"Authentication failed: {str(e)}"}), 401
+                logger.error(f"Error fetching tweets: {str(e)}")
+                return jsonify({"error": f"Failed to fetch tweets: {str(e)}"}), 500
+            logger.warning(f"Analytics sync failed, serving stored data: {str(e)}")
+            stale = True
+
+        profile = analytics_store.profile()
+        tweets_data = analytics_store.tweets(limit=request.args.get('limit', 100, type=int))
+
+        if not tweets_data:
             return jsonify({
-                "profile": {
-                    "username": user_info.screen_name,
-                    "totalTweets": user_info.statuses_count,
-                    "followers": user_info.followers_count,
-                    "following": user_info.friends_count
-                },
+                "profile": profile,
                 "metrics": {
-                    "tweets": total_tweets,
-                    "likes": total_likes,
-                    "retweets": total_retweets,
-                    "comments": total_replies,
-                    "followers": user_info.followers_count,
-                    "engagementRate": f"{engagement_rate:.1f}%"
+                    "tweets": 0,
+                    "likes": 0,
+                    "retweets": 0,
+                    "comments": 0,
+                    "followers": profile["followers"],
+                    "engagementRate": "0%"
                 },
-                "timelineData": timeline_data,
-                "tweets": tweets_data,
-                "bestPerformingTweet": best_tweet
+                "tweets": [],
+                "bestPerformingTweet": None,
+                "syncedAt": analytics_store.last_synced(),
+                "stale": stale
             }), 200
-            
-        except tweepy.TweepyException as e:
-            logger.error(f"Error fetching tweets: {str(e)}")
-            return jsonify({"error": f"Failed to fetch tweets: {str(e)}"}), 500
-            
+
+        # Calculate metrics
+        total_likes = sum(t['likes'] for t in tweets_data)
+        total_retweets = sum(t['retweets'] for t in tweets_data)
+        total_replies = sum(t['comments'] for t in tweets_data)
+
+        # Track best performing tweet
+        best_tweet = None
+        max_engagement = 0
+        for tweet_data in tweets_data:
+            engagement = tweet_data['likes'] + tweet_data['retweets'] + tweet_data['comments']
+            if engagement > max_engagement:
+                max_engagement = engagement
+                best_tweet = tweet_data
+
+        # Calculate engagement rate
+        total_tweets = len(tweets_data)
+        total_engagement = total_likes + total_retweets + total_replies
+        engagement_rate = (total_engagement / max(total_tweets, 1) * 100) if total_tweets > 0 else 0
+
+        # Timeline over every stored tweet in range, not just the latest page
+        timeline_data = aggregate(
+            analytics_store.tweets(since=timeline_start.astimezone(timezone.utc).isoformat()),
+            timeline_start, timeline_end, bucket=bucket, tz=tz
+        )
+
+        return jsonify({
+            "profile": profile,
+            "metrics": {
+                "tweets": total_tweets,
+                "likes": total_likes,
+                "retweets": total_retweets,
+                "comments": total_replies,
+                "followers": profile["followers"],
+                "engagementRate": f"{engagement_rate:.1f}%"
+            },
+            "timelineData": timeline_data,
+            "timeline": {
+                "bucket": bucket,
+                "timezone": str(tz),
+                "start": timeline_start.isoformat(),
+                "end": timeline_end.isoformat()
+            },
+            "tweets": tweets_data,
+            "bestPerformingTweet": best_tweet,
+            "syncedAt": analytics_store.last_synced(),
+            "stale": stale
+        }), 200
+
+    except RateLimitExceeded as e:
+        response = jsonify({"error": str(e), "retryAfter": round(e.retry_after)})
+        response.headers['Retry-After'] = str(round(e.retry_after))
+        return response, 429
     except Exception as e:
         logger.error(f"Error in fetch_twitter_analytics: {str(e)}")
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+@app.route('/api/twitter/tweets/<tweet_id>/history', methods=['GET'])
+def get_tweet_history(tweet_id):
+    """Metric snapshots recorded for one tweet, oldest first"""
+    return jsonify({"tweetId": tweet_id, "history": analytics_store.history(tweet_id)}), 200
+
 @app.route('/api/twitter/check-config', methods=['GET'])
 def check_twitter_config():
     try:
         # Check if we have the required Twitter API credentials
         if all([API_KEY, API_SECRET, ACCESS_TOKEN, ACCESS_TOKEN_SECRET, BEARER_TOKEN]):
-            # You could optionally verify the credentials here by making a test API call
+            # Use the cached verified user if there is one, without an extra API call
+            user = twitter.cached_user()
             return jsonify({
                 'configured': True,
-                'username': 'Developer Account'  # You could fetch the actual username if needed
+                'username': user.screen_name if user else 'Developer Account',
+                'rateLimits': rate_limits.snapshot()  # Remaining budget per endpoint
             })
         return jsonify({
             'configured': False,
@@ -496,4 +631,6 @@ def health_check():
 
 if __name__ == '__main__':
     logger.info("Starting Twitter posting service on port 5000")
+    tweet_queue.start()  # Resume jobs left over from a previous run
+    blob_store.start()  # Periodically delete expired uploads
     app.run(debug=True, port=5000)
\ No newline at end of file
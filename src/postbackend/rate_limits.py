@@ -0,0 +1,180 @@
+import logging
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+MEDIA_UPLOAD = "media_upload"
+MEDIA_STATUS = "media_status"
+CREATE_TWEET = "create_tweet"
+USER_TIMELINE = "user_timeline"
+TWEET_LOOKUP = "tweet_lookup"
+VERIFY_CREDENTIALS = "verify_credentials"
+
+# (method, path pattern) -> endpoint whose window the response reports
+ENDPOINTS = [
+    ("POST", re.compile(r"^/1\.1/media/upload\.json$"), MEDIA_UPLOAD),
+    ("GET", re.compile(r"^/1\.1/media/upload\.json$"), MEDIA_STATUS),
+    ("POST", re.compile(r"^/2/tweets$"), CREATE_TWEET),
+    ("GET", re.compile(r"^/2/users/[^/]+/tweets$"), USER_TIMELINE),
+    ("GET", re.compile(r"^/2/tweets$"), TWEET_LOOKUP),
+    ("GET", re.compile(r"^/1\.1/account/verify_credentials\.json$"), VERIFY_CREDENTIALS),
+]
+
+# Starting (limit, window seconds) until a response reports the real window;
+# deliberately conservative, since the actual values depend on the API tier
+DEFAULT_LIMITS = {
+    MEDIA_UPLOAD: (50, 900),
+    MEDIA_STATUS: (300, 900),
+    CREATE_TWEET: (50, 900),
+    USER_TIMELINE: (900, 900),
+    TWEET_LOOKUP: (300, 900),
+    VERIFY_CREDENTIALS: (75, 900),
+}
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"Rate limit for {endpoint} exhausted; retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def endpoint_for(method, url):
+    path = urlparse(url).path
+    for endpoint_method, pattern, endpoint in ENDPOINTS:
+        if method == endpoint_method and pattern.match(path):
+            return endpoint
+    return None
+
+
+class Bucket:
+    """
+    Token bucket for one endpoint, capped by the window Twitter reports.
+
+    Tokens refill at limit/window, so calls are paced evenly across the
+    window. Up to `burst` calls can still go through back to back. Once
+    the server reports no calls remaining, nothing goes out until the
+    window resets.
+    """
+
+    def __init__(self, limit, window, burst):
+        self.limit = limit
+        self.window = window
+        self.burst = burst
+        self.tokens = float(burst)
+        self.remaining = None  # Unknown until the first response
+        self.reset_at = None
+        self.from_headers = False
+        self.updated = time.time()
+
+    def refill(self, now):
+        if self.reset_at is not None and now >= self.reset_at:
+            self.remaining, self.reset_at = None, None
+        rate = self.limit / self.window
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        self.refill(now)
+        if self.remaining is not None and self.remaining <= 0 and self.reset_at is not None:
+            return self.reset_at - now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) * self.window / self.limit
+
+    def take(self):
+        self.tokens -= 1
+        if self.remaining is not None:
+            self.remaining -= 1
+
+    def observe(self, limit, remaining, reset_at):
+        if limit:
+            self.limit = limit
+        self.remaining = remaining
+        self.reset_at = reset_at
+        self.from_headers = True
+
+    def snapshot(self, now):
+        self.refill(now)
+        return {
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "resetAt": self.reset_at,
+            "resetIn": round(max(0, self.reset_at - now)) if self.reset_at else None,
+            "tokens": round(self.tokens, 2),
+            "source": "headers" if self.from_headers else "default",
+        }
+
+
+class RateLimitGovernor:
+    """
+    Paces outbound Twitter calls per endpoint, ahead of time, instead of
+    finding out from a 429.
+
+    Call acquire(endpoint) before a request: it returns at once when there
+    is budget, sleeps up to max_wait seconds for a token, or raises
+    RateLimitExceeded with the seconds until budget frees up. observe() is
+    a requests response hook that reads the x-rate-limit-* headers, so
+    budgets follow what Twitter actually reports.
+    """
+
+    def __init__(self, limits=None, burst=3, max_wait=30):
+        self.burst = burst
+        self.max_wait = max_wait
+        self._limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self._buckets = {}
+        self._cond = threading.Condition()
+
+    def _bucket(self, endpoint):
+        if endpoint not in self._buckets:
+            limit, window = self._limits.get(endpoint, (15, 900))
+            self._buckets[endpoint] = Bucket(limit, window, self.burst)
+        return self._buckets[endpoint]
+
+    def acquire(self, endpoint, max_wait=None):
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.time() + max_wait
+        with self._cond:
+            while True:
+                now = time.time()
+                bucket = self._bucket(endpoint)
+                wait = bucket.wait_time(now)
+                if wait <= 0:
+                    bucket.take()
+                    return
+                if now + wait > deadline:
+                    raise RateLimitExceeded(endpoint, wait)
+                logger.debug(f"Delaying {endpoint} call by {wait:.1f}s to stay within its rate limit")
+                self._cond.wait(wait)
+
+    def observe(self, response, *args, **kwargs):
+        """requests response hook: record the window an endpoint's response reports"""
+        endpoint = endpoint_for(response.request.method, response.request.url)
+        if endpoint is None:
+            return response
+        headers = response.headers
+        try:
+            limit = int(headers["x-rate-limit-limit"]) if "x-rate-limit-limit" in headers else None
+            remaining = int(headers["x-rate-limit-remaining"]) if "x-rate-limit-remaining" in headers else None
+            reset_at = float(headers["x-rate-limit-reset"]) if "x-rate-limit-reset" in headers else None
+        except ValueError:
+            logger.warning(f"Unparseable rate limit headers for {endpoint}")
+            return response
+        if response.status_code == 429:
+            remaining = 0
+            if reset_at is None:
+                reset_at = time.time() + self._bucket(endpoint).window
+        if remaining is None:
+            return response
+        with self._cond:
+            self._bucket(endpoint).observe(limit, remaining, reset_at)
+            self._cond.notify_all()
+        return response
+
+    def snapshot(self):
+        now = time.time()
+        with self._cond:
+            return {endpoint: self._bucket(endpoint).snapshot(now) for endpoint in DEFAULT_LIMITS}
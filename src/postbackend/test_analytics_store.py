@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from analytics_store import AnalyticsStore
+from timeline import aggregate
+
+PROFILE = {"username": "brand", "totalTweets": 3, "followers": 10, "following": 2}
+
+
+def tweet(tweet_id, created_at, likes=0, retweets=0, comments=0):
+    return {
+        "id": tweet_id,
+        "text": f"tweet {tweet_id}",
+        "createdAt": created_at,
+        "likes": likes,
+        "retweets": retweets,
+        "comments": comments,
+    }
+
+
+class FakeTimeline:
+    """Stands in for Twitter: serves tweets newer than since_id, plus metrics for tweets still moving"""
+
+    def __init__(self, tweets):
+        self.tweets = {t["id"]: dict(t) for t in tweets}
+        self.since_ids = []
+
+    def fetch(self, store):
+        since_id = store.newest_id()
+        self.since_ids.append(since_id)
+        new = [dict(t) for tweet_id, t in sorted(self.tweets.items()) if since_id is None or tweet_id > int(since_id)]
+        fetched = {str(t["id"]) for t in new}
+        refreshed = [
+            {key: self.tweets[int(tweet_id)][key] for key in ("id", "likes", "retweets", "comments")}
+            for tweet_id in store.ids_since("2026-01-01") if tweet_id not in fetched
+        ]
+        return PROFILE, new + refreshed
+
+
+class AnalyticsStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.store = AnalyticsStore(os.path.join(self.tmp, "analytics.db"), ttl=60)
+        self.twitter = FakeTimeline([
+            tweet(1, "2026-01-05T10:00:00+00:00", likes=1),
+            tweet(2, "2026-01-05T15:00:00+00:00", likes=2),
+        ])
+
+    def test_sync_fetches_only_tweets_newer_than_the_stored_ones(self):
+        self.assertTrue(self.store.sync(self.twitter.fetch))
+        self.twitter.tweets[3] = tweet(3, "2026-01-06T09:00:00+00:00", likes=5)
+        self.assertTrue(self.store.sync(self.twitter.fetch, force=True))
+
+        self.assertEqual(self.twitter.since_ids, [None, "2"])
+        self.assertEqual([t["id"] for t in self.store.tweets()], [3, 2, 1])
+        self.assertEqual(self.store.profile(), PROFILE)
+
+    def test_sync_is_skipped_while_fresh(self):
+        self.assertTrue(self.store.sync(self.twitter.fetch))
+        self.assertFalse(self.store.sync(self.twitter.fetch))
+        self.assertEqual(len(self.twitter.since_ids), 1)
+
+    def test_history_is_recorded_only_when_metrics_change(self):
+        self.store.sync(self.twitter.fetch)
+        self.store.sync(self.twitter.fetch, force=True)
+        self.assertEqual(len(self.store.history(1)), 1)
+
+        self.twitter.tweets[1]["likes"] = 7
+        self.store.sync(self.twitter.fetch, force=True)
+
+        history = self.store.history(1)
+        self.assertEqual([entry["likes"] for entry in history], [1, 7])
+        self.assertEqual(len(self.store.history(2)), 1)
+        # Metrics-only refreshes keep the stored text
+        self.assertEqual(self.store.tweets()[1]["text"], "tweet 1")
+        self.assertEqual(self.store.tweets()[1]["likes"], 7)
+
+    def test_timeline_is_built_from_stored_tweets(self):
+        self.store.sync(self.twitter.fetch)
+        start = datetime(2026, 1, 5, tzinfo=timezone.utc)
+        end = datetime(2026, 1, 6, 23, 59, tzinfo=timezone.utc)
+
+        bins = aggregate(self.store.tweets(since=start.isoformat()), start, end, bucket="day")
+
+        self.assertEqual([b["date"] for b in bins], ["2026-01-05", "2026-01-06"])
+        self.assertEqual([b["tweets"] for b in bins], [2, 0])
+        self.assertEqual(bins[0]["likes"], 3)
+        self.assertEqual(bins[0]["bestTweet"]["id"], 2)
+
+    def test_tweets_filters_by_created_at(self):
+        self.store.sync(self.twitter.fetch)
+        tweets = self.store.tweets(since="2026-01-05T12:00:00+00:00")
+        self.assertEqual([t["id"] for t in tweets], [2])
+        self.assertEqual([t["id"] for t in self.store.tweets(limit=1)], [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
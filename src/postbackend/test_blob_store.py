@@ -0,0 +1,77 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from blob_store import BlobStore, digest_from_path
+
+
+class BlobStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.store = BlobStore(os.path.join(self.tmp, "uploads"), os.path.join(self.tmp, "blobs.db"), ttl=60)
+
+    def put(self, data, acquire=False):
+        temp_path = os.path.join(self.store.temp_dir, "upload.part")
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        return self.store.put(temp_path, hashlib.sha256(data).hexdigest(), "png", acquire=acquire)
+
+    def age(self, digest, seconds):
+        with self.store._connect() as conn:
+            conn.execute("UPDATE blobs SET last_used_at = last_used_at - ? WHERE hash = ?", (seconds, digest))
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.put(b"image", acquire=True)
+        second = self.put(b"image", acquire=True)
+        self.assertEqual(first["path"], second["path"])
+        self.assertEqual(second["refcount"], 2)
+        self.assertEqual(self.store.stats()["blobs"], 1)
+        self.assertEqual(os.listdir(self.store.temp_dir), [])
+        self.assertEqual(digest_from_path(first["path"]), first["hash"])
+
+    def test_unreferenced_blobs_are_collected_after_the_ttl(self):
+        blob = self.put(b"image")
+        self.assertEqual(self.store.collect(), 0)
+        self.age(blob["hash"], 61)
+        self.assertEqual(self.store.collect(), 1)
+        self.assertIsNone(self.store.get(blob["hash"]))
+        self.assertFalse(os.path.exists(blob["path"]))
+
+    def test_referenced_blobs_survive_until_released(self):
+        blob = self.put(b"image")
+        # e.g. a pin taken when content is saved to a campaign
+        self.assertEqual(self.store.acquire(blob["hash"])["refcount"], 1)
+        self.age(blob["hash"], 3600)
+        self.assertEqual(self.store.collect(), 0)
+
+        self.store.release(blob["hash"])
+        self.assertEqual(self.store.collect(), 0)  # The TTL restarts from the release
+        self.age(blob["hash"], 61)
+        self.assertEqual(self.store.collect(), 1)
+
+    def test_release_never_goes_below_zero(self):
+        blob = self.put(b"image")
+        self.store.release(blob["hash"])
+        self.assertEqual(self.store.get(blob["hash"])["refcount"], 0)
+
+    def test_acquire_rejects_missing_blobs_and_bad_hashes(self):
+        self.assertIsNone(self.store.acquire("0" * 64))
+        self.assertIsNone(self.store.acquire("../../etc/passwd"))
+        blob = self.put(b"image")
+        os.remove(blob["path"])
+        self.assertIsNone(self.store.acquire(blob["hash"]))
+
+    def test_collect_removes_stale_partial_uploads(self):
+        stale = os.path.join(self.store.temp_dir, "stale.part")
+        open(stale, "wb").close()
+        os.utime(stale, (time.time() - 120, time.time() - 120))
+        self.store.collect()
+        self.assertFalse(os.path.exists(stale))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from data_url import (
+    DataUrlDecoder, JsonStringFieldStreamer, UnsupportedMediaType, UploadError, UploadTooLarge, UploadWriter, sniff
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + os.urandom(4000)
+
+
+def stream_field(body, chunk_size):
+    """Feeds body to a streamer for imageData in chunk_size pieces; returns (value, other fields)"""
+    value = bytearray()
+    streamer = JsonStringFieldStreamer("imageData", value.extend)
+    for i in range(0, len(body), chunk_size):
+        streamer.feed(body[i:i + chunk_size])
+    return bytes(value), streamer.finish()
+
+
+class JsonStringFieldStreamerTests(unittest.TestCase):
+    def test_streams_the_field_and_parses_the_rest(self):
+        body = json.dumps({"filename": "a.png", "imageData": "data:image/png;base64,QUJD", "n": 1}).encode()
+        for chunk_size in (1, 3, 7, len(body)):
+            value, fields = stream_field(body, chunk_size)
+            self.assertEqual(value, b"data:image/png;base64,QUJD")
+            self.assertEqual(fields, {"filename": "a.png", "imageData": "", "n": 1})
+
+    def test_unescapes_slashes_split_across_chunks(self):
+        body = b'{"imageData": "ab\\/cd\\/\\/ef"}'
+        for chunk_size in range(1, len(body) + 1):
+            value, _ = stream_field(body, chunk_size)
+            self.assertEqual(value, b"ab/cd//ef", chunk_size)
+
+    def test_rejects_other_escapes(self):
+        for body in (b'{"imageData": "ab\\"cd"}', b'{"imageData": "ab\\ncd"}'):
+            for chunk_size in (1, 3, len(body)):
+                with self.assertRaises(UploadError):
+                    stream_field(body, chunk_size)
+
+    def test_requires_the_field(self):
+        with self.assertRaises(UploadError):
+            stream_field(b'{"filename": "a.png"}', 4)
+
+    def test_streams_large_values_quickly(self):
+        payload = base64.b64encode(os.urandom(11 * 1024 * 1024))
+        body = b'{"imageData": "data:image/png;base64,' + payload + b'"}'
+        started = time.monotonic()
+        value, _ = stream_field(body, 64 * 1024)
+        # Byte-at-a-time scanning took seconds for a body this size
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(len(value), len(payload) + len(b"data:image/png;base64,"))
+
+
+class DataUrlDecoderTests(unittest.TestCase):
+    def decode(self, data_url, chunk_size):
+        out = bytearray()
+        decoder = DataUrlDecoder(out.extend)
+        for i in range(0, len(data_url), chunk_size):
+            decoder.feed(data_url[i:i + chunk_size])
+        decoder.finish()
+        return bytes(out)
+
+    def test_decodes_in_any_chunking_and_tolerates_missing_padding(self):
+        data_url = b"data:image/png;base64," + base64.b64encode(PNG).rstrip(b"=")
+        for chunk_size in (1, 5, 64, len(data_url)):
+            self.assertEqual(self.decode(data_url, chunk_size), PNG)
+
+    def test_rejects_malformed_urls(self):
+        for data_url in (b"image/png;base64,QUJD", b"data:image/png,QUJD", b"data:image/png;base64,QU*D"):
+            with self.assertRaises(UploadError):
+                self.decode(data_url, 4)
+
+
+class UploadWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def test_detects_the_format_from_magic_bytes(self):
+        writer = UploadWriter(self.folder, max_bytes=len(PNG))
+        self.addCleanup(writer.abort)
+        writer.write(PNG[:3])
+        writer.write(PNG[3:])
+        self.assertEqual(writer.detect(), ("image/png", "png"))
+
+    def test_enforces_max_bytes(self):
+        writer = UploadWriter(self.folder, max_bytes=10)
+        self.addCleanup(writer.abort)
+        with self.assertRaises(UploadTooLarge):
+            writer.write(b"x" * 11)
+
+    def test_rejects_unrecognized_files(self):
+        writer = UploadWriter(self.folder, max_bytes=100)
+        self.addCleanup(writer.abort)
+        writer.write(b"%PDF-1.7 not an image")
+        with self.assertRaises(UnsupportedMediaType):
+            writer.detect()
+
+    def test_sniff_requires_riff_for_webp(self):
+        self.assertEqual(sniff(b"RIFF\0\0\0\0WEBPVP8 "), ("image/webp", "webp"))
+        self.assertIsNone(sniff(b"XXXX\0\0\0\0WEBPVP8 "))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import tweepy
+
+from media_upload import ChunkedUploader, MediaUploadError, UploadTimeout
+from twitter_clients import TwitterClients
+
+CHUNK_SIZE = 1024
+
+
+class FakeUploadServer(ThreadingHTTPServer):
+    """
+    Local stand-in for upload.twitter.com's chunked media endpoints.
+
+    append_errors maps a segment index to status codes returned, in order,
+    before that segment is accepted. finalize_processing is the
+    processing_info FINALIZE returns, and status_states the states that
+    successive STATUS calls report.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeUploadHandler)
+        self.next_media_id = 100
+        self.inits = []
+        self.appends = []
+        self.finalized = []
+        self.status_calls = 0
+        self.append_errors = {}
+        self.finalize_processing = None
+        self.status_states = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class FakeUploadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _fields(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        content_type = self.headers["Content-Type"]
+        if content_type.startswith("multipart/"):
+            message = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+            return {
+                part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                for part in message.get_payload()
+            }
+        return {key: values[0].encode() for key, values in parse_qs(body.decode()).items()}
+
+    def do_POST(self):
+        server = self.server
+        fields = self._fields()
+        command = fields["command"].decode()
+        if command == "INIT":
+            server.next_media_id += 1
+            server.inits.append(server.next_media_id)
+            media_id = server.next_media_id
+            return self._send(202, {"media_id": media_id, "media_id_string": str(media_id), "expires_after_secs": 86400})
+        if command == "APPEND":
+            media_id, segment = int(fields["media_id"]), int(fields["segment_index"])
+            errors = server.append_errors.get(segment)
+            if errors:
+                return self._send(errors.pop(0), {"errors": [{"message": "Segment rejected", "code": 0}]})
+            server.appends.append((media_id, segment, len(fields["media"])))
+            return self._send(204)
+        if command == "FINALIZE":
+            media_id = int(fields["media_id"])
+            server.finalized.append(media_id)
+            body = {"media_id": media_id, "media_id_string": str(media_id)}
+            if server.finalize_processing:
+                body["processing_info"] = server.finalize_processing
+            return self._send(201, body)
+        self._send(400, {"errors": [{"message": f"Unknown command {command}", "code": 0}]})
+
+    def do_GET(self):
+        server = self.server
+        query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        if query.get("command") != "STATUS":
+            return self._send(404, {})
+        server.status_calls += 1
+        state = server.status_states.pop(0)
+        processing_info = {"state": state, "check_after_secs": 0}
+        if state == "failed":
+            processing_info["error"] = {"message": "Unsupported video codec"}
+        self._send(200, {"media_id": int(query["media_id"]), "processing_info": processing_info})
+
+
+class ChunkedUploaderTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.server = FakeUploadServer()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        # TWITTER_API_BASE_URL in post.py does the same host rewriting
+        self.api = TwitterClients("key", "secret", "token", "token-secret", base_url=self.server.base_url).api
+        self.uploader = self.make_uploader()
+        self.path = os.path.join(self.tmp, "clip.mp4")
+        with open(self.path, "wb") as f:
+            f.write(os.urandom(CHUNK_SIZE * 2 + 100))
+
+    def make_uploader(self, **kwargs):
+        return ChunkedUploader(
+            self.api, os.path.join(self.tmp, "state.db"), chunk_size=CHUNK_SIZE,
+            append_retries=2, retry_backoff=0, **kwargs
+        )
+
+    def test_init_append_finalize(self):
+        media_id = self.uploader.upload(self.path)
+
+        self.assertEqual(str(media_id), str(self.server.inits[0]))
+        self.assertEqual(self.server.appends, [
+            (self.server.inits[0], 0, CHUNK_SIZE),
+            (self.server.inits[0], 1, CHUNK_SIZE),
+            (self.server.inits[0], 2, 100),
+        ])
+        self.assertEqual(self.server.finalized, self.server.inits)
+        self.assertEqual(self.server.status_calls, 0)
+
+    def test_resumes_after_an_append_failure(self):
+        self.server.append_errors = {1: [503, 503]}
+        with self.assertRaises(tweepy.TwitterServerError):
+            self.uploader.upload(self.path, upload_key="job-1")
+        self.assertEqual([segment for _, segment, _ in self.server.appends], [0])
+
+        media_id = self.uploader.upload(self.path, upload_key="job-1")
+
+        # Same media id, continuing from the segment that failed
+        self.assertEqual(len(self.server.inits), 1)
+        self.assertEqual(str(media_id), str(self.server.inits[0]))
+        self.assertEqual([segment for _, segment, _ in self.server.appends], [0, 1, 2])
+
+    def test_append_retries_server_errors(self):
+        self.server.append_errors = {1: [503]}
+        self.uploader.upload(self.path)
+        self.assertEqual([segment for _, segment, _ in self.server.appends], [0, 1, 2])
+
+    def test_client_error_discards_progress(self):
+        self.server.append_errors = {1: [400]}
+        with self.assertRaises(tweepy.BadRequest):
+            self.uploader.upload(self.path, upload_key="job-1")
+
+        self.uploader.upload(self.path, upload_key="job-1")
+
+        # The dead media id is not resumed; the upload starts over
+        self.assertEqual(len(self.server.inits), 2)
+        self.assertEqual(self.server.finalized, [self.server.inits[1]])
+        self.assertEqual([segment for media_id, segment, _ in self.server.appends if media_id == self.server.inits[1]],
+                         [0, 1, 2])
+
+    def test_uploads_with_different_keys_never_share_a_media_id(self):
+        self.server.append_errors = {1: [503, 503]}
+        with self.assertRaises(tweepy.TwitterServerError):
+            self.uploader.upload(self.path, upload_key="job-1")
+
+        media_id = self.uploader.upload(self.path, upload_key="job-2")
+
+        self.assertEqual(len(self.server.inits), 2)
+        self.assertEqual(str(media_id), str(self.server.inits[1]))
+
+    def test_polls_status_until_processing_succeeds(self):
+        self.server.finalize_processing = {"state": "pending", "check_after_secs": 0}
+        self.server.status_states = ["in_progress", "succeeded"]
+
+        self.uploader.upload(self.path)
+
+        self.assertEqual(self.server.status_calls, 2)
+
+    def test_raises_when_processing_fails(self):
+        self.server.finalize_processing = {"state": "pending", "check_after_secs": 0}
+        self.server.status_states = ["in_progress", "failed"]
+
+        with self.assertRaises(MediaUploadError) as raised:
+            self.uploader.upload(self.path)
+        self.assertIn("Unsupported video codec", str(raised.exception))
+
+    def test_rate_limit_hooks_run_once_per_upload_and_per_status_poll(self):
+        calls = []
+        uploader = self.make_uploader(
+            before_upload=lambda: calls.append("upload"), before_status=lambda: calls.append("status")
+        )
+        self.server.finalize_processing = {"state": "pending", "check_after_secs": 0}
+        self.server.status_states = ["in_progress", "succeeded"]
+
+        uploader.upload(self.path)
+
+        self.assertEqual(len(self.server.appends), 3)
+        self.assertEqual(calls, ["upload", "status", "status"])
+
+    def test_timeout_stops_the_upload_and_the_next_try_resumes(self):
+        with self.assertRaises(UploadTimeout):
+            self.make_uploader(timeout=0).upload(self.path, upload_key="job-1")
+        self.assertEqual(self.server.appends, [])
+
+        self.uploader.upload(self.path, upload_key="job-1")
+
+        self.assertEqual(len(self.server.inits), 1)
+        self.assertEqual([segment for _, segment, _ in self.server.appends], [0, 1, 2])
+
+    def test_timeout_covers_processing(self):
+        self.server.finalize_processing = {"state": "pending", "check_after_secs": 1}
+        self.server.status_states = ["succeeded"]
+        with self.assertRaises(UploadTimeout):
+            self.make_uploader(timeout=0.5).upload(self.path)
+        self.assertEqual(self.server.status_calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+from rate_limits import (
+    CREATE_TWEET, MEDIA_STATUS, MEDIA_UPLOAD, USER_TIMELINE, Bucket, RateLimitExceeded, RateLimitGovernor, endpoint_for
+)
+
+
+def fake_response(method, url, status_code=200, headers=None):
+    return SimpleNamespace(
+        request=SimpleNamespace(method=method, url=url),
+        status_code=status_code,
+        headers=headers or {},
+    )
+
+
+class BucketTests(unittest.TestCase):
+    def test_burst_then_refill_at_limit_per_window(self):
+        bucket = Bucket(limit=10, window=100, burst=2)
+        now = bucket.updated
+        for _ in range(2):
+            self.assertEqual(bucket.wait_time(now), 0)
+            bucket.take()
+        # Empty: one token refills every window / limit seconds
+        self.assertAlmostEqual(bucket.wait_time(now), 10)
+        self.assertAlmostEqual(bucket.wait_time(now + 4), 6)
+        self.assertEqual(bucket.wait_time(now + 10), 0)
+
+    def test_refill_is_capped_at_burst(self):
+        bucket = Bucket(limit=10, window=100, burst=2)
+        bucket.refill(bucket.updated + 1000)
+        self.assertEqual(bucket.tokens, 2)
+
+    def test_exhausted_window_blocks_until_reset(self):
+        bucket = Bucket(limit=10, window=100, burst=5)
+        now = bucket.updated
+        bucket.observe(limit=10, remaining=0, reset_at=now + 50)
+        self.assertAlmostEqual(bucket.wait_time(now), 50)
+        # Tokens alone don't help while the server says nothing is left
+        bucket.refill(now + 30)
+        self.assertAlmostEqual(bucket.wait_time(now + 30), 20)
+        self.assertEqual(bucket.wait_time(now + 50), 0)
+        self.assertIsNone(bucket.remaining)
+
+    def test_take_counts_down_reported_remaining(self):
+        bucket = Bucket(limit=10, window=100, burst=5)
+        bucket.observe(limit=10, remaining=1, reset_at=bucket.updated + 100)
+        bucket.take()
+        self.assertEqual(bucket.remaining, 0)
+        self.assertGreater(bucket.wait_time(bucket.updated), 0)
+
+
+class RateLimitGovernorTests(unittest.TestCase):
+    def test_acquire_waits_for_a_token_within_max_wait(self):
+        governor = RateLimitGovernor(limits={CREATE_TWEET: (20, 1)}, burst=1, max_wait=1)
+        governor.acquire(CREATE_TWEET)
+        started = time.monotonic()
+        governor.acquire(CREATE_TWEET)
+        self.assertGreaterEqual(time.monotonic() - started, 0.03)
+
+    def test_acquire_raises_when_the_wait_exceeds_max_wait(self):
+        governor = RateLimitGovernor(limits={CREATE_TWEET: (1, 900)}, burst=1, max_wait=0.1)
+        governor.acquire(CREATE_TWEET)
+        with self.assertRaises(RateLimitExceeded) as raised:
+            governor.acquire(CREATE_TWEET)
+        self.assertEqual(raised.exception.endpoint, CREATE_TWEET)
+        self.assertAlmostEqual(raised.exception.retry_after, 900, delta=1)
+
+    def test_observe_reads_rate_limit_headers(self):
+        governor = RateLimitGovernor(burst=3)
+        reset_at = time.time() + 600
+        governor.observe(fake_response("POST", "https://api.twitter.com/2/tweets", headers={
+            "x-rate-limit-limit": "200",
+            "x-rate-limit-remaining": "0",
+            "x-rate-limit-reset": str(reset_at),
+        }))
+        snapshot = governor.snapshot()[CREATE_TWEET]
+        self.assertEqual(snapshot["limit"], 200)
+        self.assertEqual(snapshot["remaining"], 0)
+        self.assertEqual(snapshot["source"], "headers")
+        with self.assertRaises(RateLimitExceeded):
+            governor.acquire(CREATE_TWEET, max_wait=0)
+
+    def test_observe_treats_429_as_exhausted(self):
+        governor = RateLimitGovernor(limits={MEDIA_UPLOAD: (50, 900)})
+        governor.observe(fake_response("POST", "https://upload.twitter.com/1.1/media/upload.json", status_code=429))
+        snapshot = governor.snapshot()[MEDIA_UPLOAD]
+        self.assertEqual(snapshot["remaining"], 0)
+        self.assertAlmostEqual(snapshot["resetIn"], 900, delta=1)
+
+    def test_observe_ignores_unparseable_headers_and_other_urls(self):
+        governor = RateLimitGovernor()
+        governor.observe(fake_response("GET", "https://api.twitter.com/2/users/1/tweets", headers={
+            "x-rate-limit-remaining": "soon",
+        }))
+        governor.observe(fake_response("GET", "https://example.com/other", headers={
+            "x-rate-limit-remaining": "0",
+        }))
+        self.assertEqual(governor.snapshot()[USER_TIMELINE]["source"], "default")
+
+    def test_endpoint_for_matches_method_and_path(self):
+        self.assertEqual(endpoint_for("GET", "https://api.twitter.com/2/users/12/tweets?max_results=5"), USER_TIMELINE)
+        self.assertEqual(endpoint_for("POST", "https://api.twitter.com/2/tweets"), CREATE_TWEET)
+        self.assertIsNone(endpoint_for("DELETE", "https://api.twitter.com/2/tweets"))
+        # STATUS polls are GETs on the upload URL and have their own window
+        self.assertEqual(endpoint_for("POST", "https://upload.twitter.com/1.1/media/upload.json"), MEDIA_UPLOAD)
+        self.assertEqual(
+            endpoint_for("GET", "https://upload.twitter.com/1.1/media/upload.json?command=STATUS&media_id=1"),
+            MEDIA_STATUS,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from datetime import datetime, timezone
+
+from timeline import TimelineError, aggregate, default_range, get_timezone
+
+NEW_YORK = get_timezone("America/New_York")
+
+
+def tweet(tweet_id, created_at, likes=0, retweets=0, comments=0):
+    return {
+        "id": tweet_id,
+        "text": f"tweet {tweet_id}",
+        "createdAt": created_at,
+        "likes": likes,
+        "retweets": retweets,
+        "comments": comments,
+    }
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class HourBinTests(unittest.TestCase):
+    def test_spring_forward_has_no_phantom_hour(self):
+        # 2026-03-08 05:30 EDT; 02:00-03:00 local does not exist that night
+        start, end = default_range("hour", 6, NEW_YORK, now=utc(2026, 3, 8, 9, 30))
+        bins = aggregate([], start, end, "hour", NEW_YORK)
+        self.assertEqual(len(bins), 6)
+        starts = [datetime.fromisoformat(b["start"]) for b in bins]
+        self.assertEqual([s.astimezone(timezone.utc).hour for s in starts], [4, 5, 6, 7, 8, 9])
+        self.assertEqual([b["date"][-5:] for b in bins], ["23:00", "00:00", "01:00", "03:00", "04:00", "05:00"])
+
+    def test_fall_back_keeps_both_one_oclock_hours(self):
+        # 01:00-02:00 local happens twice on 2026-11-01: 05:00Z (EDT) and 06:00Z (EST)
+        tweets = [
+            tweet(1, "2026-11-01T05:15:00+00:00", likes=3),
+            tweet(2, "2026-11-01T06:15:00+00:00", likes=5),
+        ]
+        bins = aggregate(tweets, utc(2026, 11, 1, 4), utc(2026, 11, 1, 7, 59), "hour", NEW_YORK)
+        self.assertEqual(len(bins), 4)
+        self.assertEqual([b["tweets"] for b in bins], [0, 1, 1, 0])
+        self.assertEqual([b["likes"] for b in bins], [0, 3, 5, 0])
+        self.assertEqual(bins[1]["start"], "2026-11-01T01:00:00-04:00")
+        self.assertEqual(bins[2]["start"], "2026-11-01T01:00:00-05:00")
+
+    def test_half_hour_offsets_bin_on_local_hours(self):
+        kolkata = get_timezone("Asia/Kolkata")
+        bins = aggregate([tweet(1, "2026-01-01T04:45:00+00:00")], utc(2026, 1, 1, 4), utc(2026, 1, 1, 5), "hour", kolkata)
+        self.assertEqual([b["date"] for b in bins], ["2026-01-01T09:00", "2026-01-01T10:00"])
+        self.assertEqual([b["tweets"] for b in bins], [0, 1])
+
+
+class DayAndWeekBinTests(unittest.TestCase):
+    def test_days_follow_local_midnight_across_dst(self):
+        start, end = default_range("day", 3, NEW_YORK, now=utc(2026, 3, 9, 12))
+        tweets = [
+            tweet(1, "2026-03-08T04:30:00+00:00"),  # 23:30 EST on the 7th
+            tweet(2, "2026-03-08T05:30:00+00:00", likes=2),  # 00:30 EST on the 8th
+            tweet(3, "2026-03-09T03:30:00+00:00", likes=4),  # 23:30 EDT on the 8th
+        ]
+        bins = aggregate(tweets, start, end, "day", NEW_YORK)
+        self.assertEqual([b["date"] for b in bins], ["2026-03-07", "2026-03-08", "2026-03-09"])
+        self.assertEqual([b["tweets"] for b in bins], [1, 2, 0])
+        self.assertEqual(bins[1]["bestTweet"]["id"], 3)
+        self.assertEqual(bins[1]["engagementRate"], 300.0)
+
+    def test_weeks_start_on_monday(self):
+        bins = aggregate([], utc(2026, 1, 7), utc(2026, 1, 20), "week")
+        self.assertEqual([b["date"] for b in bins], ["2026-01-05", "2026-01-12", "2026-01-19"])
+
+    def test_rejects_unknown_buckets(self):
+        with self.assertRaises(TimelineError):
+            aggregate([], utc(2026, 1, 1), utc(2026, 1, 2), "month")
+
+
+if __name__ == "__main__":
+    unittest.main()
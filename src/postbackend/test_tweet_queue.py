@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from tweet_queue import FAILED, SUCCEEDED, TweetQueue
+
+
+class ScriptedHandler:
+    """Returns the queued results in order, one per call"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+        self.done = threading.Event()
+
+    def __call__(self, text, image_path, job_id):
+        self.calls += 1
+        result = self.results.pop(0)
+        if not self.results:
+            self.done.set()
+        return result
+
+
+class SlowHandler:
+    """Records which job ids it ran, taking `seconds` for each"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.job_ids = []
+        self.lock = threading.Lock()
+
+    def __call__(self, text, image_path, job_id):
+        with self.lock:
+            self.job_ids.append(job_id)
+        time.sleep(self.seconds)
+        return {"success": True, "tweet_id": "1"}
+
+
+class TweetQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.db_path = os.path.join(self.tmp, "jobs.db")
+
+    def run_job(self, results, **kwargs):
+        handler = ScriptedHandler(results)
+        queue = TweetQueue(self.db_path, handler, num_workers=1, retry_backoff=0, poll_interval=0.01, **kwargs)
+        self.addCleanup(queue.stop)
+        job = queue.submit("hello", os.path.join(self.tmp, "image.jpg"))
+        self.assertTrue(handler.done.wait(5))
+        for _ in range(500):
+            job = queue.get(job["job_id"])
+            if job["status"] in (SUCCEEDED, FAILED):
+                break
+            time.sleep(0.01)
+        return job, handler
+
+    def test_retryable_failures_use_up_attempts(self):
+        job, handler = self.run_job([{"success": False, "error": "boom", "retryable": True}] * 3, max_attempts=3)
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["attempts"], 3)
+        self.assertEqual(handler.calls, 3)
+
+    def test_rate_limited_deferrals_do_not_use_up_attempts(self):
+        rate_limited = {"success": False, "error": "Rate limit exceeded", "rate_limited": True, "retry_after": 0}
+        job, handler = self.run_job([rate_limited] * 5 + [{"success": True, "tweet_id": "42"}], max_attempts=3)
+        self.assertEqual(job["status"], SUCCEEDED)
+        self.assertEqual(job["tweet_id"], "42")
+        self.assertEqual(job["attempts"], 1)
+        self.assertEqual(job["deferrals"], 5)
+
+    def test_rate_limited_jobs_fail_after_max_deferrals(self):
+        rate_limited = {"success": False, "error": "Rate limit exceeded", "rate_limited": True, "retry_after": 0}
+        job, handler = self.run_job([rate_limited] * 3, max_deferrals=2)
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["deferrals"], 3)
+        self.assertTrue(job["rate_limited"])
+
+    def wait_until_finished(self, queue, job_id):
+        for _ in range(500):
+            job = queue.get(job_id)
+            if job["status"] in (SUCCEEDED, FAILED):
+                return job
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} never finished")
+
+    def test_long_handlers_are_not_reclaimed_by_other_workers(self):
+        handler = SlowHandler(1.5)
+        queue = TweetQueue(self.db_path, handler, num_workers=2, lease_seconds=0.5, poll_interval=0.05)
+        self.addCleanup(queue.stop)
+        job = queue.submit("hello", "image.jpg")
+        job = self.wait_until_finished(queue, job["job_id"])
+        self.assertEqual(job["status"], SUCCEEDED)
+        self.assertEqual(handler.job_ids, [job["job_id"]])
+        self.assertEqual(job["attempts"], 1)
+
+    def test_leases_are_renewed_for_workers_in_other_processes(self):
+        # A second queue on the same database stands in for another process
+        handler = SlowHandler(1.5)
+        queue = TweetQueue(self.db_path, handler, num_workers=1, lease_seconds=0.5, poll_interval=0.05)
+        other = TweetQueue(self.db_path, handler, num_workers=1, lease_seconds=0.5, poll_interval=0.05)
+        self.addCleanup(queue.stop)
+        self.addCleanup(other.stop)
+        job = queue.submit("hello", "image.jpg")
+        time.sleep(0.1)
+        other.start()
+        job = self.wait_until_finished(queue, job["job_id"])
+        time.sleep(0.2)
+        self.assertEqual(handler.job_ids, [job["job_id"]])
+
+    def test_owned_images_are_released_when_the_job_finishes(self):
+        released = []
+        handler = ScriptedHandler([{"success": True, "tweet_id": "1"}])
+        queue = TweetQueue(self.db_path, handler, num_workers=1, poll_interval=0.01, release_image=released.append)
+        self.addCleanup(queue.stop)
+        job = queue.submit("hello", "blob.jpg", owns_image=True)
+        self.assertTrue(handler.done.wait(5))
+        for _ in range(500):
+            if queue.get(job["job_id"])["status"] == SUCCEEDED:
+                break
+            time.sleep(0.01)
+        self.assertEqual(released, ["blob.jpg"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+BUCKETS = ("hour", "day", "week")
+MAX_BINS = 5000
+
+
+class TimelineError(ValueError):
+    pass
+
+
+def get_timezone(name):
+    if not name or name.upper() == "UTC":
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise TimelineError(f"Unknown timezone: {name}")
+
+
+def bin_start(moment, bucket):
+    """Local start of the bin containing an aware local datetime"""
+    if bucket == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "week":
+        day -= timedelta(days=day.weekday())  # Weeks start on Monday
+    return day
+
+
+def bin_key(moment, bucket):
+    """
+    Hashable bin identity. Hours are keyed by their UTC instant, so the
+    repeated hour when clocks go back is two bins; days and weeks are keyed
+    by wall-clock date, so they follow DST.
+    """
+    start = bin_start(moment, bucket)
+    if bucket == "hour":
+        return start.astimezone(timezone.utc)
+    return (start.year, start.month, start.day)
+
+
+def bin_label(start, bucket):
+    if bucket == "hour":
+        return start.strftime("%Y-%m-%dT%H:00")
+    return start.strftime("%Y-%m-%d")
+
+
+def bin_range(start, end, bucket, tz):
+    """Local bin starts covering [start, end], oldest first"""
+    if bucket == "hour":
+        # Walk real hours in UTC, so no hour is invented when clocks go
+        # forward or merged when they go back
+        current = bin_start(start, bucket).astimezone(timezone.utc)
+        last = bin_start(end, bucket).astimezone(timezone.utc)
+        step = timedelta(hours=1)
+        to_local = lambda moment: moment.astimezone(tz)
+    else:
+        # Walk in naive wall-clock time, then attach the zone, so DST days are not skipped or doubled
+        current = bin_start(start, bucket).replace(tzinfo=None)
+        last = bin_start(end, bucket).replace(tzinfo=None)
+        step = timedelta(days=7 if bucket == "week" else 1)
+        to_local = lambda moment: moment.replace(tzinfo=tz)
+    starts = []
+    while current <= last:
+        starts.append(to_local(current))
+        if len(starts) > MAX_BINS:
+            raise TimelineError(f"Range needs more than {MAX_BINS} {bucket} bins")
+        current += step
+    return starts
+
+
+def default_range(bucket, periods, tz, now=None):
+    """The current bin and the periods - 1 bins before it, ending now"""
+    if bucket not in BUCKETS:
+        raise TimelineError(f"bucket must be one of {', '.join(BUCKETS)}")
+    if periods < 1:
+        raise TimelineError("periods must be at least 1")
+    end = (now or datetime.now(timezone.utc)).astimezone(tz)
+    if bucket == "hour":
+        start = bin_start(end, bucket).astimezone(timezone.utc) - timedelta(hours=periods - 1)
+        return start.astimezone(tz), end
+    current = bin_start(end, bucket).replace(tzinfo=None)
+    start = current - timedelta(days=(periods - 1) * (7 if bucket == "week" else 1))
+    return start.replace(tzinfo=tz), end
+
+
+def parse_datetime(value, tz):
+    """Parse an ISO date or datetime; naive values are read in tz"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise TimelineError(f"Invalid date: {value}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=tz)
+
+
+def parse_created_at(value):
+    created = datetime.fromisoformat(value)
+    return created if created.tzinfo else created.replace(tzinfo=timezone.utc)
+
+
+def aggregate(tweets, start, end, bucket="day", tz=timezone.utc):
+    """
+    Bucket tweets into contiguous hour/day/week bins between two aware
+    datetimes, in one pass over the tweets.
+
+    Each bin holds tweet and metric totals, engagement (likes + retweets +
+    comments), the engagement rate per tweet, and the best-performing tweet.
+    Empty bins are included, so charts get a point for every bin. Tweets
+    outside the range are ignored.
+    """
+    if bucket not in BUCKETS:
+        raise TimelineError(f"bucket must be one of {', '.join(BUCKETS)}")
+    start, end = start.astimezone(tz), end.astimezone(tz)
+    starts = bin_range(start, end, bucket, tz)
+    bins = [
+        {
+            "date": bin_label(bin_start_at, bucket),
+            "start": bin_start_at.isoformat(),
+            "tweets": 0,
+            "likes": 0,
+            "retweets": 0,
+            "comments": 0,
+            "engagement": 0,
+            "engagementRate": 0.0,
+            "bestTweet": None,
+        }
+        for bin_start_at in starts
+    ]
+    index = {bin_key(bin_start_at, bucket): i for i, bin_start_at in enumerate(starts)}
+    best_engagement = [0] * len(bins)
+
+    for tweet in tweets:
+        created = parse_created_at(tweet["createdAt"]).astimezone(tz)
+        if created < start or created > end:
+            continue
+        i = index.get(bin_key(created, bucket))
+        if i is None:
+            continue
+        current = bins[i]
+        engagement = tweet["likes"] + tweet["retweets"] + tweet["comments"]
+        current["tweets"] += 1
+        current["likes"] += tweet["likes"]
+        current["retweets"] += tweet["retweets"]
+        current["comments"] += tweet["comments"]
+        current["engagement"] += engagement
+        if engagement > best_engagement[i]:
+            best_engagement[i] = engagement
+            current["bestTweet"] = {
+                "id": tweet["id"],
+                "text": tweet["text"],
+                "engagement": engagement,
+                "permalink": tweet.get("permalink"),
+            }
+
+    for current in bins:
+        if current["tweets"]:
+            current["engagementRate"] = round(current["engagement"] / current["tweets"] * 100, 1)
+    return bins
@@ -0,0 +1,246 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweet_jobs (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    image_path TEXT NOT NULL,
+    owns_image INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    deferrals INTEGER NOT NULL DEFAULT 0,
+    tweet_id TEXT,
+    error TEXT,
+    rate_limited INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tweet_jobs_ready_idx ON tweet_jobs (status, run_after);
+"""
+
+
+class TweetQueue:
+    """
+    Durable tweet-posting queue backed by SQLite and drained by worker threads.
+
+    Jobs survive restarts. A worker claims a job with a lease, which it
+    renews every lease_seconds / 3 while the handler runs; if the process
+    dies mid-post, the job becomes claimable again once the lease expires.
+    handler(text, image_path, job_id) returns the same result dict as
+    post_tweet_with_image; job_id stays the same across a job's retries.
+    Retryable failures are retried with exponential backoff up to
+    max_attempts. Rate-limited jobs are deferred until the window resets
+    without using up an attempt, up to max_deferrals times. Images the queue
+    owns (e.g. uploads saved for the job) are handed to
+    release_image(image_path) once the job is finished; by default they are
+    deleted.
+    """
+
+    def __init__(self, db_path, handler, num_workers=2, max_attempts=3, max_deferrals=20,
+                 retry_backoff=30, lease_seconds=600, poll_interval=1.0, release_image=os.remove):
+        self.db_path = db_path
+        self.handler = handler
+        self.num_workers = num_workers
+        self.max_attempts = max_attempts
+        self.max_deferrals = max_deferrals
+        self.retry_backoff = retry_backoff
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.release_image = release_image
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = set()  # Job ids this process is posting; never reclaimed here
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(tweet_jobs)")}
+            if "deferrals" not in columns:
+                conn.execute("ALTER TABLE tweet_jobs ADD COLUMN deferrals INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        # One short-lived connection per operation; sqlite3 connections must not cross threads
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return closing(conn)
+
+    def start(self):
+        with self._lock:
+            while len(self._threads) < self.num_workers:
+                thread = threading.Thread(
+                    target=self._work, name=f"tweet-worker-{len(self._threads)}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the workers once their current job is finished"""
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+        self._stopping.clear()
+
+    def submit(self, text, image_path, owns_image=False):
+        """Persist a job and return it; workers pick it up right away."""
+        self.start()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO tweet_jobs (id, text, image_path, owns_image, status, max_attempts,"
+                " run_after, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, text, image_path, int(owns_image), QUEUED, self.max_attempts, now, now, now),
+            )
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM tweet_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def stats(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM tweet_jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return {"workers": self.num_workers, **counts}
+
+    def _to_dict(self, row):
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "max_attempts": row["max_attempts"],
+            "deferrals": row["deferrals"],
+            "tweet_id": row["tweet_id"],
+            "error": row["error"],
+            "rate_limited": bool(row["rate_limited"]),
+            "next_attempt_at": row["run_after"] if row["status"] == QUEUED else None,
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def _claim(self):
+        """Atomically take the oldest ready job, or one whose worker's lease ran out."""
+        now = time.time()
+        with self._lock:
+            running = list(self._running)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM tweet_jobs WHERE ((status = ? AND run_after <= ?)"
+                    " OR (status = ? AND lease_until < ?))"
+                    f" AND id NOT IN ({', '.join('?' * len(running))}) ORDER BY run_after LIMIT 1",
+                    (QUEUED, now, RUNNING, now, *running),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE tweet_jobs SET status = ?, attempts = attempts + 1, lease_until = ?,"
+                        " updated_at = ? WHERE id = ?",
+                        (RUNNING, now + self.lease_seconds, now, row["id"]),
+                    )
+                    with self._lock:
+                        self._running.add(row["id"])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _renew_lease(self, job_id, done):
+        """Keep extending a running job's lease until done is set, so no other worker reclaims it"""
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE tweet_jobs SET lease_until = ? WHERE id = ? AND status = ?",
+                        (time.time() + self.lease_seconds, job_id, RUNNING),
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Error renewing lease for tweet job {job_id}: {str(e)}")
+
+    def _finish(self, row, result):
+        attempts = row["attempts"] + 1
+        deferrals = row["deferrals"]
+        now = time.time()
+        if result.get("success"):
+            status, run_after, error = SUCCEEDED, now, None
+        else:
+            error = result.get("error")
+            if result.get("rate_limited"):
+                # The tweet was never sent, so waiting out the window doesn't cost an attempt
+                attempts -= 1
+                deferrals += 1
+                retry = deferrals <= self.max_deferrals
+                delay = result.get("retry_after", self.retry_backoff * 2 ** min(deferrals - 1, 5))
+            else:
+                retry = result.get("retryable", False) and attempts < row["max_attempts"]
+                delay = result.get("retry_after", self.retry_backoff * 2 ** (attempts - 1))
+            if retry:
+                status, run_after = QUEUED, now + delay
+            else:
+                status, run_after = FAILED, now
+        # Clean up before the job is reported finished, so pollers never see a stale file
+        if status in (SUCCEEDED, FAILED) and row["owns_image"]:
+            try:
+                self.release_image(row["image_path"])
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Error releasing image for tweet job {row['id']}: {str(e)}")
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tweet_jobs SET status = ?, attempts = ?, deferrals = ?, tweet_id = ?, error = ?,"
+                " rate_limited = ?, run_after = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                (status, attempts, deferrals, result.get("tweet_id"), error,
+                 int(bool(result.get("rate_limited"))), run_after, now, row["id"]),
+            )
+        logger.info(f"Tweet job {row['id']} attempt {attempts} ({deferrals} deferral(s)): {status}")
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f"Error claiming tweet job: {str(e)}")
+                row = None
+            if row is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            done = threading.Event()
+            threading.Thread(
+                target=self._renew_lease, args=(row["id"], done), name=f"tweet-lease-{row['id']}", daemon=True
+            ).start()
+            try:
+                try:
+                    result = self.handler(row["text"], row["image_path"], row["id"])
+                except Exception as e:
+                    logger.error(f"Tweet job {row['id']} raised: {str(e)}")
+                    result = {"success": False, "error": str(e), "retryable": True}
+                self._finish(row, result)
+            finally:
+                done.set()
+                with self._lock:
+                    self._running.discard(row["id"])
+
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+
+import requests
+import tweepy
+from requests.adapters import HTTPAdapter
+
+from rate_limits import VERIFY_CREDENTIALS
+
+logger = logging.getLogger(__name__)
+
+
+TWITTER_HOSTS = ("https://api.twitter.com", "https://upload.twitter.com")
+
+
+class PersistentSession(requests.Session):
+    """tweepy.API closes its session after every request, which would drop the
+    pooled keep-alive connections; closing is left to process exit instead.
+    With base_url set, Twitter hosts are swapped for it, e.g. a local fake server."""
+
+    def __init__(self, base_url=None):
+        super().__init__()
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    def request(self, method, url, *args, **kwargs):
+        if self.base_url:
+            for host in TWITTER_HOSTS:
+                if url.startswith(host):
+                    url = self.base_url + url[len(host):]
+                    break
+        return super().request(method, url, *args, **kwargs)
+
+    def close(self):
+        pass
+
+
+class TwitterClients:
+    """
+    Process-wide tweepy clients, built once and shared by every request.
+
+    The v1.1 API (media uploads, credential checks) and the v2 client
+    (tweets, timelines) use one requests session, so they share a
+    connection pool. The authenticated user from verify_credentials() is
+    cached for user_ttl seconds. On an auth error, call() rebuilds the
+    clients, re-verifies and retries once, so a rotated token is picked up
+    without a restart. With a rate_limits governor, every response feeds
+    it the rate-limit headers Twitter sends back.
+    """
+
+    def __init__(self, api_key, api_secret, access_token, access_token_secret,
+                 bearer_token=None, user_ttl=300, pool_size=10, rate_limits=None, base_url=None):
+        self.credentials = (api_key, api_secret, access_token, access_token_secret)
+        self.bearer_token = bearer_token
+        self.user_ttl = user_ttl
+        self.pool_size = pool_size
+        self.rate_limits = rate_limits
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._api = None
+        self._client = None
+        self._user = None
+        self._user_fetched_at = 0
+
+    def _build(self):
+        session = PersistentSession(self.base_url)
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if self.rate_limits is not None:
+            session.hooks["response"].append(self.rate_limits.observe)
+
+        api = tweepy.API(tweepy.OAuth1UserHandler(*self.credentials))
+        api.session = session
+        api_key, api_secret, access_token, access_token_secret = self.credentials
+        client = tweepy.Client(
+            bearer_token=self.bearer_token,
+            consumer_key=api_key,
+            consumer_secret=api_secret,
+            access_token=access_token,
+            access_token_secret=access_token_secret,
+            wait_on_rate_limit=False  # Callers handle rate limits instead of blocking a thread
+        )
+        client.session = session
+        return api, client
+
+    def _ensure(self):
+        with self._lock:
+            if self._api is None:
+                self._api, self._client = self._build()
+            return self._api, self._client
+
+    @property
+    def api(self):
+        return self._ensure()[0]
+
+    @property
+    def client(self):
+        return self._ensure()[1]
+
+    def user(self, refresh=False):
+        """The authenticated user, verified at most once per user_ttl seconds"""
+        with self._lock:
+            if not refresh and self._user is not None and time.time() - self._user_fetched_at < self.user_ttl:
+                return self._user
+        if self.rate_limits is not None:
+            self.rate_limits.acquire(VERIFY_CREDENTIALS)
+        user = self.api.verify_credentials()
+        logger.debug(f"Twitter credentials verified for {user.screen_name}")
+        with self._lock:
+            self._user, self._user_fetched_at = user, time.time()
+        return user
+
+    def cached_user(self):
+        """The last verified user, without a network call; None if unknown or stale"""
+        with self._lock:
+            if self._user is not None and time.time() - self._user_fetched_at < self.user_ttl:
+                return self._user
+            return None
+
+    def reset(self):
+        """Drop the clients and the cached user; the next call rebuilds and re-verifies"""
+        with self._lock:
+            self._api = self._client = self._user = None
+            self._user_fetched_at = 0
+
+    def call(self, fn):
+        """Run fn(api, client, user), rebuilding and re-verifying once if Twitter rejects the auth"""
+        try:
+            return fn(self.api, self.client, self.user())
+        except tweepy.Unauthorized:
+            logger.warning("Twitter rejected our credentials; rebuilding clients and re-verifying")
+            self.reset()
+            return fn(self.api, self.client, self.user(refresh=True))
@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import deque
+
+
+class QueueFull(Exception):
+    pass
+
+
+class BatchQueue:
+    """
+    FIFO of pending requests that hands out batches of compatible items.
+
+    take_batch() blocks for the oldest item, then keeps collecting items
+    with the same key until the batch is full or the window has elapsed
+    since the oldest item arrived. Incompatible items keep their place for
+    a later batch. Items only need a `key` attribute.
+    """
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item):
+        """Append an item; raises QueueFull if maxsize (0 = unbounded) is reached."""
+        with self._cond:
+            if self.maxsize and len(self._items) >= self.maxsize:
+                raise QueueFull(f"Queue is full ({self.maxsize} pending)")
+            self._items.append((time.monotonic(), item))
+            self._cond.notify_all()
+
+    def take_batch(self, max_size, window):
+        with self._cond:
+            while not self._items:
+                self._cond.wait()
+            arrived, first = self._items.popleft()
+            batch = [first]
+            deadline = arrived + window
+            while len(batch) < max_size:
+                batch.extend(self._pop_matching(first.key, max_size - len(batch)))
+                remaining = deadline - time.monotonic()
+                if len(batch) >= max_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _pop_matching(self, key, limit):
+        matched, kept = [], deque()
+        while self._items:
+            entry = self._items.popleft()
+            if len(matched) < limit and entry[1].key == key:
+                matched.append(entry[1])
+            else:
+                kept.append(entry)
+        self._items = kept
+        return matched
@@ -0,0 +1,304 @@
+"""
+Load-test the generation service and report latency and throughput as JSON.
+
+By default a tiny randomly initialized Stable Diffusion pipeline is built
+locally, so nothing is downloaded and a full sweep finishes in minutes on a
+laptop. Pass --model with a hub id or local path to measure the real model.
+Without --url, requests go through finetune_service's job queue in this
+process, which includes its batching and worker pool. With --url, they are
+sent to a running service over HTTP.
+
+    python benchmark.py --steps 4,8 --batch-sizes 1,4 --concurrency 1,4
+    python benchmark.py --model runwayml/stable-diffusion-v1-5 --size 512 --output results.json
+    python benchmark.py --baseline results.json  # exits 1 on a p95 regression
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+TINY = "tiny"
+
+
+def build_tiny_pipeline(path):
+    """Save a randomly initialized miniature SD pipeline to path and return it"""
+    import torch
+    from diffusers import AutoencoderKL, EulerAncestralDiscreteScheduler, StableDiffusionPipeline, UNet2DConditionModel
+    from transformers import CLIPTextConfig, CLIPTextModel, CLIPTokenizer
+
+    torch.manual_seed(0)
+    # Character-level vocabulary; the tokenizer only needs to produce ids
+    vocab = {"<|startoftext|>": 0, "<|endoftext|>": 1, "!": 2}
+    for i, char in enumerate("abcdefghijklmnopqrstuvwxyz"):
+        vocab[char] = 3 + i
+        vocab[f"{char}</w>"] = 29 + i
+    tokenizer_dir = os.path.join(path, "tokenizer_files")
+    os.makedirs(tokenizer_dir, exist_ok=True)
+    with open(os.path.join(tokenizer_dir, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(tokenizer_dir, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+
+    tokenizer = CLIPTokenizer(
+        os.path.join(tokenizer_dir, "vocab.json"), os.path.join(tokenizer_dir, "merges.txt"), model_max_length=77
+    )
+    text_encoder = CLIPTextModel(CLIPTextConfig(
+        vocab_size=len(vocab), hidden_size=32, intermediate_size=37, num_hidden_layers=2,
+        num_attention_heads=4, projection_dim=32, max_position_embeddings=77,
+    ))
+    unet = UNet2DConditionModel(
+        block_out_channels=(32, 64), layers_per_block=1, sample_size=32, in_channels=4, out_channels=4,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"), up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        cross_attention_dim=32, norm_num_groups=32,
+    )
+    vae = AutoencoderKL(
+        block_out_channels=[32, 64], in_channels=3, out_channels=3, latent_channels=4, norm_num_groups=32,
+        down_block_types=["DownEncoderBlock2D"] * 2, up_block_types=["UpDecoderBlock2D"] * 2,
+    )
+    pipeline = StableDiffusionPipeline(
+        unet=unet, vae=vae, text_encoder=text_encoder, tokenizer=tokenizer,
+        scheduler=EulerAncestralDiscreteScheduler(), safety_checker=None, feature_extractor=None,
+        requires_safety_checker=False,
+    )
+    pipeline.save_pretrained(path, safe_serialization=True)
+    return path
+
+
+def reset_peak_rss():
+    """Restart the kernel's high-water mark so each run reports its own peak (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS, and never resets
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class InProcessTarget:
+    """Submits requests to finetune_service's job queue, one fresh queue per batch size"""
+
+    def __init__(self, args):
+        os.environ["MODEL_IDS"] = args.model
+        os.environ["IMAGE_SIZE"] = str(args.size)
+        os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="benchmark-cache-")
+        import finetune_service
+        self.service = finetune_service
+        self.num_workers = args.workers
+        self.queues = {}
+
+    def queue_for(self, batch_size):
+        from jobs import JobQueue
+        if batch_size not in self.queues:
+            self.queues[batch_size] = JobQueue(
+                self.service.make_worker,
+                self.service.batch_key,
+                num_workers=self.num_workers,
+                max_queue=1024,
+                max_batch_size=batch_size,
+                window=self.service.BATCH_WINDOW_MS / 1000,
+            )
+        return self.queues[batch_size]
+
+    def generate(self, body, batch_size):
+        task = self.service.make_task(self.service.GenerateRequest(**body))
+        job = self.queue_for(batch_size).submit(task)
+        job.future.result()
+        return job.batch_size
+
+
+class HttpTarget:
+    """Posts to a running service; its own BATCH_MAX_SIZE and NUM_WORKERS apply"""
+
+    def __init__(self, args):
+        self.url = args.url.rstrip("/")
+
+    def generate(self, body, batch_size):
+        request = urllib.request.Request(
+            f"{self.url}/generate?wait=true",
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=600) as response:
+            return json.load(response).get("batch_size")
+
+
+def run_config(target, steps, batch_size, concurrency, scheduler, requests, model_id):
+    """Fire `requests` requests from `concurrency` client threads and summarize them"""
+    counter = itertools.count()
+    latencies, batch_sizes, errors = [], [], []
+    lock = threading.Lock()
+
+    def body(i):
+        # Distinct unseeded prompts, so neither the embedding nor the image cache short-circuits a render
+        request = {"prompt": f"benchmark scene {i}", "num_steps": steps, "scheduler": scheduler}
+        if model_id:
+            request["model_id"] = model_id
+        return request
+
+    def client():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            started = time.perf_counter()
+            try:
+                served_batch = target.generate(body(i), batch_size)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                batch_sizes.append(served_batch)
+
+    # One untimed request loads the model and builds the worker pipelines
+    target.generate(body(-1), batch_size)
+    reset_peak_rss()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    served = [size for size in batch_sizes if size]
+    return {
+        "steps": steps,
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "scheduler": scheduler,
+        "requests": requests,
+        "errors": len(errors),
+        "p50_seconds": round(percentile(latencies, 0.5), 4) if latencies else None,
+        "p95_seconds": round(percentile(latencies, 0.95), 4) if latencies else None,
+        "mean_seconds": round(statistics.mean(latencies), 4) if latencies else None,
+        "images_per_second": round(len(latencies) / elapsed, 4),
+        "mean_served_batch": round(statistics.mean(served), 2) if served else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def config_key(result):
+    return (result["steps"], result["batch_size"], result["concurrency"], result["scheduler"])
+
+
+def find_regressions(results, baseline, tolerance):
+    """Configs whose p95 grew by more than `tolerance` (a fraction) over the baseline run"""
+    previous = {config_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get(config_key(result))
+        if not before or not before.get("p95_seconds") or result["p95_seconds"] is None:
+            continue
+        change = result["p95_seconds"] / before["p95_seconds"] - 1
+        if change > tolerance:
+            regressions.append({
+                "config": dict(zip(("steps", "batch_size", "concurrency", "scheduler"), config_key(result))),
+                "baseline_p95_seconds": before["p95_seconds"],
+                "p95_seconds": result["p95_seconds"],
+                "change": round(change, 3),
+            })
+    return regressions
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and load-test the generation service")
+    parser.add_argument("--model", default=TINY, help='"tiny" for a local random pipeline, or a model id/path')
+    parser.add_argument("--url", help="Benchmark a running service instead of an in-process job queue")
+    parser.add_argument("--steps", type=int_list, default=[4])
+    parser.add_argument("--batch-sizes", type=int_list, default=[1, 4])
+    parser.add_argument("--concurrency", type=int_list, default=[1, 4])
+    parser.add_argument("--schedulers", default="euler_a", help="Comma-separated scheduler names")
+    parser.add_argument("--requests", type=int, default=None, help="Requests per config (default: 4 x concurrency)")
+    parser.add_argument("--size", type=int, default=None, help="Image size (default: 64 for tiny, 512 otherwise)")
+    parser.add_argument("--workers", type=int, default=1, help="In-process worker threads")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON output to compare p95 latency against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth over the baseline")
+    args = parser.parse_args()
+
+    label = args.model
+    if args.size is None:
+        args.size = 64 if args.model == TINY else 512
+    if args.url:
+        # The server renders with its default model unless one is named
+        model_id = None if args.model == TINY else args.model
+        target = HttpTarget(args)
+    else:
+        if args.model == TINY:
+            args.model = build_tiny_pipeline(tempfile.mkdtemp(prefix="tiny-sd-"))
+        model_id = args.model
+        target = InProcessTarget(args)
+
+    results = []
+    configs = itertools.product(args.steps, args.batch_sizes, args.concurrency, args.schedulers.split(","))
+    for steps, batch_size, concurrency, scheduler in configs:
+        requests = args.requests or 4 * concurrency
+        logger.info(f"steps={steps} batch_size={batch_size} concurrency={concurrency} scheduler={scheduler}")
+        result = run_config(target, steps, batch_size, concurrency, scheduler, requests, model_id)
+        results.append(result)
+        logger.info(json.dumps(result))
+
+    report = {
+        "model": label,
+        "target": args.url or "in-process",
+        "size": args.size,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = find_regressions(results, json.load(f), args.tolerance)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CpuProfile:
+    """How the diffusion pipeline is tuned for CPU inference"""
+    name: str
+    threads: Optional[int] = None  # None keeps torch's default (one per core)
+    channels_last: bool = False  # NHWC convolutions in the UNet and VAE
+    bf16: bool = False  # bfloat16 autocast; fast on CPUs with AVX512-BF16/AMX
+    compile: bool = False  # torch.compile the UNet; the first call pays the compile time
+
+    def autocast(self):
+        if self.bf16:
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
+
+PROFILES = {
+    "default": CpuProfile("default"),
+    "channels_last": CpuProfile("channels_last", channels_last=True),
+    "bf16": CpuProfile("bf16", channels_last=True, bf16=True),
+    "compiled": CpuProfile("compiled", channels_last=True, compile=True),
+    "compiled_bf16": CpuProfile("compiled_bf16", channels_last=True, bf16=True, compile=True),
+}
+
+
+def get_profile(name, threads=None):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown CPU profile {name!r}; choose one of {list(PROFILES)}")
+    profile = PROFILES[name]
+    return replace(profile, threads=threads) if threads else profile
+
+
+def available_memory():
+    """Bytes of RAM available to new allocations, or None if unknown"""
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def attention_bytes(pipeline, height, width, images):
+    """Peak size of one unsliced self-attention score matrix, at the UNet's
+    highest resolution, with classifier-free guidance doubling the batch"""
+    tokens = (height // pipeline.vae_scale_factor) * (width // pipeline.vae_scale_factor)
+    # SD 1.x configs store the head count under attention_head_dim
+    heads = pipeline.unet.config.attention_head_dim
+    if isinstance(heads, (list, tuple)):
+        heads = max(heads)
+    return 2 * images * heads * tokens * tokens * 4
+
+
+def choose_attention_slicing(pipeline, height, width, images, available=None):
+    """
+    Slicing trades speed for memory, so only use it when the attention
+    scores would not fit in available RAM with room to spare. Returns
+    None (no slicing), "auto" (half the heads at a time) or 1 (one head
+    at a time).
+    """
+    available = available if available is not None else available_memory()
+    if available is None:
+        return "auto"
+    needed = attention_bytes(pipeline, height, width, images)
+    if needed * 4 <= available:
+        return None
+    if needed * 2 <= available:
+        return "auto"
+    return 1
+
+
+def configure_threads(profile):
+    if profile.threads:
+        torch.set_num_threads(profile.threads)
+
+
+def apply_profile(pipeline, profile, height=512, width=512, images=1):
+    """Tune a loaded pipeline in place for CPU inference and return it"""
+    configure_threads(profile)
+
+    slicing = choose_attention_slicing(pipeline, height, width, images)
+    if slicing is None:
+        pipeline.disable_attention_slicing()
+    else:
+        pipeline.enable_attention_slicing(slice_size=slicing)
+
+    if profile.channels_last:
+        pipeline.unet.to(memory_format=torch.channels_last)
+        pipeline.vae.to(memory_format=torch.channels_last)
+
+    if profile.compile:
+        if hasattr(torch, "compile"):
+            pipeline.unet = torch.compile(pipeline.unet)
+        else:
+            logger.warning("torch.compile is not available; running the UNet uncompiled")
+
+    logger.info(f"CPU profile {profile.name}: threads={torch.get_num_threads()} attention_slicing={slicing}")
+    return pipeline
+
+
+def benchmark_profile(load, profile, steps=5, size=512, repeats=2):
+    """
+    Time one profile on a freshly loaded pipeline. Each step is timed
+    from the pipeline's step callback, so prompt encoding and VAE decoding
+    are excluded from seconds_per_step but included in seconds_per_image.
+    """
+    pipeline = apply_profile(load(), profile, size, size)
+    stamps = []
+
+    def on_step_end(pipe, step, timestep, callback_kwargs):
+        stamps.append(time.perf_counter())
+        return callback_kwargs
+
+    def render():
+        generator = torch.Generator(device="cpu").manual_seed(0)
+        with torch.inference_mode(), profile.autocast():
+            pipeline(
+                "a lighthouse at dusk",
+                num_inference_steps=steps,
+                height=size,
+                width=size,
+                generator=generator,
+                callback_on_step_end=on_step_end,
+            )
+
+    # Warm-up run, which also absorbs torch.compile
+    started = time.perf_counter()
+    render()
+    first_call = time.perf_counter() - started
+
+    step_times, image_times = [], []
+    for _ in range(repeats):
+        stamps.clear()
+        started = time.perf_counter()
+        render()
+        image_times.append(time.perf_counter() - started)
+        step_times.extend(later - earlier for earlier, later in zip(stamps, stamps[1:]))
+
+    return {
+        **asdict(profile),
+        "threads": torch.get_num_threads(),
+        "steps": steps,
+        "size": size,
+        "seconds_per_step": round(sum(step_times) / len(step_times), 4) if step_times else None,
+        "seconds_per_image": round(sum(image_times) / len(image_times), 4),
+        "first_call_seconds": round(first_call, 4),
+    }
+
+
+def benchmark_profiles(load, names, steps=5, size=512, repeats=2, threads=None):
+    """Seconds per step for each named profile, fastest first; failed profiles report their error"""
+    results = []
+    for name in names:
+        profile = get_profile(name, threads)
+        try:
+            results.append(benchmark_profile(load, profile, steps, size, repeats))
+        except Exception as e:
+            logger.error(f"Profile {name} failed: {str(e)}")
+            results.append({**asdict(profile), "error": str(e)})
+    return sorted(results, key=lambda result: result.get("seconds_per_step") or float("inf"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU inference profiles for the diffusion pipeline")
+    parser.add_argument("--model-id", default=os.getenv("MODEL_IDS", "runwayml/stable-diffusion-v1-5").split(",")[0])
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated profile names")
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    from diffusers import StableDiffusionPipeline
+
+    def load():
+        return StableDiffusionPipeline.from_pretrained(
+            args.model_id, torch_dtype=torch.float32, safety_checker=None, requires_safety_checker=False
+        )
+
+    results = benchmark_profiles(load, args.profiles.split(","), args.steps, args.size, args.repeats, args.threads)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,12 +1,27 @@
-from diffusers import StableDiffusionPipeline, DPMSolverMultistepScheduler, EulerAncestralDiscreteScheduler
+from diffusers import StableDiffusionPipeline, StableDiffusionImg2ImgPipeline, DPMSolverMultistepScheduler, EulerAncestralDiscreteScheduler, EulerDiscreteScheduler
 import torch
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+import asyncio
 import base64
+import os
+import random
+import threading
+import zipfile
+from contextlib import nullcontext
 from io import BytesIO
 from PIL import Image
 import logging
+from batching import QueueFull
+from jobs import SUCCEEDED, JobQueue
+from generation_cache import EmbeddingCache, ImageCache
+from model_registry import ModelRegistry
+from cpu_backend import apply_profile, get_profile
+from typing import List, Literal, Optional
+from dataclasses import dataclass
+import torch.nn.functional as F
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,15 +38,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Models that requests may select; the first is the default
+MODEL_IDS = os.getenv("MODEL_IDS", "runwayml/stable-diffusion-v1-5").split(",")
+DEFAULT_MODEL_ID = MODEL_IDS[0]
+# Loaded models beyond this are evicted least recently used first
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "8192"))
+# The default model is always loaded in the background at startup; WARMUP=1
+# also runs a one-step render so the first request skips first-call overhead
+WARMUP = os.getenv("WARMUP", "0") == "1"
+
+# Schedulers are cheap to swap, so each worker builds the one a batch asks for
+SCHEDULERS = {
+    # Euler Ancestral - faster than DPM++
+    "euler_a": (EulerAncestralDiscreteScheduler, {"use_karras_sigmas": True}),
+    "euler": (EulerDiscreteScheduler, {}),
+    "dpmpp_2m": (DPMSolverMultistepScheduler, {"use_karras_sigmas": True}),
+}
+DEFAULT_SCHEDULER = "euler_a"
+SchedulerName = Literal["euler_a", "euler", "dpmpp_2m"]
+
+# Images rendered for one request, each with seed, seed + 1, ...
+MAX_IMAGES_PER_REQUEST = int(os.getenv("MAX_IMAGES_PER_REQUEST", "4"))
+
 class GenerateRequest(BaseModel):
     prompt: str
     negative_prompt: str = ""
     num_steps: int = 15  # Reduced steps for faster generation
     guidance_scale: float = 7.0
-
-# Initialize the model - using a smaller, more efficient model
-model_id = "runwayml/stable-diffusion-v1-5"  # More efficient model
-logger.info(f"Initializing model from {model_id}")
+    seed: Optional[int] = None  # Fixed seeds give reproducible, cacheable results
+    preview: bool = False  # Fast low-step, low-resolution draft that can be refined
+    refine: Optional[str] = None  # Job id of a preview to refine into the final image
+    refine_index: int = 0  # Which image of a multi-image preview to refine
+    num_images: int = Field(1, ge=1, le=MAX_IMAGES_PER_REQUEST)
+    model_id: str = DEFAULT_MODEL_ID
+    scheduler: SchedulerName = DEFAULT_SCHEDULER
 
 # Configure for M1 Mac
 if torch.backends.mps.is_available():
@@ -42,56 +82,389 @@ else:
     torch_dtype = torch.float32
 logger.info(f"Using device: {device}")
 
-# Load model with memory optimizations
-pipeline = StableDiffusionPipeline.from_pretrained(
-    model_id,
-    torch_dtype=torch_dtype,
-    safety_checker=None,
-    requires_safety_checking=False,
-    use_safetensors=True  # Faster loading
+# CPU tuning: see cpu_backend.PROFILES, and run cpu_backend.py to pick the fastest
+cpu_profile = get_profile(os.getenv("CPU_PROFILE", "default"), threads=int(os.getenv("CPU_THREADS", "0")) or None)
+
+def load_pipeline(model_id):
+    """Load a model with memory optimizations; called lazily by the registry"""
+    pipeline = StableDiffusionPipeline.from_pretrained(
+        model_id,
+        torch_dtype=torch_dtype,
+        safety_checker=None,
+        requires_safety_checking=False,
+        use_safetensors=True  # Faster loading
+    )
+
+    # Memory and speed optimizations
+    pipeline.enable_vae_tiling()  # Better memory usage
+    pipeline.enable_vae_slicing()
+
+    # Move to device
+    pipeline = pipeline.to(device)
+    if device == "cpu":
+        # Attention slicing sized for the largest batch the workers may run at once
+        return apply_profile(pipeline, cpu_profile, IMAGE_SIZE, IMAGE_SIZE, BATCH_MAX_SIZE * MAX_IMAGES_PER_REQUEST * NUM_WORKERS)
+    pipeline.enable_attention_slicing(slice_size=1)  # More aggressive slicing
+    return pipeline
+
+models = ModelRegistry(load_pipeline, memory_budget=MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
+
+def build_scheduler(name, config):
+    scheduler_class, options = SCHEDULERS[name]
+    return scheduler_class.from_config(config, **options)
+
+IMAGE_SIZE = int(os.getenv("IMAGE_SIZE", "512"))
+# Drafts render at a fraction of the cost; refining continues from the
+# draft's latents with the same seed instead of starting from noise
+PREVIEW_SIZE = int(os.getenv("PREVIEW_SIZE", "256"))
+PREVIEW_STEPS = int(os.getenv("PREVIEW_STEPS", "6"))
+REFINE_STRENGTH = float(os.getenv("REFINE_STRENGTH", "0.6"))
+
+FULL = "full"
+PREVIEW = "preview"
+REFINE = "refine"
+
+# Requests arriving within BATCH_WINDOW_MS of each other that share settings
+# are rendered together in one pipeline call
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "4"))
+BATCH_WINDOW_MS = int(os.getenv("BATCH_WINDOW_MS", "50"))
+# Each worker renders one batch at a time with its own pipeline
+NUM_WORKERS = int(os.getenv("NUM_WORKERS", "1"))
+MAX_QUEUE = int(os.getenv("MAX_QUEUE", "32"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "600"))
+WAIT_TIMEOUT_SECONDS = float(os.getenv("WAIT_TIMEOUT_SECONDS", "300"))
+
+# Text-encoder outputs by prompt, and finished images by full settings
+embedding_cache = EmbeddingCache(maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "128")))
+image_cache = ImageCache(
+    os.getenv("IMAGE_CACHE_DIR", "image_cache"),
+    max_bytes=int(os.getenv("IMAGE_CACHE_MAX_MB", "2048")) * 1024 * 1024,
 )
 
-# Use Euler Ancestral scheduler - faster than DPM++
-pipeline.scheduler = EulerAncestralDiscreteScheduler.from_config(
-    pipeline.scheduler.config,
-    use_karras_sigmas=True
+@dataclass
+class GenerationTask:
+    """A queued unit of work: the request plus everything resolved for it up front"""
+    request: GenerateRequest
+    mode: str
+    seed: int
+    init_latents: Optional[torch.Tensor] = None  # Preview latents when refining
+
+    @property
+    def seeds(self):
+        return [(self.seed + i) % 2 ** 32 for i in range(self.request.num_images)]
+
+@dataclass
+class GenerationResult:
+    images: List[Image.Image]
+    seed: int
+    latents: Optional[torch.Tensor] = None  # Kept for previews so they can be refined
+
+def batch_key(task: GenerationTask):
+    """Tasks can only share a pipeline call if these settings match"""
+    request = task.request
+    if task.mode == PREVIEW:
+        size = PREVIEW_SIZE
+        num_steps = min(request.num_steps, PREVIEW_STEPS)
+    else:
+        size = IMAGE_SIZE
+        num_steps = request.num_steps
+    return (task.mode, request.model_id, request.scheduler, num_steps, request.guidance_scale, size, size)
+
+def image_cache_keys(task: GenerationTask):
+    """Disk cache keys, one per image; only full renders with an explicit seed are reproducible and worth keeping"""
+    if task.mode != FULL or task.request.seed is None:
+        return None
+    return [image_cache_key(task, seed) for seed in task.seeds]
+
+def image_cache_key(task: GenerationTask, seed: int):
+    mode, model_id, scheduler, num_steps, guidance_scale, height, width = batch_key(task)
+    request = task.request
+    return image_cache.key(
+        model=model_id,
+        scheduler=scheduler,
+        prompt=request.prompt,
+        negative_prompt=request.negative_prompt,
+        num_steps=num_steps,
+        guidance_scale=guidance_scale,
+        height=height,
+        width=width,
+        seed=seed,
+    )
+
+def make_worker_pipeline(base, scheduler):
+    """A pipeline for one worker: shares the loaded weights, but has its own
+    scheduler, which keeps per-call state and cannot be shared across threads"""
+    components = dict(base.components)
+    components["scheduler"] = build_scheduler(scheduler, base.scheduler.config)
+    return StableDiffusionPipeline(**components, requires_safety_checker=False)
+
+def make_worker():
+    # Only the pipeline for the current model/scheduler is kept, so an
+    # evicted model is released as soon as the worker moves on
+    current = {"key": None}
+
+    def pipelines_for(model_id, scheduler):
+        base = models.get(model_id).pipeline
+        key = (id(base), scheduler)
+        if current["key"] != key:
+            worker_pipeline = make_worker_pipeline(base, scheduler)
+            # Same modules and scheduler, used to continue from preview latents
+            refine_pipeline = StableDiffusionImg2ImgPipeline(**worker_pipeline.components, requires_safety_checker=False)
+            current.update(key=key, pipelines=(worker_pipeline, refine_pipeline))
+        return current["pipelines"]
+
+    def embed(worker_pipeline, model_id, text):
+        def encode():
+            prompt_embeds, _ = worker_pipeline.encode_prompt(
+                text, device, num_images_per_prompt=1, do_classifier_free_guidance=False
+            )
+            return prompt_embeds
+        return embedding_cache.get_or_encode((model_id, text), encode)
+
+    def decode_latents(worker_pipeline, latents):
+        vae = worker_pipeline.vae
+        decoded = vae.decode(latents / vae.config.scaling_factor, return_dict=False)[0]
+        return worker_pipeline.image_processor.postprocess(decoded, output_type="pil")
+
+    def run_batch(tasks):
+        mode, model_id, scheduler, num_steps, guidance_scale, height, width = batch_key(tasks[0])
+        logger.info(f"Generating {len(tasks)} {mode} job(s) with prompts: {[t.request.prompt for t in tasks]}")
+        worker_pipeline, refine_pipeline = pipelines_for(model_id, scheduler)
+        # Flatten to one entry per image; each image gets its own generator, so
+        # a seeded image does not depend on its batch-mates
+        entries = [(task, seed) for task in tasks for seed in task.seeds]
+        common = dict(
+            prompt_embeds=torch.cat([embed(worker_pipeline, model_id, task.request.prompt) for task, _ in entries]),
+            negative_prompt_embeds=torch.cat(
+                [embed(worker_pipeline, model_id, task.request.negative_prompt) for task, _ in entries]
+            ),
+            num_inference_steps=num_steps,
+            guidance_scale=guidance_scale,
+            generator=[torch.Generator(device="cpu").manual_seed(seed) for _, seed in entries],
+        )
+        latents = None
+        # Generate with memory-efficient settings
+        with torch.inference_mode(), (cpu_profile.autocast() if device == "cpu" else nullcontext()):
+            if mode == PREVIEW:
+                latents = worker_pipeline(**common, height=height, width=width, output_type="latent").images
+                images = decode_latents(worker_pipeline, latents)
+            elif mode == REFINE:
+                # Upscale the draft latents and denoise only the last REFINE_STRENGTH of the schedule
+                init_latents = F.interpolate(
+                    torch.cat([task.init_latents for task, _ in entries]).to(device),
+                    size=(height // worker_pipeline.vae_scale_factor, width // worker_pipeline.vae_scale_factor),
+                    mode="bicubic",
+                )
+                images = refine_pipeline(**common, image=init_latents, strength=REFINE_STRENGTH).images
+            else:
+                images = worker_pipeline(**common, height=height, width=width).images
+
+        results, start = [], 0
+        for task in tasks:
+            end = start + task.request.num_images
+            task_latents = latents[start:end].cpu() if latents is not None else None
+            results.append(GenerationResult(images[start:end], task.seed, task_latents))
+            start = end
+        for task, result in zip(tasks, results):
+            for key, image in zip(image_cache_keys(task) or [], result.images):
+                image_cache.put(key, image)
+        return results
+
+    return run_batch
+
+job_queue = JobQueue(
+    make_worker,
+    batch_key,
+    num_workers=NUM_WORKERS,
+    max_queue=MAX_QUEUE,
+    max_batch_size=BATCH_MAX_SIZE,
+    window=BATCH_WINDOW_MS / 1000,
+    retention=JOB_RETENTION_SECONDS,
 )
 
-# Memory and speed optimizations
-pipeline.enable_attention_slicing(slice_size=1)  # More aggressive slicing
-pipeline.enable_vae_tiling()  # Better memory usage
-pipeline.enable_vae_slicing()
+# Set once the default model has loaded at startup; later evictions don't clear it,
+# since the registry reloads evicted models on demand
+startup_complete = threading.Event()
+
+def warm_up():
+    """Load the default model and, with WARMUP=1, push one tiny render through a worker"""
+    try:
+        models.get(DEFAULT_MODEL_ID)
+    except Exception as e:
+        logger.error(f"Loading {DEFAULT_MODEL_ID} failed: {str(e)}", exc_info=True)
+        return
+    startup_complete.set()
+    if not WARMUP:
+        return
+    try:
+        warmup_request = GenerateRequest(prompt="warm-up", num_steps=1, preview=True)
+        job_queue.submit(GenerationTask(warmup_request, PREVIEW, 0)).future.result()
+        logger.info("Warm-up complete")
+    except Exception as e:
+        logger.error(f"Warm-up failed: {str(e)}", exc_info=True)
+
+@app.on_event("startup")
+def start_workers():
+    job_queue.start()
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+OUTPUT_FORMATS = {"jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}
+OutputFormat = Literal["jpeg", "png", "webp"]
+
+def encode_image(image, format="jpeg", quality=85):
+    """Encode once into the requested format; quality applies to jpeg and webp"""
+    buffered = BytesIO()
+    image.save(buffered, format=OUTPUT_FORMATS[format], quality=quality)
+    return buffered.getvalue()
+
+async def job_response(job, format="jpeg", quality=85):
+    body = {**job.to_dict(), "mode": job.payload.mode, "seed": job.payload.seed}
+    if job.status == SUCCEEDED:
+        encoded = await asyncio.gather(*[
+            asyncio.to_thread(encode_image, image, format, quality) for image in job.result.images
+        ])
+        images = [base64.b64encode(data).decode() for data in encoded]
+        body["format"] = format
+        body["image"] = images[0]
+        if len(images) > 1:
+            body["images"] = images
+    return body
+
+def encode_zip(job, format, quality):
+    """Bundle a multi-image job; images are already compressed, so entries are stored as-is"""
+    buffered = BytesIO()
+    with zipfile.ZipFile(buffered, "w", compression=zipfile.ZIP_STORED) as archive:
+        for i, (image, seed) in enumerate(zip(job.result.images, job.payload.seeds)):
+            archive.writestr(f"{job.id}_{i}_{seed}.{format}", encode_image(image, format, quality))
+    return buffered.getvalue()
+
+async def binary_response(job, format="jpeg", quality=85):
+    """Raw image bytes (or a zip of them), with job details in headers instead of base64 JSON"""
+    headers = {"X-Job-Id": job.id, "X-Seed": str(job.payload.seed)}
+    if len(job.result.images) == 1:
+        content = await asyncio.to_thread(encode_image, job.result.images[0], format, quality)
+        return Response(content, media_type=f"image/{format}", headers=headers)
+    content = await asyncio.to_thread(encode_zip, job, format, quality)
+    headers["Content-Disposition"] = f'attachment; filename="{job.id}.zip"'
+    return Response(content, media_type="application/zip", headers=headers)
+
+async def finished_response(job, raw, format, quality):
+    if raw:
+        return await binary_response(job, format, quality)
+    return await job_response(job, format, quality)
 
-# Move to device
-pipeline = pipeline.to(device)
-logger.info("Model initialization complete")
+def make_task(request: GenerateRequest):
+    """Resolve the mode, seed and starting latents for a request"""
+    if request.model_id not in MODEL_IDS:
+        raise HTTPException(status_code=400, detail=f"Unknown model_id; choose one of {MODEL_IDS}")
+    if request.refine:
+        preview_job = job_queue.get(request.refine)
+        if preview_job is None:
+            raise HTTPException(status_code=404, detail="Preview job not found")
+        if preview_job.payload.mode != PREVIEW:
+            raise HTTPException(status_code=400, detail="Only preview jobs can be refined")
+        if preview_job.status != SUCCEEDED:
+            raise HTTPException(status_code=409, detail=f"Preview job is {preview_job.status}")
+        if not 0 <= request.refine_index < len(preview_job.result.images):
+            raise HTTPException(status_code=400, detail="refine_index is out of range")
+        if request.model_id != preview_job.payload.request.model_id:
+            raise HTTPException(status_code=400, detail="Refine with the model that rendered the preview")
+        # Same seed and starting point as the draft the user picked
+        index = request.refine_index
+        return GenerationTask(
+            request, REFINE, preview_job.payload.seeds[index], preview_job.result.latents[index:index + 1]
+        )
+    # Unseeded requests still get a concrete seed so the result can be reproduced
+    seed = request.seed if request.seed is not None else random.randrange(2 ** 32)
+    return GenerationTask(request, PREVIEW if request.preview else FULL, seed)
 
 @app.post("/generate")
-async def generate_image(request: GenerateRequest):
+async def generate_image(
+    request: GenerateRequest,
+    wait: bool = False,
+    timeout: float = WAIT_TIMEOUT_SECONDS,
+    raw: bool = False,
+    format: OutputFormat = "jpeg",
+    quality: int = Query(85, ge=1, le=100),
+):
+    """Queue a generation job. Returns the job id at once, or with wait=true
+    holds the request until the image is ready (or timeout seconds pass).
+    preview=true renders a quick draft; refine=<preview job id> finishes it.
+    raw=true answers a finished job with image bytes (a zip for several)"""
+    task = make_task(request)
+
+    # Seen this exact seeded request before: answer from disk without queueing
+    keys = image_cache_keys(task)
+    cached = await asyncio.gather(*[asyncio.to_thread(image_cache.get, key) for key in keys]) if keys else None
+    if cached and all(image is not None for image in cached):
+        logger.info(f"Serving cached image for prompt: {request.prompt}")
+        job = job_queue.add_completed(task, GenerationResult(list(cached), task.seed))
+        return await finished_response(job, raw, format, quality)
+
     try:
-        logger.info(f"Generating image with prompt: {request.prompt}")
-        
-        # Generate with memory-efficient settings
-        with torch.inference_mode():
-            image = pipeline(
-                prompt=request.prompt,
-                negative_prompt=request.negative_prompt,
-                num_inference_steps=request.num_steps,
-                guidance_scale=request.guidance_scale,
-                height=512,
-                width=512,
-            ).images[0]
-        
-        # Optimize image before sending
-        buffered = BytesIO()
-        image.save(buffered, format="JPEG", quality=85)  # Slightly reduced quality for faster transfer
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        logger.info("Image generation successful")
-        return {"image": img_str}
+        logger.info(f"Queueing {task.mode} image generation with prompt: {request.prompt}")
+        job = job_queue.submit(task)
+    except QueueFull as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    if not wait:
+        return JSONResponse(await job_response(job), status_code=202)
+
+    try:
+        # Diffusion runs on a worker thread, so the event loop stays free
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), timeout)
+    except asyncio.TimeoutError:
+        return JSONResponse(await job_response(job), status_code=202)
     except Exception as e:
         logger.error(f"Error generating image: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+    logger.info("Image generation successful")
+    return await finished_response(job, raw, format, quality)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, format: OutputFormat = "jpeg", quality: int = Query(85, ge=1, le=100)):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await job_response(job, format, quality)
+
+@app.get("/jobs/{job_id}/image")
+async def get_job_image(job_id: str, format: OutputFormat = "jpeg", quality: int = Query(85, ge=1, le=100)):
+    """Image bytes of a finished job, for galleries and posting pipelines"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return await binary_response(job, format, quality)
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: the startup load of the default model has finished"""
+    if not startup_complete.is_set():
+        return JSONResponse({"status": "loading", "model_id": DEFAULT_MODEL_ID}, status_code=503)
+    return {"status": "ready", "model_id": DEFAULT_MODEL_ID}
+
+@app.get("/models")
+async def loaded_models():
+    return {"available": MODEL_IDS, "schedulers": list(SCHEDULERS), **models.stats()}
+
+@app.get("/queue")
+async def queue_stats():
+    """Queue depth, worker utilisation, recent per-job timings and cache hit rates"""
+    return {
+        **job_queue.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "image_cache": image_cache.stats(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
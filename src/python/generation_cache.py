@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import torch
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of text-encoder outputs, shared by all workers."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_encode(self, key, encode):
+        with self._lock:
+            embeds = self._entries.get(key)
+            if embeds is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embeds
+            self.misses += 1
+        # Encode outside the lock; a racing worker at worst encodes the same text twice.
+        # Without grad tracking, so cached entries don't keep the encoder's graph alive
+        with torch.inference_mode():
+            embeds = encode()
+        with self._lock:
+            self._entries[key] = embeds
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return embeds
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class ImageCache:
+    """
+    Content-addressed on-disk cache of generated images.
+
+    Images are stored losslessly under <root>/<ab>/<cd>/<sha256>.png, where
+    the hash covers every setting that determines the output. When the
+    cache grows past max_bytes the least recently used files are removed.
+    """
+
+    PRUNE_EVERY = 50  # writes between size checks
+
+    def __init__(self, root, max_bytes=2 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(**settings):
+        payload = json.dumps(settings, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], f"{key}.png")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with Image.open(path) as image:
+                image.load()
+            os.utime(path)  # Mark as recently used for pruning
+        except (FileNotFoundError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return image
+
+    def put(self, key, image):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, format="PNG")
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".png"):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        logger.info(f"Image cache holds {total} bytes after pruning")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
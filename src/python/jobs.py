@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+
+from batching import BatchQueue, QueueFull
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    def __init__(self, payload, key):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.key = key
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.batch_size = None
+        self.worker = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = Future()
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def timings(self):
+        """Seconds spent waiting in the queue, running, and in total (None until known)."""
+        end = self.finished_at or time.time()
+        return {
+            "queued_seconds": round((self.started_at or end) - self.queued_at, 3),
+            "run_seconds": round(end - self.started_at, 3) if self.started_at else None,
+            "total_seconds": round(end - self.queued_at, 3),
+        }
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "batch_size": self.batch_size,
+            "worker": self.worker,
+            **self.timings(),
+        }
+
+
+class JobQueue:
+    """
+    Bounded job queue drained by a pool of worker threads.
+
+    Every worker calls worker_factory() once at start-up and gets its own
+    run_batch(payloads) callable, so no pipeline is shared between threads.
+    Workers take micro-batches of jobs with the same key_fn() value, as
+    batching.BatchQueue hands them out. Finished jobs are kept for
+    `retention` seconds so clients can poll for results.
+    """
+
+    def __init__(self, worker_factory, key_fn, num_workers=1, max_queue=32,
+                 max_batch_size=4, window=0.05, retention=600):
+        self.worker_factory = worker_factory
+        self.key_fn = key_fn
+        self.num_workers = num_workers
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.retention = retention
+        self.queue = BatchQueue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+        self._counts = {"submitted": 0, "succeeded": 0, "failed": 0, "rejected": 0}
+        # Timings of recently finished jobs, for sizing workers
+        self._recent = deque(maxlen=100)
+
+    def start(self):
+        with self._lock:
+            while len(self._threads) < self.num_workers:
+                thread = threading.Thread(
+                    target=self._work, name=f"generate-worker-{len(self._threads)}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def submit(self, payload):
+        """Queue a job and return it; raises QueueFull when the queue is at capacity."""
+        self.start()
+        self._evict_finished()
+        job = Job(payload, self.key_fn(payload))
+        # Register before queueing so a fast worker never finishes an unknown job
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self.queue.put(job)
+        except QueueFull:
+            with self._lock:
+                del self._jobs[job.id]
+                self._counts["rejected"] += 1
+            raise
+        with self._lock:
+            self._counts["submitted"] += 1
+        return job
+
+    def add_completed(self, payload, result):
+        """Record a job answered without running, e.g. from a cache, so it can be polled like any other."""
+        self._evict_finished()
+        job = Job(payload, self.key_fn(payload))
+        job.status, job.result = SUCCEEDED, result
+        job.started_at = job.finished_at = job.queued_at
+        job.future.set_result(result)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._counts["submitted"] += 1
+            self._counts["succeeded"] += 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            recent = list(self._recent)
+            stats = {
+                "workers": self.num_workers,
+                "queue_depth": len(self.queue),
+                "queue_capacity": self.queue.maxsize,
+                "running": self._running,
+                **self._counts,
+            }
+        for name in ("queued_seconds", "run_seconds"):
+            values = [t[name] for t in recent if t[name] is not None]
+            stats[f"avg_{name}"] = round(sum(values) / len(values), 3) if values else None
+        return stats
+
+    def _evict_finished(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _work(self):
+        name = threading.current_thread().name
+        run_batch = self.worker_factory()
+        logger.info(f"{name} ready")
+        while True:
+            batch = self.queue.take_batch(self.max_batch_size, self.window)
+            started = time.time()
+            with self._lock:
+                self._running += len(batch)
+            for job in batch:
+                job.status = RUNNING
+                job.started_at = started
+                job.batch_size = len(batch)
+                job.worker = name
+            logger.info(f"{name} running batch of {len(batch)} job(s) with settings {batch[0].key}")
+
+            try:
+                results = run_batch([job.payload for job in batch])
+                error = None
+            except Exception as e:
+                logger.error(f"{name} batch failed: {str(e)}", exc_info=True)
+                results, error = [None] * len(batch), e
+
+            finished = time.time()
+            with self._lock:
+                self._running -= len(batch)
+                for job, result in zip(batch, results):
+                    job.finished_at = finished
+                    if error is None:
+                        job.status, job.result = SUCCEEDED, result
+                        self._counts["succeeded"] += 1
+                    else:
+                        job.status, job.error = FAILED, str(error)
+                        self._counts["failed"] += 1
+                    self._recent.append(job.timings())
+            for job in batch:
+                if error is None:
+                    job.future.set_result(job.result)
+                else:
+                    job.future.set_exception(error)
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+def module_bytes(pipeline):
+    """Approximate memory held by a pipeline's weights and buffers."""
+    total = 0
+    for component in pipeline.components.values():
+        if isinstance(component, torch.nn.Module):
+            for tensor in list(component.parameters()) + list(component.buffers()):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class LoadedModel:
+    def __init__(self, model_id, pipeline, load_seconds):
+        self.model_id = model_id
+        self.pipeline = pipeline
+        self.bytes = module_bytes(pipeline)
+        self.load_seconds = load_seconds
+        self.last_used = time.time()
+
+    def to_dict(self):
+        return {
+            "model_id": self.model_id,
+            "memory_mb": round(self.bytes / 1024 ** 2, 1),
+            "load_seconds": round(self.load_seconds, 2),
+            "last_used": self.last_used,
+        }
+
+
+class ModelRegistry:
+    """
+    Loads pipelines on first use and keeps them within a memory budget.
+
+    get() is thread-safe. Concurrent callers asking for the same model
+    share one load, while other models stay available. When the loaded
+    weights exceed memory_budget bytes, the least recently used models are
+    dropped from the registry. A model in use by a worker is freed once that
+    worker lets go of it. The model just requested is never evicted, even
+    if it alone exceeds the budget.
+    """
+
+    def __init__(self, loader, memory_budget):
+        self.loader = loader
+        self.memory_budget = memory_budget
+        self._models = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_id):
+        with self._lock:
+            model = self._models.get(model_id)
+            if model is not None:
+                self._models.move_to_end(model_id)
+                model.last_used = time.time()
+                return model
+            load_lock = self._loading.setdefault(model_id, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                model = self._models.get(model_id)
+                if model is not None:
+                    self._models.move_to_end(model_id)
+                    return model
+
+            logger.info(f"Loading model {model_id}")
+            started = time.perf_counter()
+            pipeline = self.loader(model_id)
+            model = LoadedModel(model_id, pipeline, time.perf_counter() - started)
+            logger.info(f"Loaded {model_id} in {model.load_seconds:.1f}s ({model.bytes / 1024 ** 2:.0f} MB)")
+
+            with self._lock:
+                self._models[model_id] = model
+                self._loading.pop(model_id, None)
+                self._evict(keep=model_id)
+            return model
+
+    def is_loaded(self, model_id):
+        with self._lock:
+            return model_id in self._models
+
+    def _evict(self, keep):
+        total = sum(model.bytes for model in self._models.values())
+        for model_id in list(self._models):
+            if total <= self.memory_budget:
+                break
+            if model_id == keep:
+                continue
+            evicted = self._models.pop(model_id)
+            total -= evicted.bytes
+            logger.info(f"Evicted {model_id} to stay within the model memory budget")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_budget_mb": round(self.memory_budget / 1024 ** 2, 1),
+                "models": [model.to_dict() for model in self._models.values()],
+            }
@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+
+from batching import BatchQueue, QueueFull
+from jobs import SUCCEEDED, JobQueue
+
+
+class Item:
+    def __init__(self, key, name):
+        self.key = key
+        self.name = name
+
+
+class BatchQueueTests(unittest.TestCase):
+    def test_collects_compatible_items_and_keeps_the_rest_in_order(self):
+        queue = BatchQueue()
+        for key, name in [("a", 1), ("b", 2), ("a", 3), ("b", 4), ("a", 5)]:
+            queue.put(Item(key, name))
+
+        self.assertEqual([item.name for item in queue.take_batch(2, window=0)], [1, 3])
+        self.assertEqual([item.name for item in queue.take_batch(4, window=0)], [2, 4])
+        self.assertEqual([item.name for item in queue.take_batch(4, window=0)], [5])
+
+    def test_waits_for_the_window_to_fill_a_batch(self):
+        queue = BatchQueue()
+        queue.put(Item("a", 1))
+        threading.Timer(0.05, queue.put, args=(Item("a", 2),)).start()
+
+        batch = queue.take_batch(2, window=1.0)
+        self.assertEqual([item.name for item in batch], [1, 2])
+
+    def test_window_is_measured_from_the_oldest_item(self):
+        queue = BatchQueue()
+        queue.put(Item("a", 1))
+        time.sleep(0.1)
+        started = time.monotonic()
+        self.assertEqual(len(queue.take_batch(4, window=0.1)), 1)
+        self.assertLess(time.monotonic() - started, 0.05)
+
+    def test_rejects_items_beyond_maxsize(self):
+        queue = BatchQueue(maxsize=2)
+        queue.put(Item("a", 1))
+        queue.put(Item("a", 2))
+        with self.assertRaises(QueueFull):
+            queue.put(Item("a", 3))
+
+
+class JobQueueTests(unittest.TestCase):
+    def test_jobs_with_the_same_settings_share_one_batch(self):
+        batches = []
+        gate = threading.Event()
+
+        def worker_factory():
+            def run_batch(payloads):
+                gate.wait(5)
+                batches.append(payloads)
+                return [payload * 10 for payload in payloads]
+            return run_batch
+
+        queue = JobQueue(worker_factory, key_fn=lambda payload: payload % 2, max_batch_size=4, window=0.2)
+        # The first job occupies the worker while the rest queue up behind it
+        first = queue.submit(1)
+        time.sleep(0.3)
+        jobs = [queue.submit(payload) for payload in (3, 2, 5, 4)]
+        gate.set()
+
+        for job in [first, *jobs]:
+            self.assertEqual(job.future.result(timeout=5), job.payload * 10)
+            self.assertEqual(job.status, SUCCEEDED)
+        self.assertEqual(batches, [[1], [3, 5], [2, 4]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+import torch
+
+from generation_cache import EmbeddingCache
+
+
+class EmbeddingCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.encoder = torch.nn.Linear(4, 4)
+        self.calls = 0
+
+    def encode(self):
+        self.calls += 1
+        return self.encoder(torch.ones(1, 4))
+
+    def test_cached_embeddings_carry_no_autograd_graph(self):
+        embeds = EmbeddingCache().get_or_encode("cat", self.encode)
+        self.assertIsNone(embeds.grad_fn)
+        self.assertFalse(embeds.requires_grad)
+        # Still usable by pipeline code running outside inference mode
+        self.assertEqual(torch.cat([embeds, embeds]).shape, (2, 4))
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = EmbeddingCache(maxsize=2)
+        cache.get_or_encode("a", self.encode)
+        cache.get_or_encode("b", self.encode)
+        cache.get_or_encode("a", self.encode)
+        cache.get_or_encode("c", self.encode)
+        cache.get_or_encode("a", self.encode)
+        cache.get_or_encode("b", self.encode)
+        self.assertEqual(self.calls, 4)
+        self.assertEqual(cache.stats(), {"entries": 2, "hits": 2, "misses": 4})
+
+
+if __name__ == "__main__":
+    unittest.main()